@@ -0,0 +1,73 @@
+"""Peor caso de generación de ejercicios del Centro de Práctica sobre muchas semillas.
+
+Ejecuta cada generador con semillas 0..N-1, comprueba que siempre devuelve 4 opciones distintas
+con la respuesta correcta incluida y falla (código de salida 1) si el percentil 99.9 del tiempo de
+generación supera el presupuesto (el peor caso se informa, pero una pausa aislada del sistema no
+debe hacer fallar la comprobación). Incluye el caso límite de valor correcto 0 (entrada en el LRV con LRV = 0),
+que con el antiguo bucle de rechazo no terminaba nunca.
+
+    python benchmarks/quiz_distractors.py --semillas 20000 --presupuesto-ms 10
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from instrumentacion import core  # noqa: E402
+
+PERCENTILE = 99.9
+
+
+def _worst_case(label, generate, seeds):
+    # Sin GC durante las mediciones; aun así una pausa del planificador puede inflar una sola llamada,
+    # por eso el presupuesto se compara con el percentil 99.9 y el máximo sólo se informa
+    timings = []
+    gc.disable()
+    try:
+        for seed in range(seeds):
+            random.seed(seed)
+            start = time.perf_counter()
+            question, options, correct = generate()[:3]
+            timings.append(time.perf_counter() - start)
+            if len(set(options)) != len(options) or correct not in options or len(options) != 4:
+                raise AssertionError(f"{label}: opciones inválidas con semilla {seed}: {options}")
+    finally:
+        gc.enable()
+    timings.sort()
+    p999 = timings[min(int(len(timings) * PERCENTILE / 100), len(timings) - 1)]
+    return label, p999 * 1e3, timings[-1] * 1e3, sum(timings) / seeds * 1e3
+
+
+def _zero_base():
+    # Salida PV -> OUT con LRV = 0 y entrada en el LRV: el valor correcto es exactamente 0
+    distractors = core.scaling_distractors(0.0, 400, 1)
+    return "", ["0.0"] + distractors, "0.0"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--semillas', type=int, default=5000)
+    parser.add_argument('--presupuesto-ms', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    core.get_instrument_index()  # el índice se construye una vez; no forma parte de cada generación
+    results = [
+        _worst_case("generate_scaling_quiz", core.generate_scaling_quiz, args.semillas),
+        _worst_case("generate_tag_quiz", core.generate_tag_quiz, args.semillas),
+        _worst_case("generate_error_quiz", core.generate_error_quiz, args.semillas),
+        _worst_case("scaling_distractors(base=0)", _zero_base, args.semillas),
+    ]
+    failed = False
+    for label, p999_ms, worst_ms, mean_ms in results:
+        status = "OK" if p999_ms <= args.presupuesto_ms else "EXCEDIDO"
+        failed |= status != "OK"
+        print(f"{label:32s} p{PERCENTILE:g}={p999_ms:8.3f} ms  peor={worst_ms:8.3f} ms  media={mean_ms:8.4f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Suite de benchmarks reproducibles de las rutas críticas de cálculo, ejercicios y app Streamlit.
+
+Mide latencia por llamada (mediana de varias repeticiones) y rendimiento por lotes con datos
+generados con semilla fija, guarda los resultados en JSON y los compara con una línea base:
+cualquier caso que empeore más que la tolerancia se marca como regresión (código de salida 1).
+
+    python benchmarks/run.py                          # ejecuta y compara con benchmarks/linea_base.json
+    python benchmarks/run.py --guardar-base           # fija los resultados actuales como línea base
+    python benchmarks/run.py --filtro cv --escala 0.1 # sólo casos que contienen 'cv', datos 10x menores
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from instrumentacion import core  # noqa: E402
+from instrumentacion.incertidumbre import loop_error_stackup  # noqa: E402
+from instrumentacion.orificio import solve_orifice_flow  # noqa: E402
+from instrumentacion.sensores import sensor_to_temperature  # noqa: E402
+from instrumentacion.unidades import get_converter  # noqa: E402
+
+SEED = 20240501
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'linea_base.json'
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / 'resultados.json'
+
+
+def _measure(func, repeat, number):
+    """Mediana del tiempo por llamada en segundos (repeat bloques de number llamadas)."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def latency_cases():
+    """Casos de latencia de una sola llamada, como los usa la interfaz en cada rerun."""
+    core.get_instrument_index()
+    flow_converter = get_converter('caudal', 'GPM', 'm³/h')
+
+    def seeded(func):
+        def run():
+            random.seed(SEED)
+            return func()
+        return run
+
+    return {
+        'convert_pressure': lambda: core.convert_pressure(12.5, 'bar', 'psi'),
+        'convert_temperature': lambda: core.convert_temperature(451.0, '°F', '°C'),
+        'calculate_cv_liquid': lambda: core.calculate_cv_liquid(100.0, 1.0, 50.0, 30.0),
+        'calculate_orifice_flow': lambda: core.calculate_orifice_flow(100.0, 50.0),
+        'select_instrument_for_measurement': lambda: core.select_instrument_for_measurement('Temperatura', 250.0),
+        'generate_scaling_quiz': seeded(core.generate_scaling_quiz),
+        'generate_tag_quiz': seeded(core.generate_tag_quiz),
+        'generate_error_quiz': seeded(core.generate_error_quiz),
+        'parse_tag': lambda: core.parse_tag('LSHH-203A'),
+        'unidades_converter_caudal': lambda: flow_converter(120.0),
+        'sensor_to_temperature_exact': lambda: sensor_to_temperature(10.0, 'Termopar K', 25.0, exact=True),
+    }
+
+
+def bulk_cases(scale):
+    """Casos de rendimiento por lotes a escala realista; devuelve {nombre: (función, elementos)}."""
+    np, pd = core.np, core.pd
+    rng = np.random.default_rng(SEED)
+    n = max(int(1_000_000 * scale), 1)
+    values = rng.uniform(0, 100, n)
+    schedule = pd.DataFrame({'Q': rng.uniform(1, 500, n // 10), 'SG': rng.uniform(0.6, 1.2, n // 10),
+                             'P1': rng.uniform(10, 100, n // 10), 'P2': rng.uniform(0, 60, n // 10)})
+    gas_schedule = schedule.rename(columns={'SG': 'Gg'}).assign(Q=schedule['Q'] * 1000, T1=rng.uniform(40, 300, n // 10))
+    tags_db = list(core.INSTRUMENT_DATABASE)
+    tags = [f"{tags_db[i % len(tags_db)]}-{100 + i % 900}" for i in rng.integers(0, 10**6, n // 10)]
+    instruments = pd.DataFrame({'tag': [f'PT-{i}' for i in range(n // 100)], 'lrv': 0.0,
+                                'urv': rng.uniform(1, 1000, n // 100), 'histeresis': rng.random(n // 100) < 0.5})
+    loops = n // 50
+    loop_components = pd.DataFrame({
+        'lazo': np.repeat(np.arange(loops), 4), 'componente': np.tile(['sensor', 'transmisor', 'tarjeta', 'escalamiento'], loops),
+        'codigo': np.tile(['TE', 'TT', None, None], loops),
+        'lrv': np.repeat(rng.uniform(-50, 0, loops), 4), 'urv': np.repeat(rng.uniform(100, 800, loops), 4),
+    })
+    return {
+        'convert_pressure_array': (lambda: core.convert_pressure_array(values, 'bar', 'psi'), n),
+        'convert_temperature_array': (lambda: core.convert_temperature_array(values, '°F', 'K'), n),
+        'calculate_cv_liquid_batch': (lambda: core.calculate_cv_liquid_batch(schedule), len(schedule)),
+        'calculate_cv_compressible_batch': (lambda: core.calculate_cv_compressible_batch(gas_schedule, 'gas'), len(gas_schedule)),
+        'calculate_orifice_flow_array': (lambda: core.calculate_orifice_flow_array(values, 50.0, 5.0), n),
+        'solve_orifice_flow': (lambda: solve_orifice_flow(values[:n // 2] * 0.5, 800.0, 25.0, 50.0, 100.0, 0.011,
+                                                          molar_mass=16.04, kappa=1.3), n // 2),
+        'sensor_to_temperature_exact_array': (lambda: sensor_to_temperature(values * 0.4, 'Termopar K', 25.0, exact=True), n),
+        'interpret_tags': (lambda: core.interpret_tags(tags), len(tags)),
+        'calibration_points': (lambda: core.calibration_points(instruments), len(instruments)),
+        'error_envelope': (lambda: core.error_envelope(0, 900, 0.5, 0.5, 0.5, 0.1, points=n // 100), n // 100),
+        'loop_error_stackup': (lambda: loop_error_stackup(loop_components), loops),
+        'monte_carlo_error': (lambda: core.monte_carlo_error(625, 0, 900, 0.5, 0.5, 0.5, 0.1, draws=n // 10, seed=SEED), n // 10),
+    }
+
+
+def streamlit_rerun_case():
+    """Rerun completo de v1.py con AppTest tras cambiar un widget; None si Streamlit no está disponible."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+    app = AppTest.from_file(str(ROOT / 'v1.py'), default_timeout=60)
+    random.seed(SEED)
+    app.run()
+    values = iter(range(10**6))
+
+    def rerun():
+        app.number_input(key='temp_val').set_value(float(next(values) % 100)).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+    return rerun
+
+
+def run_suite(args):
+    results = {}
+    for name, func in latency_cases().items():
+        if args.filtro in name:
+            results[f'latencia/{name}'] = {'segundos': _measure(func, args.repeticiones, 200)}
+    for name, (func, items) in bulk_cases(args.escala).items():
+        if args.filtro in name:
+            seconds = _measure(func, args.repeticiones, 1)
+            results[f'lote/{name}'] = {'segundos': seconds, 'elementos': items, 'por_segundo': items / seconds}
+    if args.filtro in 'streamlit_rerun' and not args.sin_streamlit:
+        rerun = streamlit_rerun_case()
+        if rerun is not None:
+            results['app/streamlit_rerun'] = {'segundos': _measure(rerun, args.repeticiones, 1)}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista de (caso, actual, base, cambio relativo) que empeoran más que la tolerancia."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('resultados', {}).get(name)
+        if not base:
+            continue
+        change = result['segundos'] / base['segundos'] - 1
+        if change > tolerance:
+            regressions.append((name, result['segundos'], base['segundos'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escala', type=float, default=1.0, help="Factor sobre el tamaño de los lotes (1.0 = 1M muestras).")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--filtro', default='', help="Sólo ejecuta casos cuyo nombre contiene este texto.")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Empeoramiento relativo permitido (0.25 = 25%%).")
+    parser.add_argument('--salida', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--base', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--guardar-base', action='store_true', help="Guarda los resultados como nueva línea base.")
+    parser.add_argument('--sin-streamlit', action='store_true', help="Omite el rerun completo de la app.")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args)
+    record = {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'maquina': platform.node(),
+        'escala': args.escala,
+        'resultados': results,
+    }
+    args.salida.write_text(json.dumps(record, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    for name, result in results.items():
+        extra = f"  {result['por_segundo']:>14,.0f} elem/s" if 'por_segundo' in result else ''
+        print(f"{name:45s} {result['segundos'] * 1e3:10.4f} ms{extra}")
+
+    if args.guardar_base:
+        args.base.write_text(json.dumps(record, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"Línea base guardada en {args.base}")
+        return 0
+    if not args.base.exists():
+        print(f"Sin línea base en {args.base}; use --guardar-base para crearla.")
+        return 0
+
+    baseline = json.loads(args.base.read_text(encoding='utf-8'))
+    if baseline.get('escala') != args.escala:
+        print(f"Aviso: la línea base se midió con escala {baseline.get('escala')}; los lotes no son comparables.")
+    regressions = compare(results, baseline, args.tolerancia)
+    for name, current, base, change in regressions:
+        print(f"REGRESIÓN {name}: {current * 1e3:.4f} ms frente a {base * 1e3:.4f} ms (+{change:.0%})")
+    if not regressions:
+        print(f"Sin regresiones respecto a {args.base} (tolerancia {args.tolerancia:.0%}).")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
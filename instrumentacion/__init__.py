@@ -0,0 +1,5 @@
+"""Asistente de Instrumentación Industrial: núcleo de cálculo reutilizable fuera de la app Streamlit.
+
+Los cálculos viven en `instrumentacion.core`; la interfaz de línea de comandos se ejecuta con
+`python -m instrumentacion`.
+"""
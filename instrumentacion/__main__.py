@@ -0,0 +1,5 @@
+import sys
+
+from instrumentacion.cli import main
+
+sys.exit(main())
@@ -0,0 +1,303 @@
+"""Interfaz de línea de comandos para trabajos por lotes (conversión, dimensionamiento Cv, tags, lazos, totalizado y linealización).
+
+Ejemplos:
+    python -m instrumentacion convertir presion bar psi 1 2.5 10
+    python -m instrumentacion convertir caudal GPM m³/h 120
+    python -m instrumentacion convertir temperatura °F °C --archivo historian.csv --columnas TT101 TT102 -o salida.csv
+    python -m instrumentacion cv programa_valvulas.csv -o cv.csv
+    python -m instrumentacion cv valvulas_gas.csv --servicio gas -o cv_gas.csv
+    python -m instrumentacion tags TIC-101A PDT-50 --archivo indice.xlsx --columna tag
+    python -m instrumentacion lazos indice.csv --letras LSH LSL --lazos 200 299
+    python -m instrumentacion totalizar dp_fe101.csv --k 50 --columna-tiempo fecha --corte 5
+    python -m instrumentacion calibracion transmisores.csv -o hojas.parquet
+    python -m instrumentacion reportes transmisores.csv -o paquete.zip --formato pdf --procesos 8
+    python -m instrumentacion orificio historico_fe.csv --medidores medidores.csv -o caudal_iso.csv
+    python -m instrumentacion linealizar Pt100 100 138.5 175.86
+    python -m instrumentacion incertidumbre componentes_lazos.csv --tolerancia 0.5 --criterio rss -o lazos.csv
+    python -m instrumentacion servicio --puerto 8765 --hilos 4
+    python -m instrumentacion linealizar "Termopar K" --archivo volcado_dcs.csv --union-fria 25 -o temperaturas.csv
+"""
+import argparse
+import sys
+
+from instrumentacion import core
+from instrumentacion.incertidumbre import LOOP_CRITERIA, loop_error_stackup
+from instrumentacion.lazos import open_tag_index
+from instrumentacion.orificio import ORIFICE_TAPPINGS, calculate_orifice_flow_iso
+from instrumentacion.reportes import REPORT_FORMATS, write_report_archive
+from instrumentacion.sensores import SENSOR_TYPES, sensor_to_temperature, temperature_to_sensor
+from instrumentacion.unidades import UNITS
+
+
+def _write_frame(frame, output):
+    """Escribe un DataFrame como CSV en la ruta indicada o en la salida estándar."""
+    frame.to_csv(output if output else sys.stdout, index=False)
+
+
+def _cmd_convertir(args):
+    units = UNITS[args.magnitud]
+    if args.de not in units or args.a not in units:
+        print(f"Unidad no soportada. Opciones: {', '.join(units)}", file=sys.stderr)
+        return 2
+
+    if args.archivo:
+        frame = core.pd.read_csv(args.archivo)
+        columns = args.columnas or list(frame.select_dtypes(include='number').columns)
+        frame[columns] = core.convert_array(frame[columns], args.magnitud, args.de, args.a, decimals=args.decimales)
+        _write_frame(frame, args.salida)
+    else:
+        for value in core.convert_array(args.valores, args.magnitud, args.de, args.a, decimals=args.decimales):
+            print(value)
+    return 0
+
+
+def _cmd_cv(args):
+    schedule = core.pd.read_csv(args.archivo)
+    required = {'liquido': core.CV_SCHEDULE_COLUMNS, 'gas': core.GAS_SCHEDULE_COLUMNS,
+                'vapor': core.STEAM_SCHEDULE_COLUMNS}[args.servicio]
+    missing = [c for c in required if c not in schedule.columns]
+    if missing:
+        print(f"Faltan columnas en el archivo: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if args.servicio == 'liquido':
+        sized = core.calculate_cv_liquid_batch(schedule)
+    else:
+        sized = core.calculate_cv_compressible_batch(schedule, args.servicio)
+    _write_frame(sized, args.salida)
+    invalid = int((~sized['valido']).sum())
+    if invalid:
+        print(f"{invalid} caso(s) inválido(s); ver columna 'motivo'.", file=sys.stderr)
+    return 0
+
+
+def _cmd_tags(args):
+    if args.archivo:
+        result = core.interpret_tag_file(args.archivo, column=args.columna)
+    else:
+        result = core.interpret_tags(args.tags)
+    _write_frame(result, args.salida)
+    return 0
+
+
+def _cmd_lazos(args):
+    index = open_tag_index(args.archivo, column=args.columna, cache_dir=args.cache)
+    loops = None
+    if args.lazos:
+        loops = (args.lazos[0], args.lazos[-1])
+    result = index.select(letters=args.letras, first=args.primera, functions=args.funcion,
+                          suffix=args.sufijo, loops=loops)
+    _write_frame(result, args.salida)
+    return 0
+
+
+def _cmd_totalizar(args):
+    totals = core.totalize_orifice_flow(
+        args.archivo, args.k, dp_column=args.columna_dp, time_column=args.columna_tiempo,
+        sample_period=args.periodo, low_flow_cutoff=args.corte,
+    )
+    for key, value in totals.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+def _cmd_orificio(args):
+    data = core.pd.read_csv(args.archivo)
+    meters = core.pd.read_csv(args.medidores) if args.medidores else None
+    fluid = {option: value for option, value in (('viscosity', args.viscosidad), ('density', args.densidad),
+                                                  ('molar_mass', args.masa_molar), ('kappa', args.kappa))
+             if value is not None}
+    if meters is None:
+        data = data.assign(d=data['d'] if 'd' in data.columns else args.d, D=data['D'] if 'D' in data.columns else args.D)
+    try:
+        result = calculate_orifice_flow_iso(data, meters, tapping=args.tomas, z=args.z, **fluid)
+    except (ValueError, TypeError, KeyError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 2
+    _write_frame(result, args.salida)
+    outside = int((~result['en_norma']).sum())
+    if outside:
+        print(f"{outside} muestras fuera de los límites de ISO 5167-2.", file=sys.stderr)
+    return 0
+
+
+def _cmd_calibracion(args):
+    summary = core.write_calibration_sheets(args.archivo, args.salida, chunk_instruments=args.bloque)
+    print(f"{summary['instrumentos']} instrumentos, {summary['filas']} puntos escritos en {args.salida}")
+    if summary['invalidos']:
+        print(f"Omitidos por rango inválido: {', '.join(map(str, summary['invalidos']))}", file=sys.stderr)
+    return 0
+
+
+def _cmd_reportes(args):
+    summary = write_report_archive(args.archivo, args.salida, fmt=args.formato, workers=args.procesos,
+                                   chunk_instruments=args.bloque)
+    print(f"{summary['archivos']} hojas escritas en {args.salida}")
+    if summary['invalidos']:
+        print(f"Omitidos por rango inválido: {', '.join(map(str, summary['invalidos']))}", file=sys.stderr)
+    return 0
+
+
+def _cmd_linealizar(args):
+    if args.inversa:
+        convert = lambda values: temperature_to_sensor(values, args.sensor, args.union_fria)
+    else:
+        convert = lambda values: sensor_to_temperature(values, args.sensor, args.union_fria, exact=args.exacto)
+
+    if args.archivo:
+        frame = core.pd.read_csv(args.archivo)
+        columns = args.columnas or list(frame.select_dtypes(include='number').columns)
+        for column in columns:
+            frame[column] = convert(frame[column].to_numpy(dtype=float))
+        _write_frame(frame, args.salida)
+        out_of_range = int(frame[columns].isna().sum().sum())
+    else:
+        values = convert(args.valores)
+        for value in values:
+            print(value)
+        out_of_range = int(core.np.isnan(values).sum())
+    if out_of_range:
+        print(f"{out_of_range} valores fuera del rango del sensor (quedan vacíos).", file=sys.stderr)
+    return 0
+
+
+def _cmd_incertidumbre(args):
+    try:
+        loops, components = loop_error_stackup(core.pd.read_csv(args.archivo), args.tolerancia, args.criterio)
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 2
+    _write_frame(loops[loops['excede']] if args.solo_excedidos else loops, args.salida)
+    orphans = int(components['sin_lazo'].sum())
+    if orphans:
+        print(f"{orphans} fila(s) sin lazo omitidas", file=sys.stderr)
+    print(f"{int(loops['excede'].sum())} de {len(loops)} lazos fuera de tolerancia", file=sys.stderr)
+    return 0
+
+
+def _cmd_servicio(args):
+    from instrumentacion.servicio import CalculationServer
+
+    server = CalculationServer((args.host, args.puerto), workers=args.hilos, max_queue=args.cola,
+                               max_wait=args.espera / 1000, verbose=args.registro)
+    print(f"Servicio de cálculo en http://{args.host}:{server.server_address[1]} (Ctrl+C para detener)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='instrumentacion', description="Cálculos de instrumentación por lotes.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('convertir', help="Convierte valores o columnas de un CSV entre unidades de una magnitud.")
+    p.add_argument('magnitud', choices=list(UNITS))
+    p.add_argument('de')
+    p.add_argument('a')
+    p.add_argument('valores', nargs='*', type=float)
+    p.add_argument('--archivo', help="CSV de entrada (en lugar de valores sueltos).")
+    p.add_argument('--columnas', nargs='+', help="Columnas a convertir (por defecto todas las numéricas).")
+    p.add_argument('--decimales', type=int, default=None, help="Redondeo opcional del resultado.")
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_convertir)
+
+    p = sub.add_parser('cv', help="Dimensiona un programa de válvulas (líquido: Q, SG, P1, P2; gas: Q, Gg, P1, P2, T1; "
+                                  "vapor: W, rho1, P1, P2).")
+    p.add_argument('archivo')
+    p.add_argument('--servicio', choices=['liquido', *core.COMPRESSIBLE_SERVICES], default='liquido')
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_cv)
+
+    p = sub.add_parser('tags', help="Interpreta tags ISA-5.1 sueltos o desde un CSV/Excel.")
+    p.add_argument('tags', nargs='*')
+    p.add_argument('--archivo')
+    p.add_argument('--columna', default=None)
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_tags)
+
+    p = sub.add_parser('lazos', help="Consulta el índice de lazos de un listado de tags (con caché en disco).")
+    p.add_argument('archivo')
+    p.add_argument('--columna', default=None)
+    p.add_argument('--letras', nargs='+', help="Códigos de letras completos (ej. LSH LSL).")
+    p.add_argument('--primera', nargs='+', help="Primera letra (variable medida).")
+    p.add_argument('--funcion', nargs='+', help="Letras de función (ej. IC SH).")
+    p.add_argument('--sufijo', nargs='+')
+    p.add_argument('--lazos', nargs='+', type=int, metavar='LAZO', help="Un lazo o un rango inclusivo DESDE HASTA.")
+    p.add_argument('--cache', default=None, help="Directorio de la caché (por defecto <archivo>.indice).")
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_lazos)
+
+    p = sub.add_parser('totalizar', help="Integra el caudal de una serie de ΔP de placa de orificio.")
+    p.add_argument('archivo')
+    p.add_argument('--k', type=float, required=True, help="Factor K del medidor.")
+    p.add_argument('--columna-dp', default='dp')
+    p.add_argument('--columna-tiempo', default=None)
+    p.add_argument('--periodo', type=float, default=1.0, help="Periodo de muestreo [s] si no hay columna de tiempo.")
+    p.add_argument('--corte', type=float, default=0.0, help="Corte de bajo caudal (unidades de caudal).")
+    p.set_defaults(func=_cmd_totalizar)
+
+    p = sub.add_parser('orificio', help="Caudal ISO 5167-2 (Reader-Harris/Gallagher) de una serie con columnas dp [kPa], "
+                                        "p1 [kPa abs] y t [°C].")
+    p.add_argument('archivo')
+    p.add_argument('--medidores', help="CSV con tag, d, D [mm] y opcionalmente tomas, viscosidad, densidad, masa_molar, z, kappa.")
+    p.add_argument('--d', type=float, help="Diámetro del orificio [mm] si no hay tabla de medidores.")
+    p.add_argument('--D', type=float, help="Diámetro interno de la tubería [mm] si no hay tabla de medidores.")
+    p.add_argument('--tomas', choices=list(ORIFICE_TAPPINGS), default='brida')
+    p.add_argument('--viscosidad', type=float, help="Viscosidad [cP].")
+    p.add_argument('--densidad', type=float, help="Densidad del líquido [kg/m³].")
+    p.add_argument('--masa-molar', type=float, help="Masa molar del gas [kg/kmol].")
+    p.add_argument('--z', type=float, default=1.0)
+    p.add_argument('--kappa', type=float, help="Exponente isentrópico del gas.")
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_orificio)
+
+    p = sub.add_parser('calibracion', help="Genera las hojas de calibración de un listado de instrumentos (CSV/Parquet).")
+    p.add_argument('archivo')
+    p.add_argument('-o', '--salida', required=True, help="Destino .csv o .parquet (Parquet requiere pyarrow).")
+    p.add_argument('--bloque', type=int, default=5000, help="Instrumentos procesados por bloque.")
+    p.set_defaults(func=_cmd_calibracion)
+
+    p = sub.add_parser('reportes', help="Genera en paralelo las hojas imprimibles (calibración y errores) en un ZIP.")
+    p.add_argument('archivo')
+    p.add_argument('-o', '--salida', required=True, help="Archivo .zip de destino.")
+    p.add_argument('--formato', choices=REPORT_FORMATS, default='html', help="PDF requiere weasyprint.")
+    p.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, uno por CPU).")
+    p.add_argument('--bloque', type=int, default=200, help="Instrumentos por tarea enviada al pool.")
+    p.set_defaults(func=_cmd_reportes)
+
+    p = sub.add_parser('linealizar', help="Convierte lecturas crudas de RTD (Ω) o termopar (mV) a °C, o al revés con --inversa.")
+    p.add_argument('sensor', choices=list(SENSOR_TYPES))
+    p.add_argument('valores', nargs='*', type=float)
+    p.add_argument('--archivo', help="CSV de entrada (en lugar de valores sueltos).")
+    p.add_argument('--columnas', nargs='+', help="Columnas a convertir (por defecto todas las numéricas).")
+    p.add_argument('--union-fria', type=float, default=0.0, help="Temperatura de la unión fría [°C] (sólo termopares).")
+    p.add_argument('--inversa', action='store_true', help="Convierte °C a la señal del sensor.")
+    p.add_argument('--exacto', action='store_true', help="Resuelve la ecuación de referencia en lugar de interpolar en la tabla.")
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_linealizar)
+
+    p = sub.add_parser('incertidumbre', help="Error combinado (peor caso y RSS) de cada lazo a partir de sus componentes.")
+    p.add_argument('archivo')
+    p.add_argument('--tolerancia', type=float, default=1.0, help="Error admisible [% del span] si no hay columna tolerancia.")
+    p.add_argument('--criterio', choices=LOOP_CRITERIA, default='rss')
+    p.add_argument('--solo-excedidos', action='store_true', help="Escribe sólo los lazos fuera de tolerancia.")
+    p.add_argument('-o', '--salida')
+    p.set_defaults(func=_cmd_incertidumbre)
+
+    p = sub.add_parser('servicio', help="Levanta el servicio HTTP/JSON local (/convertir, /cv, /tags, /errores).")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--puerto', type=int, default=8765)
+    p.add_argument('--hilos', type=int, default=4, help="Hilos del pool de cálculo.")
+    p.add_argument('--cola', type=int, default=1024, help="Peticiones en espera antes de responder 503.")
+    p.add_argument('--espera', type=float, default=0.5, help="Ventana de coalescencia [ms].")
+    p.add_argument('--registro', action='store_true', help="Registra cada petición en stderr.")
+    p.set_defaults(func=_cmd_servicio)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,848 @@
+"""Núcleo de cálculo del Asistente de Instrumentación, sin dependencias de interfaz.
+
+Contiene los diccionarios ISA-5.1, la base de instrumentos, las calculadoras y los generadores
+de ejercicios. NumPy y pandas se importan de forma diferida la primera vez que una función
+los necesita, de modo que importar este módulo (o usar la CLI) no arrastra Streamlit ni
+paga el coste de arranque de las librerías numéricas.
+"""
+import functools
+import importlib
+import math
+import random
+import re
+import sys
+
+from instrumentacion.unidades import get_converter
+
+
+class _LazyModule:
+    """Importa el módulo indicado la primera vez que se accede a uno de sus atributos."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+np = _LazyModule('numpy')
+pd = _LazyModule('pandas')
+
+# --- BASES DE DATOS EXPANDIDAS (DICCIONARIOS ISA-5.1) ---
+
+FIRST_LETTER = {
+    'A': 'Análisis', 'B': 'Llama (Burner)', 'C': 'Conductividad', 'D': 'Densidad o Peso Específico', 'E': 'Tensión (Voltaje)',
+    'F': 'Caudal (Flow)', 'G': 'Calibre/Dimensión (Gauge)', 'H': 'Manual (Hand)', 'I': 'Corriente', 'J': 'Potencia',
+    'K': 'Tiempo o Programa', 'L': 'Nivel (Level)', 'M': 'Humedad (Moisture)', 'N': 'Definido por Usuario', 'O': 'Definido por Usuario',
+    'P': 'Presión o Vacío', 'Q': 'Cantidad', 'R': 'Radiactividad', 'S': 'Velocidad o Frecuencia', 'T': 'Temperatura',
+    'U': 'Multivariable', 'V': 'Vibración o Análisis Mecánico', 'W': 'Peso o Fuerza', 'X': 'Sin clasificar', 'Y': 'Evento, Estado o Presencia', 'Z': 'Posición o Dimensión'
+}
+
+SUCCESSOR_LETTERS = {
+    'A': 'Alarma', 'B': 'Definido por Usuario', 'C': 'Control', 'D': 'Diferencial', 'E': 'Elemento Primario (Sensor)',
+    'F': 'Relación (Ratio)', 'G': 'Visor o Vidrio (Glass)', 'H': 'Alto', 'I': 'Indicación', 'J': 'Exploración (Scan)',
+    'K': 'Estación de Control', 'L': 'Luz Piloto o Bajo', 'M': 'Medio o Intermedio', 'N': 'Definido por Usuario',
+    'O': 'Orificio de Restricción', 'P': 'Punto de Prueba', 'Q': 'Integrador o Totalizador', 'R': 'Registro (Recorder)',
+    'S': 'Interruptor (Switch) o Seguridad', 'T': 'Transmisión', 'U': 'Multifunción', 'V': 'Válvula, Damper o Actuador',
+    'W': 'Pozo (Well)', 'X': 'Accesorio o Sin clasificar', 'Y': 'Relé, Convertidor o Computador', 'Z': 'Elemento Final de Control (no clasificado)'
+}
+
+INSTRUMENT_DATABASE = {
+    # Instrumentos de Presión
+    'PI': {'variable': 'Presión', 'funcion': 'Indicador', 'rango_tipico': '0-10 bar', 'exactitud_tipica': '±0.5%'},
+    'PIT': {'variable': 'Presión', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-25 bar', 'exactitud_tipica': '±0.25%'},
+    'PIC': {'variable': 'Presión', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-16 bar', 'exactitud_tipica': '±0.5%'},
+    'PIR': {'variable': 'Presión', 'funcion': 'Indicador-Registrador', 'rango_tipico': '0-40 bar', 'exactitud_tipica': '±0.3%'},
+    'PSH': {'variable': 'Presión', 'funcion': 'Switch Alto', 'rango_tipico': '0-100 bar', 'exactitud_tipica': '±1%'},
+    'PSL': {'variable': 'Presión', 'funcion': 'Switch Bajo', 'rango_tipico': '0-50 bar', 'exactitud_tipica': '±1%'},
+    'PDI': {'variable': 'Presión Diferencial', 'funcion': 'Indicador', 'rango_tipico': '0-2500 mmH2O', 'exactitud_tipica': '±0.5%'},
+    'PDT': {'variable': 'Presión Diferencial', 'funcion': 'Transmisor', 'rango_tipico': '0-6000 mmH2O', 'exactitud_tipica': '±0.25%'},
+    
+    # Instrumentos de Temperatura
+    'TI': {'variable': 'Temperatura', 'funcion': 'Indicador', 'rango_tipico': '0-500°C', 'exactitud_tipica': '±1°C'},
+    'TIT': {'variable': 'Temperatura', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '-50-800°C', 'exactitud_tipica': '±0.5°C'},
+    'TIC': {'variable': 'Temperatura', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-1200°C', 'exactitud_tipica': '±2°C'},
+    'TIR': {'variable': 'Temperatura', 'funcion': 'Indicador-Registrador', 'rango_tipico': '0-600°C', 'exactitud_tipica': '±1°C'},
+    'TSH': {'variable': 'Temperatura', 'funcion': 'Switch Alto', 'rango_tipico': '0-300°C', 'exactitud_tipica': '±3°C'},
+    'TSL': {'variable': 'Temperatura', 'funcion': 'Switch Bajo', 'rango_tipico': '0-200°C', 'exactitud_tipica': '±3°C'},
+    'TE': {'variable': 'Temperatura', 'funcion': 'Elemento Sensor', 'rango_tipico': '-200-1600°C', 'exactitud_tipica': '±0.1°C'},
+    'TT': {'variable': 'Temperatura', 'funcion': 'Transmisor', 'rango_tipico': '-40-850°C', 'exactitud_tipica': '±0.3°C'},
+    
+    # Instrumentos de Nivel
+    'LI': {'variable': 'Nivel', 'funcion': 'Indicador', 'rango_tipico': '0-100%', 'exactitud_tipica': '±1%'},
+    'LIT': {'variable': 'Nivel', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-10 m', 'exactitud_tipica': '±0.5%'},
+    'LIC': {'variable': 'Nivel', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-5 m', 'exactitud_tipica': '±1%'},
+    'LSH': {'variable': 'Nivel', 'funcion': 'Switch Alto', 'rango_tipico': '0-20 m', 'exactitud_tipica': '±2%'},
+    'LSL': {'variable': 'Nivel', 'funcion': 'Switch Bajo', 'rango_tipico': '0-15 m', 'exactitud_tipica': '±2%'},
+    'LT': {'variable': 'Nivel', 'funcion': 'Transmisor', 'rango_tipico': '0-30 m', 'exactitud_tipica': '±0.25%'},
+    'LG': {'variable': 'Nivel', 'funcion': 'Visor/Indicador Visual', 'rango_tipico': '0-3 m', 'exactitud_tipica': '±5%'},
+    
+    # Instrumentos de Caudal
+    'FI': {'variable': 'Caudal', 'funcion': 'Indicador', 'rango_tipico': '0-1000 m³/h', 'exactitud_tipica': '±1%'},
+    'FIT': {'variable': 'Caudal', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-500 m³/h', 'exactitud_tipica': '±0.5%'},
+    'FIC': {'variable': 'Caudal', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-2000 m³/h', 'exactitud_tipica': '±1%'},
+    'FT': {'variable': 'Caudal', 'funcion': 'Transmisor', 'rango_tipico': '0-10000 m³/h', 'exactitud_tipica': '±0.25%'},
+    'FE': {'variable': 'Caudal', 'funcion': 'Elemento Primario', 'rango_tipico': '0-5000 m³/h', 'exactitud_tipica': '±2%'},
+    'FQ': {'variable': 'Caudal', 'funcion': 'Totalizador', 'rango_tipico': '0-999999 m³', 'exactitud_tipica': '±0.1%'},
+    
+    # Instrumentos de Análisis
+    'AI': {'variable': 'Análisis', 'funcion': 'Indicador', 'rango_tipico': '0-14 pH', 'exactitud_tipica': '±0.1 pH'},
+    'AIT': {'variable': 'Análisis', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-20 ppm', 'exactitud_tipica': '±2%'},
+    'AIC': {'variable': 'Análisis', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-100%', 'exactitud_tipica': '±1%'},
+    'AT': {'variable': 'Análisis', 'funcion': 'Transmisor', 'rango_tipico': '0-1000 ppm', 'exactitud_tipica': '±3%'},
+    
+    # Instrumentos de Conductividad
+    'CI': {'variable': 'Conductividad', 'funcion': 'Indicador', 'rango_tipico': '0-2000 µS/cm', 'exactitud_tipica': '±2%'},
+    'CIT': {'variable': 'Conductividad', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-20000 µS/cm', 'exactitud_tipica': '±1%'},
+    'CT': {'variable': 'Conductividad', 'funcion': 'Transmisor', 'rango_tipico': '0-200000 µS/cm', 'exactitud_tipica': '±1.5%'},
+    
+    # Válvulas de Control
+    'PCV': {'variable': 'Presión', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.1-1000', 'exactitud_tipica': '±5%'},
+    'TCV': {'variable': 'Temperatura', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.5-500', 'exactitud_tipica': '±5%'},
+    'FCV': {'variable': 'Caudal', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 1-2000', 'exactitud_tipica': '±3%'},
+    'LCV': {'variable': 'Nivel', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.2-800', 'exactitud_tipica': '±5%'},
+    
+    # Instrumentos Multivariable
+    'UIT': {'variable': 'Multivariable', 'funcion': 'Indicador-Transmisor', 'rango_tipico': 'Variable', 'exactitud_tipica': '±0.1%'},
+    'UT': {'variable': 'Multivariable', 'funcion': 'Transmisor', 'rango_tipico': 'Variable', 'exactitud_tipica': '±0.15%'},
+    
+    # Instrumentos de Vibración
+    'VI': {'variable': 'Vibración', 'funcion': 'Indicador', 'rango_tipico': '0-50 mm/s', 'exactitud_tipica': '±5%'},
+    'VIT': {'variable': 'Vibración', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-100 mm/s', 'exactitud_tipica': '±3%'},
+    'VT': {'variable': 'Vibración', 'funcion': 'Transmisor', 'rango_tipico': '0-200 mm/s', 'exactitud_tipica': '±2%'},
+    
+    # Instrumentos de Peso
+    'WI': {'variable': 'Peso', 'funcion': 'Indicador', 'rango_tipico': '0-10000 kg', 'exactitud_tipica': '±0.1%'},
+    'WIT': {'variable': 'Peso', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-50000 kg', 'exactitud_tipica': '±0.05%'},
+    'WT': {'variable': 'Peso', 'funcion': 'Transmisor', 'rango_tipico': '0-100000 kg', 'exactitud_tipica': '±0.03%'},
+}
+
+ERROR_TYPES = {
+    'A': 'Porcentaje del máximo valor del campo de indicación',
+    'B': 'Porcentaje del span (rango)',
+    'C': 'Porcentaje del valor a medir',
+    'D': 'Valor fijo según la variable'
+}
+
+# --- FUNCIONES DE CÁLCULO Y LÓgica ---
+
+def convert_pressure(value, from_unit, to_unit):
+    converter = get_converter('presion', from_unit, to_unit)
+    if converter is None: return None
+    return converter(value)
+
+def convert_temperature(value, from_unit, to_unit):
+    converter = get_converter('temperatura', from_unit, to_unit)
+    if converter is None: return None
+    try:
+        return round(converter(value), 2)
+    except:
+        return None
+
+def _as_numeric_array(values):
+    """Devuelve Series/DataFrame sin copiar; cualquier otra entrada se convierte a ndarray de float."""
+    if 'pandas' in sys.modules and isinstance(values, (pd.Series, pd.DataFrame)):
+        return values
+    return np.asarray(values, dtype=float)
+
+def convert_array(values, dimension, from_unit, to_unit, decimals=None):
+    """Convierte un arreglo, Series o DataFrame de cualquier dimensión del registro de unidades."""
+    converter = get_converter(dimension, from_unit, to_unit)
+    if converter is None: return None
+    result = converter(_as_numeric_array(values))
+    return result if decimals is None else result.round(decimals)
+
+def convert_pressure_array(values, from_unit, to_unit, decimals=None):
+    """Convierte un arreglo, Series o DataFrame de presiones con un único factor precalculado."""
+    return convert_array(values, 'presion', from_unit, to_unit, decimals)
+
+def convert_temperature_array(values, from_unit, to_unit, decimals=None):
+    """Convierte un arreglo, Series o DataFrame de temperaturas (°C/°F/K/°R) sin bucles por elemento."""
+    return convert_array(values, 'temperatura', from_unit, to_unit, decimals)
+
+def calculate_cv_liquid(flow_rate, sg, p1, p2):
+    if p1 <= p2:
+        return None, "La presión de entrada debe ser mayor que la de salida."
+    delta_p = p1 - p2
+    cv = flow_rate * math.sqrt(sg / delta_p)
+    return round(cv, 2), None
+
+CV_SCHEDULE_COLUMNS = ['Q', 'SG', 'P1', 'P2']
+
+def calculate_cv_liquid_batch(schedule, decimals=2):
+    """Calcula el Cv de todas las filas de un programa de válvulas (columnas Q, SG, P1, P2) en una sola pasada.
+
+    Las filas inválidas no lanzan excepciones: quedan con `cv` vacío, `valido=False` y el motivo en `motivo`.
+    """
+    result = schedule.copy()
+    q, sg, p1, p2 = (pd.to_numeric(schedule[c], errors='coerce').to_numpy(dtype=float) for c in CV_SCHEDULE_COLUMNS)
+    delta_p = p1 - p2
+
+    # Cada regla se evalúa sobre todo el arreglo; el primer motivo que aplica es el que se informa
+    incomplete = np.isnan(q) | np.isnan(sg) | np.isnan(p1) | np.isnan(p2)
+    bad_pressure = ~incomplete & (p1 <= p2)
+    bad_sg = ~incomplete & ~bad_pressure & (sg <= 0)
+    valid = ~(incomplete | bad_pressure | bad_sg)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(valid, q * np.sqrt(sg / delta_p), np.nan)
+    if decimals is not None:
+        cv = np.round(cv, decimals)
+
+    reason = np.full(len(result), '', dtype=object)
+    reason[incomplete] = "Datos incompletos o no numéricos."
+    reason[bad_pressure] = "La presión de entrada debe ser mayor que la de salida."
+    reason[bad_sg] = "La gravedad específica debe ser positiva."
+
+    result['dP'] = delta_p
+    result['cv'] = cv
+    result['valido'] = valid
+    result['motivo'] = reason
+    return result
+
+# --- DIMENSIONAMIENTO DE VÁLVULAS PARA GAS Y VAPOR (ISA-75.01 / IEC 60534-2-1) ---
+
+# Constantes en unidades US: Q [scfh], W [lb/h], P [psia], T [°R], ρ [lb/ft³]
+N6_STEAM = 63.3
+N7_GAS = 1360.0
+COMPRESSIBLE_SERVICES = ('gas', 'vapor')
+GAS_SCHEDULE_COLUMNS = ['Q', 'Gg', 'P1', 'P2', 'T1']
+STEAM_SCHEDULE_COLUMNS = ['W', 'rho1', 'P1', 'P2']
+# Columnas opcionales y su valor cuando faltan (k = relación de calores específicos, xT = factor de caída crítica)
+COMPRESSIBLE_DEFAULTS = {
+    'gas': {'Z': 1.0, 'k': 1.40, 'xT': 0.72, 'Fp': 1.0},
+    'vapor': {'k': 1.33, 'xT': 0.72, 'Fp': 1.0},
+}
+
+def calculate_cv_compressible_batch(schedule, service='gas', decimals=2):
+    """Calcula el Cv de gas (Q, Gg, P1, P2, T1) o vapor (W, rho1, P1, P2) para todos los casos a la vez.
+
+    Aplica el factor de expansión Y = 1 - x / (3·Fk·xT) y detecta flujo crítico (choked) cuando
+    x = ΔP/P1 alcanza Fk·xT; en ese caso x se limita a Fk·xT e Y vale 2/3. Las columnas opcionales
+    (Z, k, xT, Fp) toman los valores de COMPRESSIBLE_DEFAULTS. Igual que en líquidos, las filas
+    inválidas quedan con `cv` vacío, `valido=False` y el motivo en `motivo`.
+    """
+    required = GAS_SCHEDULE_COLUMNS if service == 'gas' else STEAM_SCHEDULE_COLUMNS
+    result = schedule.copy()
+
+    def column(name, default=None):
+        if name not in schedule.columns:
+            return np.full(len(schedule), default, dtype=float)
+        values = pd.to_numeric(schedule[name], errors='coerce').to_numpy(dtype=float)
+        return values if default is None else np.where(np.isnan(values), default, values)
+
+    flow, prop, p1, p2 = (column(c) for c in required[:4])
+    options = {name: column(name, default) for name, default in COMPRESSIBLE_DEFAULTS[service].items()}
+    k, xt, fp = options['k'], options['xT'], options['Fp']
+    delta_p = p1 - p2
+
+    incomplete = np.isnan(flow) | np.isnan(prop) | np.isnan(p1) | np.isnan(p2)
+    if service == 'gas':
+        t1 = column('T1') + 459.67
+        incomplete |= np.isnan(t1)
+    bad_pressure = ~incomplete & ((p1 <= p2) | (p2 < 0))
+    bad_property = ~incomplete & ~bad_pressure & ((prop <= 0) | (k <= 0) | (xt <= 0) | (xt > 1) | (fp <= 0))
+    if service == 'gas':
+        bad_property |= ~incomplete & ~bad_pressure & ((t1 <= 0) | (options['Z'] <= 0))
+    valid = ~(incomplete | bad_pressure | bad_property)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = delta_p / p1
+        x_choked = k / 1.40 * xt
+        choked = valid & (x >= x_choked)
+        x_sizing = np.where(choked, x_choked, x)
+        y = np.where(choked, 2 / 3, 1 - x_sizing / (3 * x_choked))
+        if service == 'gas':
+            cv = flow / (N7_GAS * fp * p1 * y) * np.sqrt(prop * t1 * options['Z'] / x_sizing)
+        else:
+            cv = flow / (N6_STEAM * fp * y * np.sqrt(x_sizing * p1 * prop))
+    cv = np.where(valid, cv, np.nan)
+    if decimals is not None:
+        cv = np.round(cv, decimals)
+
+    reason = np.full(len(result), '', dtype=object)
+    reason[incomplete] = "Datos incompletos o no numéricos."
+    reason[bad_pressure] = "La presión de entrada debe ser mayor que la de salida (presiones absolutas)."
+    reason[bad_property] = "Propiedades del fluido o de la válvula fuera de rango (Gg/ρ, T, Z, k, xT, Fp)."
+    regime = np.where(choked, 'crítico (choked)', np.where(valid, 'subcrítico', ''))
+
+    result['dP'] = delta_p
+    result['x'] = np.where(valid, x, np.nan)
+    result['Y'] = np.where(valid, y, np.nan)
+    result['cv'] = cv
+    result['regimen'] = regime
+    result['valido'] = valid
+    result['motivo'] = reason
+    return result
+
+def calculate_cv_compressible(service, flow, prop, p1, p2, t1=None, **options):
+    """Cv de un único caso de gas o vapor; devuelve (fila de resultado como dict, mensaje de error)."""
+    case = dict(zip(GAS_SCHEDULE_COLUMNS if service == 'gas' else STEAM_SCHEDULE_COLUMNS, (flow, prop, p1, p2, t1)))
+    case.update(options)
+    row = calculate_cv_compressible_batch(pd.DataFrame([case]), service).iloc[0]
+    if not row['valido']:
+        return None, row['motivo']
+    return row.to_dict(), None
+
+def calculate_orifice_flow(dp, k):
+    if dp < 0 or k <=0:
+        return None, "La presión diferencial y el factor K deben ser positivos."
+    flow = k * math.sqrt(dp)
+    return round(flow, 2), None
+
+def calculate_orifice_flow_array(dp, k, low_flow_cutoff=0.0):
+    """Aplica Q = K·√ΔP a un arreglo de lecturas; ΔP negativo y caudales bajo el corte se llevan a cero."""
+    flow = k * np.sqrt(np.clip(np.asarray(dp, dtype=float), 0.0, None))
+    flow[flow < low_flow_cutoff] = 0.0
+    return flow
+
+def iter_orifice_totals(source, k, dp_column='dp', time_column=None, sample_period=1.0,
+                        low_flow_cutoff=0.0, flow_time_base=3600.0, chunksize=500_000):
+    """Lee una serie de ΔP por bloques y va integrando el caudal (regla del trapecio) en un total acumulado.
+
+    `source` es una ruta/archivo CSV o un iterable de DataFrames. Sin `time_column` se asume un periodo
+    de muestreo fijo de `sample_period` segundos. `flow_time_base` son los segundos de la unidad de
+    tiempo del caudal (3600 para m³/h). Por cada bloque se devuelve un dict con el estado acumulado,
+    de modo que la memoria usada no depende de la longitud del archivo. Las muestras con ΔP o tiempo
+    vacío o no numérico se omiten (el trapecio une las muestras válidas vecinas, es decir, interpola
+    el hueco) y se cuentan en `muestras_invalidas`.
+    """
+    if isinstance(source, pd.DataFrame):
+        chunks = [source]
+    elif hasattr(source, 'read') or isinstance(source, str):
+        usecols = [dp_column] + ([time_column] if time_column else [])
+        chunks = pd.read_csv(source, usecols=usecols, chunksize=chunksize)
+    else:
+        chunks = source
+
+    state = {'total': 0.0, 'muestras': 0, 'muestras_corte': 0, 'muestras_invalidas': 0, 'duracion_s': 0.0, 'caudal_max': 0.0}
+    last_time, last_flow = None, None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        dp = pd.to_numeric(chunk[dp_column], errors='coerce').to_numpy(dtype=float)
+        if time_column:
+            stamps = pd.to_datetime(chunk[time_column], errors='coerce')
+            times = np.where(stamps.notna(), stamps.to_numpy(dtype='datetime64[ns]').astype('int64') / 1e9, np.nan)
+        else:
+            # Las filas inválidas también ocupan su periodo de muestreo
+            times = (state['muestras'] + state['muestras_invalidas'] + np.arange(len(dp))) * sample_period
+        valid = np.isfinite(dp) & np.isfinite(times)
+        state['muestras_invalidas'] += int(len(dp) - np.count_nonzero(valid))
+        if not valid.all():
+            dp, times = dp[valid], times[valid]
+        if not len(dp):
+            yield dict(state)
+            continue
+        flow = calculate_orifice_flow_array(dp, k, low_flow_cutoff)
+
+        # La última muestra del bloque anterior abre el primer trapecio de este bloque
+        if last_time is not None:
+            times = np.concatenate(([last_time], times))
+            flow_ext = np.concatenate(([last_flow], flow))
+        else:
+            flow_ext = flow
+        dt = np.diff(times)
+        state['total'] += float(np.sum((flow_ext[1:] + flow_ext[:-1]) * 0.5 * dt)) / flow_time_base
+        state['duracion_s'] += float(np.sum(dt))
+        state['muestras'] += len(flow)
+        state['muestras_corte'] += int(np.count_nonzero((flow == 0.0) & (dp > 0.0)))
+        state['caudal_max'] = max(state['caudal_max'], float(flow.max()))
+        last_time, last_flow = times[-1], flow[-1]
+        yield dict(state)
+
+def totalize_orifice_flow(source, k, **kwargs):
+    """Total integrado (contraparte del totalizador FQ) de una serie completa de ΔP; ver `iter_orifice_totals`."""
+    state = {'total': 0.0, 'muestras': 0, 'muestras_corte': 0, 'muestras_invalidas': 0, 'duracion_s': 0.0, 'caudal_max': 0.0}
+    for state in iter_orifice_totals(source, k, **kwargs):
+        pass
+    state['caudal_medio'] = state['total'] * kwargs.get('flow_time_base', 3600.0) / state['duracion_s'] if state['duracion_s'] > 0 else 0.0
+    return state
+
+# --- ÍNDICE NUMÉRICO DE RANGOS DEL CATÁLOGO ---
+
+RANGE_PATTERN = re.compile(r'(-?\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)\s*(.*)')
+ACCURACY_PATTERN = re.compile(r'±\s*(\d+(?:\.\d+)?)\s*(.*)')
+RANGE_COLUMNS = ['tag', 'variable', 'funcion', 'min', 'max', 'unidad', 'exactitud', 'exactitud_unidad']
+OPTIMAL_TOLERANCE = 0.3  # ±30% alrededor del 50% del campo de indicación
+
+def parse_instrument_ranges(database):
+    """Convierte los textos de rango y exactitud del catálogo en una tabla numérica (una fila por tag)."""
+    rows = []
+    for tag, specs in database.items():
+        range_match = RANGE_PATTERN.search(specs['rango_tipico'])
+        accuracy_match = ACCURACY_PATTERN.search(specs.get('exactitud_tipica', ''))
+        if range_match:
+            # La unidad puede ir detrás del rango ('0-10 bar') o delante ('Cv 0.1-1000')
+            unit = range_match.group(3).strip() or specs['rango_tipico'][:range_match.start()].strip()
+            min_range, max_range = float(range_match.group(1)), float(range_match.group(2))
+        else:
+            unit, min_range, max_range = specs['rango_tipico'], np.nan, np.nan
+        rows.append({
+            'tag': tag, 'variable': specs['variable'], 'funcion': specs['funcion'],
+            'min': min_range, 'max': max_range, 'unidad': unit,
+            'exactitud': float(accuracy_match.group(1)) if accuracy_match else np.nan,
+            'exactitud_unidad': accuracy_match.group(2).strip() if accuracy_match else '',
+        })
+    return pd.DataFrame(rows, columns=RANGE_COLUMNS)
+
+def build_range_index(ranges):
+    """Agrupa la tabla de rangos por variable y ordena cada grupo por el punto óptimo (50% del campo)."""
+    index = {}
+    for variable, group in ranges.groupby(ranges['variable'].str.lower(), sort=False):
+        parsed = group.dropna(subset=['min', 'max'])
+        optimal = ((parsed['max'] - parsed['min']) * 0.5 + parsed['min']).to_numpy()
+        order = np.argsort(optimal, kind='stable')
+        optimal = optimal[order]
+        # Los límites inferior y superior de aceptación crecen con el punto óptimo, así que
+        # ambos quedan ordenados y cada consulta se resuelve con dos búsquedas binarias.
+        tolerance = OPTIMAL_TOLERANCE * np.maximum(optimal, 1e-6)
+        index[variable] = {
+            'rows': group.index.to_numpy(),
+            'sorted_rows': parsed.index.to_numpy()[order],
+            'optimal': optimal,
+            'lower': optimal - tolerance,
+            'upper': optimal + tolerance,
+        }
+    return index
+
+# Se construyen en el primer uso (ver `get_instrument_index`) para no importar pandas al cargar
+INSTRUMENT_RANGES = None
+INSTRUMENT_INDEX = None
+
+def get_instrument_index():
+    """Devuelve (tabla de rangos, índice por variable), construyéndolos una sola vez."""
+    if INSTRUMENT_INDEX is None:
+        refresh_instrument_index()
+    return INSTRUMENT_RANGES, INSTRUMENT_INDEX
+
+@functools.lru_cache(maxsize=256)
+def _matching_variables(variable_type):
+    """Variables del índice que contienen el texto buscado (misma regla que la búsqueda original)."""
+    key = variable_type.lower()
+    return tuple(variable for variable in get_instrument_index()[1] if key in variable)
+
+def refresh_instrument_index():
+    """Reconstruye la tabla de rangos y el índice tras modificar INSTRUMENT_DATABASE."""
+    global INSTRUMENT_RANGES, INSTRUMENT_INDEX
+    INSTRUMENT_RANGES = parse_instrument_ranges(INSTRUMENT_DATABASE)
+    INSTRUMENT_INDEX = build_range_index(INSTRUMENT_RANGES)
+    _matching_variables.cache_clear()
+
+def load_instrument_catalog(catalog):
+    """Añade a INSTRUMENT_DATABASE un catálogo propio (DataFrame o ruta CSV con columna 'tag' y los campos de la base)."""
+    if not isinstance(catalog, pd.DataFrame):
+        catalog = pd.read_csv(catalog, dtype=str)
+    fields = ['variable', 'funcion', 'rango_tipico', 'exactitud_tipica']
+    for record in catalog[['tag'] + fields].fillna('').to_dict('records'):
+        INSTRUMENT_DATABASE[record.pop('tag')] = record
+    refresh_instrument_index()
+    return len(catalog)
+
+def select_instrument_for_measurement(variable_type, measurement_value, accuracy_required=True):
+    """Selecciona el instrumento adecuado basado en la variable y exactitud requerida."""
+    ranges, index = get_instrument_index()
+    rows = []
+    for variable in _matching_variables(variable_type):
+        entry = index[variable]
+        if not accuracy_required:
+            rows.extend(entry['rows'])
+            continue
+        # Para medición con exactitud, el valor debe estar cerca del 50% del campo de indicación.
+        # Se acota el tramo candidato por búsqueda binaria y se confirma con la regla exacta.
+        start = np.searchsorted(entry['upper'], measurement_value - 1e-9 * abs(measurement_value), side='left')
+        stop = np.searchsorted(entry['lower'], measurement_value + 1e-9 * abs(measurement_value), side='right')
+        if start >= stop:
+            continue
+        optimal = entry['optimal'][start:stop]
+        within = np.abs(measurement_value - optimal) / np.maximum(optimal, 1e-6) <= OPTIMAL_TOLERANCE
+        rows.extend(entry['sorted_rows'][start:stop][within])
+
+    tags = ranges['tag'].to_numpy()
+    return [(tags[row], INSTRUMENT_DATABASE[tags[row]]) for row in sorted(rows)]
+
+# --- INTERPRETACIÓN DE TAGS ISA-5.1 (INDIVIDUAL Y POR LOTES) ---
+
+TAG_PATTERN = re.compile(r'^([A-Z]{1,4})(\d+)([A-Z]*)$')
+TAG_COLUMNS = ['tag', 'letras', 'lazo', 'sufijo', 'descripcion', 'en_base_datos', 'rango_tipico', 'exactitud_tipica']
+
+def parse_tag(tag):
+    """Divide un tag en (letras, número de lazo, sufijo); devuelve None si el formato no es válido."""
+    match = TAG_PATTERN.match(tag.upper().replace('-', ''))
+    return match.groups() if match else None
+
+@functools.lru_cache(maxsize=4096)
+def describe_tag_letters(letters):
+    """Descripción textual de un código de letras ISA-5.1 (memorizada por código)."""
+    description = FIRST_LETTER.get(letters[0], 'Variable Desconocida')
+    functions = [SUCCESSOR_LETTERS.get(l, 'Función Desconocida') for l in letters[1:]]
+    if functions:
+        description += " con funciones de " + " y ".join(functions)
+    return description
+
+def interpret_tags(tags):
+    """Interpreta una colección de tags y devuelve un DataFrame con letras, lazo, sufijo, descripción y datos de catálogo."""
+    tags = pd.Series(tags, dtype="string").str.strip()
+    parts = tags.str.upper().str.replace('-', '', regex=False).str.extract(TAG_PATTERN)
+    parts.columns = ['letras', 'lazo', 'sufijo']
+    valid = parts['letras'].notna()
+
+    # Las descripciones y búsquedas se resuelven una vez por código de letras distinto
+    codes = parts.loc[valid, 'letras'].unique()
+    descriptions = {code: describe_tag_letters(code) for code in codes}
+    ranges = {code: INSTRUMENT_DATABASE[code]['rango_tipico'] for code in codes if code in INSTRUMENT_DATABASE}
+    accuracies = {code: INSTRUMENT_DATABASE[code]['exactitud_tipica'] for code in codes if code in INSTRUMENT_DATABASE}
+
+    result = pd.DataFrame({'tag': tags})
+    result[['letras', 'lazo', 'sufijo']] = parts
+    result['descripcion'] = parts['letras'].map(descriptions)
+    result['en_base_datos'] = parts['letras'].isin(ranges.keys())
+    result['rango_tipico'] = parts['letras'].map(ranges)
+    result['exactitud_tipica'] = parts['letras'].map(accuracies)
+    return result[TAG_COLUMNS]
+
+def iter_tag_column(source, column=None, chunksize=50_000):
+    """Recorre por bloques la columna de tags de un CSV o Excel; `column` por defecto es la primera."""
+    name = getattr(source, 'name', source)
+    if isinstance(name, str) and name.lower().endswith(('.xlsx', '.xls')):
+        frame = pd.read_excel(source, usecols=[column] if column else [0], dtype=str)
+        chunks = (frame.iloc[i:i + chunksize] for i in range(0, len(frame), chunksize))
+    else:
+        chunks = pd.read_csv(source, usecols=[column] if column else [0], dtype=str, chunksize=chunksize)
+    for chunk in chunks:
+        yield chunk.iloc[:, 0].to_numpy()
+
+def interpret_tag_file(source, column=None, chunksize=50_000):
+    """Interpreta un listado de tags (CSV o Excel) procesándolo por bloques; `column` por defecto es la primera."""
+    results = [interpret_tags(tags) for tags in iter_tag_column(source, column, chunksize)]
+    if not results:
+        return pd.DataFrame(columns=TAG_COLUMNS)
+    return pd.concat(results, ignore_index=True)
+
+# --- HOJAS DE CALIBRACIÓN POR LOTES ---
+
+CALIBRATION_DEFAULTS = {'lrv_salida': 4.0, 'urv_salida': 20.0, 'puntos': 5, 'histeresis': False}
+CALIBRATION_COLUMNS = ['tag', 'paso', 'direccion', 'porcentaje', 'pv', 'salida']
+TRUE_STRINGS = ('true', 'verdadero', 'si', 'sí', 'yes')
+
+def _as_flag_array(values):
+    """Columna booleana de un listado: números distintos de cero, bools y sí/true/yes son verdaderos.
+
+    Cubre lo que llega de CSV y Excel: 1.0 (columna numérica con huecos), True, "Sí", "TRUE"...
+    Vacíos y NaN son falsos.
+    """
+    text = pd.Series(values).astype('string').str.strip().str.lower()
+    numbers = pd.to_numeric(text, errors='coerce')
+    return ((numbers.fillna(0) != 0) | text.isin(TRUE_STRINGS).fillna(False)).to_numpy(dtype=bool)
+
+def calibration_points(instruments):
+    """Genera en una sola pasada vectorizada los puntos de calibración de todos los instrumentos.
+
+    `instruments` es un DataFrame con columnas tag, lrv, urv y opcionalmente lrv_salida, urv_salida,
+    puntos (número de puntos ascendentes, por defecto 5 = 0-25-50-75-100%) e histeresis (si es
+    verdadero se añaden los puntos descendentes sin repetir el 100%). Devuelve (tabla larga,
+    tags inválidos) donde la tabla tiene una fila por punto.
+    """
+    frame = instruments.copy()
+    for column, default in CALIBRATION_DEFAULTS.items():
+        if column not in frame.columns:
+            frame[column] = default
+    # Celdas vacías toman el valor por defecto; texto no numérico queda NaN y el instrumento se marca inválido
+    columns = {}
+    for column in ('lrv', 'urv', 'lrv_salida', 'urv_salida', 'puntos'):
+        values = pd.to_numeric(frame[column], errors='coerce')
+        if column in CALIBRATION_DEFAULTS:
+            blank = frame[column].isna()
+            if not pd.api.types.is_numeric_dtype(frame[column]):
+                blank |= (frame[column].astype('string').str.strip() == '').fillna(False)
+            values = values.mask(blank, CALIBRATION_DEFAULTS[column])
+        columns[column] = values.to_numpy(dtype=float)
+    lrv, urv, lrv_out, urv_out, points = (columns[c] for c in ('lrv', 'urv', 'lrv_salida', 'urv_salida', 'puntos'))
+    hysteresis = _as_flag_array(frame['histeresis'])
+
+    with np.errstate(invalid='ignore'):
+        valid = (np.isfinite(lrv) & np.isfinite(urv) & np.isfinite(lrv_out) & np.isfinite(urv_out)
+                 & (urv > lrv) & (urv_out > lrv_out) & (points >= 2))
+    invalid_tags = frame.loc[~valid, 'tag'].tolist()
+    points = points[valid].astype(np.int64)
+    lrv, urv, lrv_out, urv_out, hysteresis = (a[valid] for a in (lrv, urv, lrv_out, urv_out, hysteresis))
+    tags = frame.loc[valid, 'tag'].to_numpy()
+
+    # Filas por instrumento y posición de cada fila dentro de su instrumento
+    rows = np.where(hysteresis, 2 * points - 1, points)
+    owner = np.repeat(np.arange(len(rows)), rows)
+    starts = np.cumsum(rows) - rows
+    position = np.arange(rows.sum()) - starts[owner]
+    n = points[owner]
+    descending = position >= n
+    step = np.where(descending, 2 * (n - 1) - position, position)
+    fraction = step / (n - 1)
+
+    table = pd.DataFrame({
+        'tag': tags[owner],
+        'paso': position + 1,
+        'direccion': np.where(descending, 'desc', 'asc'),
+        'porcentaje': fraction * 100,
+        'pv': lrv[owner] + fraction * (urv - lrv)[owner],
+        'salida': lrv_out[owner] + fraction * (urv_out - lrv_out)[owner],
+    })
+    return table[CALIBRATION_COLUMNS], invalid_tags
+
+def iter_instrument_chunks(source, chunk_instruments=5000):
+    """Recorre un listado de instrumentos (DataFrame o CSV) en bloques de `chunk_instruments` filas."""
+    if isinstance(source, pd.DataFrame):
+        return (source.iloc[i:i + chunk_instruments] for i in range(0, len(source), chunk_instruments))
+    return pd.read_csv(source, chunksize=chunk_instruments)
+
+def iter_calibration_sheets(source, chunk_instruments=5000):
+    """Recorre un listado de instrumentos (DataFrame o CSV) por bloques y genera la tabla de cada bloque."""
+    for chunk in iter_instrument_chunks(source, chunk_instruments):
+        yield calibration_points(chunk)
+
+def write_calibration_sheets(source, destination, fmt=None, chunk_instruments=5000):
+    """Escribe las hojas de calibración de toda la planta en CSV o Parquet sin tenerlas todas en memoria.
+
+    El formato se deduce de la extensión de `destination` si no se indica. Parquet requiere pyarrow.
+    Devuelve un resumen con instrumentos y filas escritas y los tags inválidos omitidos.
+    """
+    fmt = fmt or ('parquet' if str(getattr(destination, 'name', destination)).endswith('.parquet') else 'csv')
+    summary = {'instrumentos': 0, 'filas': 0, 'invalidos': []}
+    parquet_writer, csv_started = None, False
+    try:
+        for table, invalid in iter_calibration_sheets(source, chunk_instruments):
+            summary['instrumentos'] += table['tag'].nunique()
+            summary['filas'] += len(table)
+            summary['invalidos'] += invalid
+            if fmt == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                # Esquema fijo: el de un bloque vacío (todo inválido) o con tags numéricos no coincidiría con el resto
+                if parquet_writer is None:
+                    schema = pa.schema([('tag', pa.string()), ('paso', pa.int64()), ('direccion', pa.string()),
+                                        ('porcentaje', pa.float64()), ('pv', pa.float64()), ('salida', pa.float64())])
+                    parquet_writer = pq.ParquetWriter(destination, schema)
+                if len(table):
+                    batch = pa.Table.from_pandas(table.assign(tag=table['tag'].astype(str)), schema=schema, preserve_index=False)
+                    parquet_writer.write_table(batch)
+            else:
+                table.to_csv(destination, mode='a' if csv_started else 'w', header=not csv_started, index=False)
+                csv_started = True
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return summary
+
+# --- ANÁLISIS DE ERRORES: ENVOLVENTE Y MONTE CARLO ---
+
+def error_components(min_range, max_range, values, error_a, error_b, error_c, error_d):
+    """Contribuciones A/B/C/D (en unidades de la variable) y combinadas (suma y RSS).
+
+    Todos los argumentos pueden ser escalares o arreglos y se difunden entre sí, así que sirve
+    tanto para recorrer un rango como para evaluar miles de instrumentos distintos de una vez.
+    """
+    min_range, max_range, values = (np.asarray(v, dtype=float) for v in (min_range, max_range, values))
+    shape = np.broadcast(min_range, max_range, values, error_a, error_b, error_c, error_d).shape
+    err_a = np.broadcast_to(np.abs(error_a) / 100 * np.abs(max_range), shape)
+    err_b = np.broadcast_to(np.abs(error_b) / 100 * (max_range - min_range), shape)
+    err_c = np.broadcast_to(np.abs(error_c) / 100 * np.abs(values), shape)
+    err_d = np.broadcast_to(np.abs(np.asarray(error_d, dtype=float)), shape)
+    return {
+        'A': err_a, 'B': err_b, 'C': err_c, 'D': err_d,
+        'peor_caso': err_a + err_b + err_c + err_d,
+        'rss': np.sqrt(err_a**2 + err_b**2 + err_c**2 + err_d**2),
+    }
+
+def error_envelope(min_range, max_range, error_a, error_b, error_c, error_d, points=2000):
+    """Errores tipo A/B/C/D y combinados (suma y RSS) a lo largo de todo el campo de indicación.
+
+    Los porcentajes se dan como en la hoja de datos (0.5 = ±0.5%). Devuelve un DataFrame con una
+    fila por punto evaluado; el cálculo es un único paso vectorizado sobre `points` valores.
+    """
+    values = np.linspace(min_range, max_range, points)
+    return pd.DataFrame({'valor': values,
+                         **error_components(min_range, max_range, values, error_a, error_b, error_c, error_d)})
+
+def monte_carlo_error(measurement_value, min_range, max_range, error_a, error_b, error_c, error_d,
+                      draws=100_000, confidence=0.95, seed=None):
+    """Propaga los cuatro tipos de error por Monte Carlo y devuelve el intervalo de confianza de la lectura.
+
+    Cada especificación ±e se modela como distribución rectangular en [-e, e] (criterio habitual
+    para límites de fabricante); las contribuciones se suman muestra a muestra.
+    """
+    rng = np.random.default_rng(seed)
+    span = max_range - min_range
+    limits = np.array([
+        abs(error_a) / 100 * abs(max_range),
+        abs(error_b) / 100 * span,
+        abs(error_c) / 100 * abs(measurement_value),
+        abs(error_d),
+    ])
+    deviations = (rng.uniform(-1.0, 1.0, size=(draws, 4)) * limits).sum(axis=1)
+    readings = measurement_value + deviations
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(readings, [tail, 100 - tail])
+    return {
+        'media': float(readings.mean()),
+        'desviacion': float(deviations.std()),
+        'inferior': float(lower),
+        'superior': float(upper),
+        'peor_caso': float(limits.sum()),
+        'rss': float(np.sqrt((limits**2).sum())),
+        'confianza': confidence,
+        'muestras': draws,
+    }
+
+# --- FUNCIONES PARA EL CENTRO DE PRÁCTICA (EXPANDIDAS) ---
+
+# Candidatos de distractores numéricos: múltiplos del valor correcto (fuera de ±10%) y
+# desplazamientos proporcionales al span, que siguen siendo distintos cuando el valor es 0.
+DISTRACTOR_FACTORS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.1, 1.2, 1.3, 1.4, 1.5)
+DISTRACTOR_SPAN_OFFSETS = (-0.25, -0.2, -0.15, -0.1, -0.05, 0.05, 0.1, 0.15, 0.2, 0.25)
+
+def pick_distractors(correct, candidates, n=3, fallback=()):
+    """Elige hasta n distractores distintos de `correct` muestreando sin reemplazo de un conjunto finito.
+
+    Si `candidates` no aporta suficientes opciones distintas se completa con `fallback`. El coste es
+    proporcional al número de candidatos, nunca depende de la suerte del muestreo.
+    """
+    pool = list(dict.fromkeys(c for c in candidates if c != correct))
+    chosen = random.sample(pool, min(n, len(pool)))
+    if len(chosen) < n:
+        extra = [c for c in dict.fromkeys(fallback) if c != correct and c not in chosen]
+        chosen += random.sample(extra, min(n - len(chosen), len(extra)))
+    return chosen
+
+def scaling_distractors(base_value, span, decimals, n=3):
+    """Distractores numéricos para un resultado de escalamiento, formateados con los decimales de la respuesta."""
+    correct = f"{base_value:.{decimals}f}"
+    values = [base_value * f for f in DISTRACTOR_FACTORS] + [base_value + o * span for o in DISTRACTOR_SPAN_OFFSETS]
+    return pick_distractors(correct, (f"{v:.{decimals}f}" for v in values), n)
+
+# Intentos para encontrar un problema que el usuario no haya visto; si todos están vistos se repite
+UNSEEN_ATTEMPTS = 20
+
+def draw_unseen(draw, key, seen=None):
+    """Sortea parámetros con `draw()` hasta que su clave canónica `key(params)` no esté en `seen`.
+
+    `seen` es cualquier conjunto con `in` y `add` (p. ej. el filtro de Bloom del historial); la
+    clave del problema elegido se añade a `seen`. Sin `seen` equivale a un único sorteo.
+    """
+    for _ in range(UNSEEN_ATTEMPTS if seen is not None else 1):
+        params = draw()
+        if seen is None or key(params) not in seen:
+            break
+    if seen is not None:
+        seen.add(key(params))
+    return params
+
+def generate_scaling_quiz(seen=None):
+    """Genera un ejercicio de escalamiento aleatorio (distinto de los de `seen`, si se indica)."""
+    pv_types = [{'name': 'Presión', 'units': 'bar'}, {'name': 'Temperatura', 'units': '°C'}, {'name': 'Nivel', 'units': '%'}, {'name': 'Caudal', 'units': 'm³/h'}]
+    signal_types = [{'name': 'Corriente', 'units': 'mA', 'lrv': 4, 'urv': 20}, {'name': 'Voltaje', 'units': 'V', 'lrv': 1, 'urv': 5}]
+
+    def draw():
+        pv, signal = random.choice(pv_types), random.choice(signal_types)
+        lrv_pv, urv_pv = round(random.uniform(0, 50)), round(random.uniform(100, 500))
+        to_output = random.choice([True, False])
+        if to_output:
+            input_val = round(random.uniform(lrv_pv, urv_pv), 1)
+        else:
+            input_val = round(random.uniform(signal['lrv'], signal['urv']), 2)
+        return pv, signal, lrv_pv, urv_pv, to_output, input_val
+
+    pv, signal, lrv_pv, urv_pv, to_output, input_val = draw_unseen(
+        draw, lambda p: f"escalamiento|{p[0]['name']}|{p[1]['name']}|{p[2]}|{p[3]}|{p[4]:d}|{p[5]}", seen)
+
+    if to_output: # PV -> OUT
+        correct_out = (((input_val - lrv_pv) / (urv_pv - lrv_pv)) * (signal['urv'] - signal['lrv'])) + signal['lrv']
+        question = f"Un transmisor de **{pv['name']}** con rango **{lrv_pv} a {urv_pv} {pv['units']}** y salida **{signal['lrv']}-{signal['urv']} {signal['units']}**, ¿qué salida corresponde a **{input_val} {pv['units']}**?"
+        correct_answer = f"{correct_out:.2f}"
+        unit = signal['units']
+        base_value, span, decimals = correct_out, signal['urv'] - signal['lrv'], 2
+    else: # OUT -> PV
+        correct_out = (((input_val - signal['lrv']) / (signal['urv'] - signal['lrv'])) * (urv_pv - lrv_pv)) + lrv_pv
+        question = f"Un transmisor de **{pv['name']}** con rango **{lrv_pv} a {urv_pv} {pv['units']}** y salida **{signal['lrv']}-{signal['urv']} {signal['units']}**, ¿qué PV corresponde a **{input_val} {signal['units']}**?"
+        correct_answer = f"{correct_out:.1f}"
+        unit = pv['units']
+        base_value, span, decimals = correct_out, urv_pv - lrv_pv, 1
+        
+    options = [correct_answer] + scaling_distractors(base_value, span, decimals)
+    
+    return question, [f"{o} {unit}" for o in options], f"{correct_answer} {unit}"
+
+def generate_tag_quiz(seen=None):
+    """Genera un ejercicio de identificación de tags ISA-5.1 (el número de lazo no cuenta para `seen`)."""
+    def draw():
+        return random.choice(list(FIRST_LETTER.keys())), random.sample(list(SUCCESSOR_LETTERS.keys()), random.randint(1, 2))
+
+    first, successors = draw_unseen(draw, lambda p: f"tags|{p[0]}{''.join(p[1])}", seen)
+    tag = f"{first}{''.join(successors)}-{random.randint(100,999)}"
+    
+    question = f"¿Qué significa el tag **{tag}** según ISA-5.1?"
+    
+    # Respuesta Correcta
+    desc = [FIRST_LETTER[first]]
+    for letter in successors:
+        desc.append(SUCCESSOR_LETTERS[letter])
+    correct_answer = " - ".join(desc)
+    
+    # Distractores: combinaciones aleatorias y, sólo si hicieran falta, la misma función con otra variable
+    first_values = list(dict.fromkeys(FIRST_LETTER.values()))
+    succ_values = list(SUCCESSOR_LETTERS.values())
+    candidates = [f"{w_first} - {' - '.join(random.sample(succ_values, len(successors)))}"
+                  for w_first in random.sample(first_values, 6)]
+    fallback = [f"{w_first} - {' - '.join(desc[1:])}" for w_first in first_values]
+    options = [correct_answer] + pick_distractors(correct_answer, candidates, 3, fallback)
+            
+    return question, options, correct_answer
+
+def generate_error_quiz(seen=None):
+    """Genera un ejercicio de selección de instrumentos y cálculo de errores (distinto de los de `seen`)."""
+    variables = ['Presión', 'Temperatura', 'Nivel', 'Caudal']
+    units = {'Presión': 'bar', 'Temperatura': '°C', 'Nivel': 'm', 'Caudal': 'm³/h'}
+
+    def draw():
+        variable = random.choice(variables)
+        # Generar valor a medir
+        if variable == 'Presión':
+            measurement_value = round(random.uniform(5, 15), 1)
+        elif variable == 'Temperatura':
+            measurement_value = round(random.uniform(100, 400), 0)
+        elif variable == 'Nivel':
+            measurement_value = round(random.uniform(2, 8), 1)
+        else:  # Caudal
+            measurement_value = round(random.uniform(50, 500), 0)
+        return variable, measurement_value
+
+    variable, measurement_value = draw_unseen(draw, lambda p: f"seleccion|{p[0]}|{p[1]}", seen)
+    unit = units[variable]
+    
+    # Seleccionar instrumento adecuado
+    suitable_instruments = select_instrument_for_measurement(variable, measurement_value, accuracy_required=True)
+    
+    if not suitable_instruments:
+        # Fallback a cualquier instrumento de la variable
+        suitable_instruments = select_instrument_for_measurement(variable, measurement_value, accuracy_required=False)
+    
+    if suitable_instruments:
+        selected_instrument = random.choice(suitable_instruments)
+        instrument_tag = selected_instrument[0]
+        
+        question = f"Para medir **{measurement_value} {unit}** de {variable.lower()} con exactitud (valor al 50% del campo de indicación), ¿qué instrumento sería el más adecuado?"
+        
+        # Generar opciones
+        correct_answer = f"{instrument_tag} | {selected_instrument[1]['variable']} - {selected_instrument[1]['funcion']}"
+        
+        # Agregar distractores de otros instrumentos (muestreo sin reemplazo, sólo se formatean los elegidos)
+        all_instruments = list(INSTRUMENT_DATABASE.keys())
+        distractor_tags = [t for t in random.sample(all_instruments, min(4, len(all_instruments))) if t != instrument_tag][:3]
+        options = [correct_answer] + [
+            f"{t} | {INSTRUMENT_DATABASE[t]['variable']} - {INSTRUMENT_DATABASE[t]['funcion']}" for t in distractor_tags
+        ]
+        
+        return question, options, correct_answer, instrument_tag, measurement_value
+    
+    return None, None, None, None, None
@@ -0,0 +1,176 @@
+"""Historial persistente y compacto de la práctica de cada usuario en un archivo SQLite local.
+
+Cada intento es un registro de tamaño fijo (usuario, tema como entero, acierto, marca de tiempo).
+Los intentos se acumulan en un búfer compartido por todo el proceso y se escriben por lotes en
+una sola transacción, de modo que muchas sesiones concurrentes no abren una escritura por clic.
+Por sesión sólo hace falta guardar el identificador de usuario y dos contadores.
+
+Los problemas ya planteados a cada usuario se recuerdan en un filtro de Bloom de tamaño fijo
+(16 KiB por defecto) en lugar de guardar las preguntas: la memoria por usuario no crece con el
+número de ejercicios y comprobar si un problema ya salió cuesta unos microsegundos.
+"""
+import atexit
+import contextlib
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+PRACTICE_TOPICS = ('escalamiento', 'tags', 'seleccion')
+
+
+def _user_data_dir():
+    # Directorio de datos del usuario: %LOCALAPPDATA% en Windows, $XDG_DATA_HOME o ~/.local/share en el resto
+    base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_DATA_HOME')
+    return os.path.join(base or os.path.join(os.path.expanduser('~'), '.local', 'share'), 'instrumentacion')
+
+
+# Ruta fija (no relativa al directorio de arranque) para que la app y la CLI compartan el mismo historial
+DEFAULT_HISTORY_PATH = os.environ.get('INSTRUMENTACION_HISTORIAL') or os.path.join(_user_data_dir(), 'historial_practica.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intentos (
+    usuario TEXT NOT NULL,
+    tema INTEGER NOT NULL,
+    correcto INTEGER NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intentos_usuario ON intentos (usuario, tema);
+CREATE TABLE IF NOT EXISTS vistos (
+    usuario TEXT PRIMARY KEY,
+    bits BLOB NOT NULL,
+    hashes INTEGER NOT NULL,
+    elementos INTEGER NOT NULL
+);
+"""
+
+
+class SeenFilter:
+    """Filtro de Bloom de las claves canónicas de los problemas vistos (sin falsos negativos).
+
+    Con 2^17 bits y 7 funciones hash la probabilidad de descartar por error un problema nuevo es
+    ~0.2% tras 10 000 problemas. Las k posiciones se derivan de un único blake2b (doble hashing).
+    """
+
+    def __init__(self, size_bits=2 ** 17, hashes=7, bits=None, count=0):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray(size_bits // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def false_positive_rate(self):
+        """Probabilidad estimada de que un problema nuevo parezca ya visto."""
+        return (1 - math.exp(-self.hashes * self.count / self.size_bits)) ** self.hashes
+
+
+class PracticeHistory:
+    """Almacén de intentos con escrituras por lotes (por tamaño de búfer o por antigüedad)."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, batch_size=64, flush_interval=5.0):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_seen = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        atexit.register(self.flush)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Transacción (commit o rollback) y cierre de la conexión al salir del bloque
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _due(self):
+        # Llamar con el candado tomado
+        pending = len(self._pending) + len(self._pending_seen)
+        return pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def record(self, user, topic, correct, ts=None):
+        """Registra un intento; se escribe en disco al llenarse el búfer o pasado `flush_interval`."""
+        row = (user, PRACTICE_TOPICS.index(topic), int(bool(correct)), time.time() if ts is None else ts)
+        with self._lock:
+            self._pending.append(row)
+            due = self._due()
+        if due:
+            self.flush()
+
+    def load_seen(self, user):
+        """Filtro de problemas vistos del usuario (uno vacío si aún no tiene)."""
+        with self._lock:
+            pending = self._pending_seen.get(user)
+        if pending is not None:
+            return SeenFilter(pending[0], pending[1], pending[2], pending[3])
+        with self._connect() as conn:
+            row = conn.execute('SELECT bits, hashes, elementos FROM vistos WHERE usuario = ?', (user,)).fetchone()
+        if row is None:
+            return SeenFilter()
+        return SeenFilter(len(row[0]) * 8, row[1], row[0], row[2])
+
+    def save_seen(self, user, seen):
+        """Guarda el filtro del usuario; se escribe con el mismo criterio de lote que los intentos."""
+        with self._lock:
+            self._pending_seen[user] = (seen.size_bits, seen.hashes, bytes(seen.bits), seen.count)
+            due = self._due()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Escribe todos los intentos y filtros pendientes en una única transacción."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            seen, self._pending_seen = self._pending_seen, {}
+            self._last_flush = time.monotonic()
+        if not rows and not seen:
+            return 0
+        with self._connect() as conn:
+            conn.executemany('INSERT INTO intentos (usuario, tema, correcto, ts) VALUES (?, ?, ?, ?)', rows)
+            conn.executemany('INSERT OR REPLACE INTO vistos (usuario, bits, hashes, elementos) VALUES (?, ?, ?, ?)',
+                             [(user, bits, hashes, count) for user, (_, hashes, bits, count) in seen.items()])
+        return len(rows)
+
+    def user_stats(self, user):
+        """Aciertos y total por tema del usuario, incluidos los intentos aún no escritos."""
+        stats = {topic: {'correct': 0, 'total': 0} for topic in PRACTICE_TOPICS}
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT tema, SUM(correcto), COUNT(*) FROM intentos WHERE usuario = ? GROUP BY tema', (user,)
+            ).fetchall()
+        with self._lock:
+            pending = [(r[1], r[2], 1) for r in self._pending if r[0] == user]
+        for topic, correct, total in rows + pending:
+            stats[PRACTICE_TOPICS[topic]]['correct'] += correct
+            stats[PRACTICE_TOPICS[topic]]['total'] += total
+        return stats
+
+    def user_totals(self, user):
+        """(aciertos, total) del usuario sumando todos los temas."""
+        stats = self.user_stats(user)
+        return sum(s['correct'] for s in stats.values()), sum(s['total'] for s in stats.values())
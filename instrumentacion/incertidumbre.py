@@ -0,0 +1,134 @@
+"""Incertidumbre combinada de lazos completos (sensor, transmisor, tarjeta de E/S, escalamiento...).
+
+El listado de la planta trae una fila por componente de cada lazo: `lazo`, `componente`, el rango
+calibrado (`lrv`, `urv`), el punto de operación opcional (`valor`) y las especificaciones del
+fabricante `error_a`..`error_d` (A: % del máximo del rango, B: % del span, C: % de la lectura,
+D: absoluto en unidades de la variable). Si un componente no trae especificación se toma la
+`exactitud_tipica` de INSTRUMENT_DATABASE a partir de su `codigo` (o de las letras del `tag`):
+"±0.25%" se interpreta como % del span (B) y "±0.5°C" como error absoluto (D).
+
+Todas las contribuciones se calculan en una pasada vectorizada sobre todas las filas y se suman
+por lazo con `np.bincount`: peor caso = suma lineal de todos los términos y RSS = raíz de la suma
+de sus cuadrados. Los lazos cuyo error (según el criterio elegido) supera la tolerancia se marcan.
+"""
+from instrumentacion.core import ERROR_TYPES, TAG_PATTERN, error_components, get_instrument_index, np, pd
+
+LOOP_COLUMNS = ['lazo', 'lrv', 'urv']
+SPEC_COLUMNS = ['error_a', 'error_b', 'error_c', 'error_d']
+LOOP_CRITERIA = ('rss', 'peor_caso')
+# Especificación por defecto de componentes sin dato ni código de catálogo
+DEFAULT_COMPONENT_SPECS = {
+    'tarjeta': {'error_b': 0.1},       # entrada analógica típica 4–20 mA: ±0.1% del span
+    'escalamiento': {'error_b': 0.0},  # escalamiento lineal en el DCS: sin error propio
+}
+LOOP_RESULT_COLUMNS = ['lazo', 'componentes', 'lrv', 'urv', 'valor', 'peor_caso', 'rss', 'peor_caso_pct', 'rss_pct',
+                       'tolerancia_pct', 'excede', 'dominante', 'sin_especificacion']
+
+
+def catalog_error_specs():
+    """Especificaciones B/D por código del catálogo a partir del texto de `exactitud_tipica`."""
+    ranges, _ = get_instrument_index()
+    percent = ranges['exactitud_unidad'].str.startswith('%')
+    return pd.DataFrame({
+        'error_b': np.where(percent, ranges['exactitud'], 0.0),
+        'error_d': np.where(percent, 0.0, ranges['exactitud']),
+    }, index=ranges['tag']).dropna()
+
+
+def component_errors(components):
+    """Contribuciones A/B/C/D, peor caso y RSS [unidades] de cada fila del listado de componentes.
+
+    Completa el rango y el punto de operación de cada componente con los del primer componente de su
+    lazo que los tenga (el valor por defecto es el 50% del campo) y las especificaciones faltantes con
+    el catálogo o DEFAULT_COMPONENT_SPECS; `sin_especificacion` marca las filas que quedaron en cero.
+    """
+    missing = [c for c in LOOP_COLUMNS if c not in components.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+    frame = components.copy()
+    for column in ['lrv', 'urv', 'valor', *SPEC_COLUMNS]:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(float) if column in frame.columns else np.nan
+    loops = frame.groupby('lazo', sort=False)
+    for column in ('lrv', 'urv', 'valor'):
+        frame[column] = frame[column].fillna(loops[column].transform('first'))
+    frame['valor'] = frame['valor'].fillna((frame['lrv'] + frame['urv']) / 2)
+
+    given = frame[SPEC_COLUMNS].notna().any(axis=1)
+    if 'codigo' in frame.columns:
+        codes = frame['codigo'].astype('string').str.strip().str.upper()
+    elif 'tag' in frame.columns:
+        codes = frame['tag'].astype('string').str.upper().str.replace('-', '', regex=False).str.extract(TAG_PATTERN)[0]
+    else:
+        codes = pd.Series(pd.NA, index=frame.index, dtype='string')
+    catalog = catalog_error_specs()
+    from_catalog = ~given & codes.isin(catalog.index).fillna(False).to_numpy()
+    if from_catalog.any():
+        specs = catalog.reindex(codes[from_catalog])
+        frame.loc[from_catalog, ['error_b', 'error_d']] = specs.to_numpy()
+    if 'componente' in frame.columns:
+        kinds = frame['componente'].astype('string').str.strip().str.lower()
+        for kind, defaults in DEFAULT_COMPONENT_SPECS.items():
+            use_default = ~given & ~from_catalog & (kinds == kind).fillna(False).to_numpy()
+            for column, value in defaults.items():
+                frame.loc[use_default, column] = value
+            from_catalog |= use_default
+    frame['sin_especificacion'] = ~(given | from_catalog)
+    frame[SPEC_COLUMNS] = frame[SPEC_COLUMNS].fillna(0.0)
+
+    errors = error_components(frame['lrv'], frame['urv'], frame['valor'],
+                              *(frame[column].to_numpy() for column in SPEC_COLUMNS))
+    for key, values in errors.items():
+        frame[key] = values
+    return frame
+
+
+def loop_error_stackup(components, tolerance=1.0, criterion='rss'):
+    """Error combinado de cada lazo y bandera de tolerancia; devuelve (lazos, componentes).
+
+    `tolerance` es el error admisible en % del span (o la columna `tolerancia` del listado, si
+    existe, tomada por lazo). `criterion` elige qué combinación se compara: 'rss' (estadística,
+    lo habitual para presupuestos de incertidumbre) o 'peor_caso' (suma lineal, conservadora).
+    Las filas sin `lazo` no entran en ningún lazo y se marcan con `sin_lazo` en los componentes.
+    """
+    if criterion not in LOOP_CRITERIA:
+        raise ValueError(f"Criterio no soportado: {criterion}. Opciones: {', '.join(LOOP_CRITERIA)}")
+    frame = component_errors(components)
+    # Las filas sin lazo no se pueden sumar a ninguno: quedan marcadas en `sin_lazo` y fuera del resultado
+    assigned = (frame['lazo'].notna() & (frame['lazo'].astype('string').str.strip() != '').fillna(False)).to_numpy()
+    frame['sin_lazo'] = ~assigned
+    rows = frame[assigned]
+    codes, loop_ids = pd.factorize(rows['lazo'], sort=False)
+    n = len(loop_ids)
+    squares = sum(rows[key].to_numpy() ** 2 for key in ERROR_TYPES)
+    worst = np.bincount(codes, weights=rows['peor_caso'].to_numpy(), minlength=n)
+    rss = np.sqrt(np.bincount(codes, weights=squares, minlength=n))
+
+    # Primera fila de cada lazo (rango del lazo) y componente con mayor contribución en el peor caso
+    first = np.full(n, len(rows))
+    np.minimum.at(first, codes, np.arange(len(rows)))
+    order = np.lexsort((-rows['peor_caso'].to_numpy(), codes))
+    dominant_rows = order[np.r_[0, np.flatnonzero(np.diff(codes[order])) + 1]] if len(order) else order
+    names = rows['componente'] if 'componente' in rows.columns else pd.Series(np.arange(len(rows)), index=rows.index)
+
+    lrv, urv = rows['lrv'].to_numpy()[first], rows['urv'].to_numpy()[first]
+    span = urv - lrv
+    if 'tolerancia' in rows.columns:
+        # Primera tolerancia no vacía de cada lazo; sin ninguna, la general
+        limits = pd.to_numeric(rows['tolerancia'], errors='coerce').groupby(codes).first().reindex(range(n)).to_numpy()
+        limits = np.where(np.isnan(limits), tolerance, limits)
+    else:
+        limits = np.full(n, float(tolerance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        worst_pct, rss_pct = worst / span * 100, rss / span * 100
+    compared = rss_pct if criterion == 'rss' else worst_pct
+    loops = pd.DataFrame({
+        'lazo': loop_ids,
+        'componentes': np.bincount(codes, minlength=n),
+        'lrv': lrv, 'urv': urv, 'valor': rows['valor'].to_numpy()[first],
+        'peor_caso': worst, 'rss': rss, 'peor_caso_pct': worst_pct, 'rss_pct': rss_pct,
+        'tolerancia_pct': limits,
+        'excede': compared > limits,
+        'dominante': names.to_numpy()[dominant_rows],
+        'sin_especificacion': np.bincount(codes, weights=rows['sin_especificacion'].to_numpy(), minlength=n).astype(int),
+    }, columns=LOOP_RESULT_COLUMNS)
+    return loops, frame
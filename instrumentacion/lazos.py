@@ -0,0 +1,196 @@
+"""Índice de lazos y tags del listado de instrumentos de la planta.
+
+Los tags se guardan por columnas (tag, letras, primera letra, letras de función, lazo, sufijo);
+las columnas de texto corto se codifican como enteros sobre un vocabulario ordenado. Cada
+columna categórica tiene un índice secundario (permutación estable + desplazamientos por código)
+y el número de lazo una permutación ordenada que se consulta con búsqueda binaria. Una consulta
+parte del criterio más selectivo y filtra el resto sobre esos pocos candidatos.
+
+El índice completo se vuelca a un directorio de archivos .npy que se reabre mapeado en memoria,
+así que reiniciar la aplicación no vuelve a leer ni a interpretar el listado.
+"""
+import json
+import os
+
+from instrumentacion.core import TAG_PATTERN, iter_tag_column, np, pd
+
+CATEGORY_COLUMNS = ('letras', 'primera', 'funcion', 'sufijo')
+LOOP_INDEX_COLUMNS = ['tag', 'letras', 'lazo', 'sufijo']
+_CACHE_VERSION = 1
+_META_FILE = 'indice.json'
+
+
+def _code_dtype(size):
+    return np.int16 if size < 2 ** 15 else np.int32
+
+
+def _category_index(codes, size):
+    """Permutación estable por código y desplazamientos: las posiciones del código c son orden[d[c]:d[c+1]]."""
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    offsets = np.searchsorted(codes[order], np.arange(size + 1)).astype(np.int32)
+    return order, offsets
+
+
+def _as_values(values):
+    if isinstance(values, str):
+        values = values.replace('/', ' ').replace(',', ' ').split() or [values]
+    return {str(v).strip().upper().replace('-', '') for v in values}
+
+
+class TagIndex:
+    """Índice columnar de tags con consultas por letras, función, sufijo y rango de lazos."""
+
+    def __init__(self, columns, vocabularies, invalid=0):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.invalid = invalid
+        self._codes = {name: {v: i for i, v in enumerate(vocab)} for name, vocab in vocabularies.items()}
+        self._labels = {name: np.asarray(vocab, dtype=object) for name, vocab in vocabularies.items()}
+
+    def __len__(self):
+        return len(self.columns['lazo'])
+
+    @classmethod
+    def from_tags(cls, tags):
+        """Construye el índice a partir de una colección de tags; los de formato no válido se descartan."""
+        tags = pd.Series(tags, dtype="string").str.strip()
+        parts = tags.str.upper().str.replace('-', '', regex=False).str.extract(TAG_PATTERN)
+        valid = parts[0].notna().to_numpy()
+        parts, tags = parts[valid], tags[valid]
+
+        columns, vocabularies = {}, {}
+        categories = {'letras': parts[0], 'primera': parts[0].str[0], 'funcion': parts[0].str[1:], 'sufijo': parts[2]}
+        for name, values in categories.items():
+            codes, uniques = pd.factorize(values.astype(object), sort=True)
+            columns[name] = codes.astype(_code_dtype(len(uniques)))
+            vocabularies[name] = tuple(str(u) for u in uniques)
+            columns[name + '_orden'], columns[name + '_desplaz'] = _category_index(columns[name], len(uniques))
+
+        columns['lazo'] = parts[1].astype('int64').to_numpy()
+        columns['lazo_orden'] = np.argsort(columns['lazo'], kind='stable').astype(np.int32)
+        columns['lazo_ordenado'] = columns['lazo'][columns['lazo_orden']]
+        columns['tag'] = tags.str.encode('utf-8').to_numpy().astype('S') if len(tags) else np.array([], dtype='S1')
+        return cls(columns, vocabularies, invalid=int((~valid).sum()))
+
+    # --- CONSULTAS ---
+
+    def _criteria(self, letters, first, functions, suffix, loops):
+        criteria = []
+        for name, values in (('letras', letters), ('primera', first), ('funcion', functions), ('sufijo', suffix)):
+            if values is None:
+                continue
+            codes = [self._codes[name][v] for v in _as_values(values) if v in self._codes[name]]
+            offsets = self.columns[name + '_desplaz']
+            size = sum(int(offsets[c + 1] - offsets[c]) for c in codes)
+            criteria.append((size, name, codes))
+        if loops is not None:
+            low, high = (loops, loops) if np.isscalar(loops) else loops
+            # Un extremo None deja el rango abierto por ese lado
+            low, high = (-np.inf if low is None else low), (np.inf if high is None else high)
+            ordered = self.columns['lazo_ordenado']
+            start, stop = np.searchsorted(ordered, low, 'left'), np.searchsorted(ordered, high, 'right')
+            criteria.append((int(max(stop - start, 0)), 'lazo', (start, stop, low, high)))
+        return sorted(criteria, key=lambda c: c[0])
+
+    def _positions(self, name, arg):
+        if name == 'lazo':
+            start, stop = arg[:2]
+            return np.sort(self.columns['lazo_orden'][start:max(start, stop)])
+        order, offsets = self.columns[name + '_orden'], self.columns[name + '_desplaz']
+        slices = [order[offsets[c]:offsets[c + 1]] for c in arg]
+        if not slices:
+            return np.array([], dtype=np.int32)
+        return slices[0] if len(slices) == 1 else np.sort(np.concatenate(slices))
+
+    def _mask(self, name, arg, candidates):
+        if name == 'lazo':
+            loops = self.columns['lazo'][candidates]
+            return (loops >= arg[2]) & (loops <= arg[3])
+        return np.isin(self.columns[name][candidates], arg)
+
+    def positions(self, letters=None, first=None, functions=None, suffix=None, loops=None):
+        """Posiciones ordenadas de los tags que cumplen todos los criterios dados.
+
+        `letters`, `first`, `functions` y `suffix` aceptan un valor o varios ("LSH/LSL", ["PT", "PIT"]);
+        `loops` es un número de lazo o un rango inclusivo (200, 299); (200, None) es "desde el 200".
+        """
+        criteria = self._criteria(letters, first, functions, suffix, loops)
+        if not criteria:
+            return np.arange(len(self))
+        _, name, arg = criteria[0]
+        candidates = self._positions(name, arg)
+        for _, name, arg in criteria[1:]:
+            if not len(candidates):
+                break
+            candidates = candidates[self._mask(name, arg, candidates)]
+        return candidates
+
+    def frame(self, positions):
+        """DataFrame con tag, letras, lazo y sufijo de las posiciones indicadas."""
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({
+            'tag': np.char.decode(np.asarray(self.columns['tag'][positions]), 'utf-8'),
+            'letras': self._labels['letras'][self.columns['letras'][positions]],
+            'lazo': np.asarray(self.columns['lazo'][positions]),
+            'sufijo': self._labels['sufijo'][self.columns['sufijo'][positions]],
+        }, columns=LOOP_INDEX_COLUMNS)
+
+    def select(self, **criteria):
+        """Tags que cumplen los criterios de `positions`, como DataFrame."""
+        return self.frame(self.positions(**criteria))
+
+    def loop(self, number):
+        """Todos los instrumentos de un lazo."""
+        return self.select(loops=number)
+
+    # --- CACHÉ EN DISCO (MAPEADA EN MEMORIA) ---
+
+    def save(self, directory, source=None):
+        """Vuelca las columnas a `directory` como .npy; el índice de metadatos se escribe al final."""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, _META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name, array in self.columns.items():
+            np.save(os.path.join(directory, name + '.npy'), np.asarray(array))
+        meta = {'version': _CACHE_VERSION, 'columnas': list(self.columns), 'vocabularios': self.vocabularies,
+                'invalidos': self.invalid, 'origen': source}
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Reabre un índice guardado; con `mmap` las columnas se leen bajo demanda desde el disco."""
+        with open(os.path.join(directory, _META_FILE), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        columns = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r' if mmap else None)
+                   for name in meta['columnas']}
+        vocabularies = {name: tuple(vocab) for name, vocab in meta['vocabularios'].items()}
+        return cls(columns, vocabularies, invalid=meta['invalidos'])
+
+
+def build_tag_index(source, column=None, chunksize=50_000):
+    """Construye el índice leyendo por bloques la columna de tags de un CSV o Excel."""
+    chunks = list(iter_tag_column(source, column, chunksize))
+    return TagIndex.from_tags(np.concatenate(chunks) if chunks else [])
+
+
+def _source_signature(path, column):
+    stat = os.stat(path)
+    return {'ruta': os.path.abspath(path), 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'columna': column}
+
+
+def open_tag_index(path, column=None, cache_dir=None):
+    """Abre el índice del listado en `path` desde su caché mapeada, reconstruyéndola si el archivo cambió."""
+    cache_dir = cache_dir or path + '.indice'
+    signature = _source_signature(path, column)
+    meta_path = os.path.join(cache_dir, _META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as handle:
+            meta = json.load(handle)
+        if meta.get('version') == _CACHE_VERSION and meta.get('origen') == signature:
+            return TagIndex.load(cache_dir)
+    index = build_tag_index(path, column)
+    index.save(cache_dir, source=signature)
+    return TagIndex.load(cache_dir)
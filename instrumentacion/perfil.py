@@ -0,0 +1,79 @@
+"""Perfilado opcional de cada rerun de la app: tiempo por sección de la interfaz y por función llamada.
+
+Un mismo perfilador sirve para el rerun completo y para los reruns parciales de un fragmento:
+`finish` marca el final del rerun completo y cada rerun posterior de un fragmento abre su propia
+sesión con `restart` (el script no vuelve a ejecutarse, así que no se crea un perfilador nuevo).
+
+Cuando el perfilador está desactivado `section` devuelve un contexto nulo y no se envuelve ninguna
+función, de modo que el coste en producción es prácticamente cero.
+"""
+import contextlib
+import functools
+import json
+import time
+
+
+class RerunProfiler:
+    """Acumula los tiempos de un único rerun del script (o de un fragmento)."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.finished = False
+        self.restart()
+
+    def restart(self):
+        """Empieza una sesión nueva: reinicia el reloj, las secciones y las funciones."""
+        self.started = time.perf_counter()
+        self.sections = {}
+        self.calls = {}
+
+    def finish(self):
+        """Marca el rerun como terminado y devuelve su resumen."""
+        self.finished = True
+        return self.summary()
+
+    def section(self, name):
+        """Contexto que cronometra un bloque (pestaña, expander, barra lateral...)."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed_section(name)
+
+    @contextlib.contextmanager
+    def _timed_section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - start
+
+    def wrap(self, func, name=None):
+        """Devuelve `func` envuelta para contar llamadas y tiempo acumulado (o `func` si está desactivado)."""
+        if not self.enabled:
+            return func
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                count, total = self.calls.get(name, (0, 0.0))
+                self.calls[name] = (count + 1, total + time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        """Resumen del rerun: tiempo total, secciones y funciones ordenadas de mayor a menor coste."""
+        return {
+            'total_s': time.perf_counter() - self.started,
+            'secciones': dict(sorted(self.sections.items(), key=lambda item: -item[1])),
+            'funciones': {name: {'llamadas': count, 'total_s': total}
+                          for name, (count, total) in sorted(self.calls.items(), key=lambda item: -item[1][1])},
+        }
+
+    def append_log(self, path, **extra):
+        """Añade el resumen como una línea JSON a `path` para análisis posterior entre sesiones."""
+        record = {'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), **extra, **self.summary()}
+        with open(path, 'a', encoding='utf-8') as log:
+            log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record
@@ -0,0 +1,181 @@
+"""Paquetes imprimibles de hojas de calibración y análisis de errores, una hoja por instrumento.
+
+Las hojas se generan con los mismos cálculos de la aplicación (`calibration_points` y
+`error_envelope`). El listado se lee por bloques y cada bloque se renderiza en un proceso del
+pool; el proceso principal sólo mantiene `max_pending` bloques en vuelo y va escribiendo las
+hojas terminadas en un único ZIP, así que la memoria no crece con el tamaño de la planta.
+PDF es opcional y requiere weasyprint.
+"""
+import collections
+import html
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentacion.core import ERROR_TYPES, calibration_points, error_envelope, iter_instrument_chunks, np, pd
+
+REPORT_FORMATS = ('html', 'pdf')
+ERROR_COLUMNS = ('error_a', 'error_b', 'error_c', 'error_d')
+SHEET_POINT_COLUMNS = ('paso', 'direccion', 'porcentaje', 'pv', 'salida')
+ENVELOPE_COLUMNS = ('valor', 'A', 'B', 'C', 'D', 'peor_caso', 'rss')
+
+_SHEET_CSS = """
+body { font-family: Arial, Helvetica, sans-serif; font-size: 11px; margin: 24px; }
+h1 { font-size: 18px; margin-bottom: 2px; } h2 { font-size: 14px; margin-top: 18px; }
+table { border-collapse: collapse; width: 100%; margin-top: 6px; }
+th, td { border: 1px solid #999; padding: 3px 6px; text-align: right; }
+th { background: #eee; } td.texto { text-align: left; }
+.firmas { margin-top: 36px; display: flex; justify-content: space-between; }
+.firmas div { border-top: 1px solid #000; width: 30%; text-align: center; padding-top: 4px; }
+@media print { .salto { page-break-after: always; } }
+"""
+
+
+def _field(instrument, key, default):
+    value = instrument.get(key)
+    return default if value is None or pd.isna(value) else value
+
+
+def _page(title, body):
+    return (f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<style>{_SHEET_CSS}</style></head><body>{body}</body></html>')
+
+
+def _table(headers, rows, text_columns=()):
+    head = ''.join(f'<th>{html.escape(h)}</th>' for h in headers)
+    body = ''.join(
+        '<tr>' + ''.join(f'<td class="texto">{html.escape(str(v))}</td>' if i in text_columns else f'<td>{v}</td>'
+                         for i, v in enumerate(row)) + '</tr>'
+        for row in rows
+    )
+    return f'<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def render_instrument_sheet(instrument, calibration, envelope=None):
+    """HTML de la hoja de un instrumento: datos, puntos de calibración a completar en campo y errores.
+
+    `calibration` son las filas (paso, direccion, porcentaje, pv, salida) del instrumento y `envelope`
+    el DataFrame de `error_envelope` evaluado en los puntos ascendentes.
+    """
+    tag = str(instrument['tag'])
+    units = str(_field(instrument, 'unidad', ''))
+    out_units = str(_field(instrument, 'unidad_salida', 'mA'))
+    lrv_out = float(_field(instrument, 'lrv_salida', 4.0))
+    urv_out = float(_field(instrument, 'urv_salida', 20.0))
+    parts = [
+        f'<h1>Hoja de calibración · {html.escape(tag)}</h1>',
+        f'<p>{html.escape(str(_field(instrument, "descripcion", "")))}</p>',
+        _table(['Rango de medida', 'Señal de salida', 'Puntos'], [[
+            f'{instrument["lrv"]:g} a {instrument["urv"]:g} {html.escape(units)}',
+            f'{lrv_out:g} a {urv_out:g} {html.escape(out_units)}',
+            sum(1 for row in calibration if row[1] == 'asc'),
+        ]]),
+        '<h2>Puntos de verificación</h2>',
+        _table(['Paso', 'Dirección', '%', f'PV [{units}]', f'Salida esperada [{out_units}]',
+                f'Salida medida [{out_units}]', 'Error [%]'],
+               [[step, direction, f'{percent:.1f}', f'{pv:.3f}', f'{output:.3f}', '', '']
+                for step, direction, percent, pv, output in calibration], text_columns=(1,)),
+    ]
+    if envelope is not None:
+        worst = envelope['peor_caso'].max()
+        span = instrument['urv'] - instrument['lrv']
+        parts += [
+            '<h2>Análisis de errores (especificación del fabricante)</h2>',
+            '<p>' + '; '.join(f'Tipo {key}: {html.escape(ERROR_TYPES[key])}' for key in 'ABCD') + '</p>',
+            _table([f'Valor [{units}]', 'A', 'B', 'C', 'D', 'Peor caso', 'RSS'],
+                   [[f'{row[0]:.3f}'] + [f'±{v:.4g}' for v in row[1:]]
+                    for row in np.column_stack([envelope[c].to_numpy() for c in ENVELOPE_COLUMNS])]),
+            f'<p><b>Peor caso máximo:</b> ±{worst:.4g} {html.escape(units)} ({worst / span * 100:.3f}% del span)</p>',
+        ]
+    parts.append('<div class="firmas"><div>Calibró</div><div>Revisó</div><div>Fecha</div></div>')
+    return _page(f'Hoja {tag}', ''.join(parts))
+
+
+def _sheet_bytes(page, fmt):
+    if fmt == 'pdf':
+        from weasyprint import HTML
+        return HTML(string=page).write_pdf()
+    return page.encode('utf-8')
+
+
+def render_chunk(chunk, fmt='html'):
+    """Renderiza las hojas de un bloque de instrumentos; devuelve ([(tag, contenido)], tags inválidos)."""
+    # Se calcula con la posición como tag para que los tags repetidos no mezclen sus puntos
+    records = chunk.to_dict('records')
+    table, invalid_positions = calibration_points(chunk.assign(tag=range(len(chunk))))
+    with_errors = any(column in chunk.columns for column in ERROR_COLUMNS)
+    owners = table['tag'].to_numpy()
+    rows = list(zip(*(table[column].tolist() for column in SHEET_POINT_COLUMNS)))
+    bounds = np.flatnonzero(np.diff(owners)) + 1
+    sheets = []
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]) if len(rows) else ():
+        instrument, calibration, envelope = records[owners[start]], rows[start:stop], None
+        if with_errors:
+            errors = [float(_field(instrument, column, 0.0)) for column in ERROR_COLUMNS]
+            points = sum(1 for row in calibration if row[1] == 'asc')
+            envelope = error_envelope(instrument['lrv'], instrument['urv'], *errors, points=points)
+        sheets.append((str(instrument['tag']), _sheet_bytes(render_instrument_sheet(instrument, calibration, envelope), fmt)))
+    return sheets, [records[position]['tag'] for position in invalid_positions]
+
+
+def render_instrument_report(instrument, fmt='html'):
+    """Hoja de un único instrumento (dict con tag, lrv, urv y opcionales) como bytes."""
+    sheets, invalid = render_chunk(pd.DataFrame([instrument]), fmt)
+    if invalid:
+        raise ValueError(f"Rango o número de puntos inválido para {instrument['tag']}")
+    return sheets[0][1]
+
+
+def _index_page(entries, invalid):
+    rows = [[f'<a href="{html.escape(name)}">{html.escape(tag)}</a>'] for tag, name in entries]
+    body = f'<h1>Paquete de hojas de calibración</h1><p>{len(entries)} instrumentos.</p>'
+    if invalid:
+        body += '<p><b>Omitidos por rango inválido:</b> ' + html.escape(', '.join(map(str, invalid))) + '</p>'
+    return _page('Índice', body + _table(['Instrumento'], rows))
+
+
+def write_report_archive(source, destination, fmt='html', workers=None, chunk_instruments=200, max_pending=None):
+    """Genera en paralelo las hojas de todo el listado y las escribe en un ZIP con un índice.
+
+    `source` es un DataFrame o CSV con tag, lrv, urv y opcionalmente unidad, descripcion, lrv_salida,
+    urv_salida, unidad_salida, puntos, histeresis y error_a..error_d (en % como en la hoja de datos;
+    error_d en unidades). Con `workers=1` todo se hace en el proceso actual. Devuelve un resumen.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}. Opciones: {', '.join(REPORT_FORMATS)}")
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    summary = {'instrumentos': 0, 'archivos': 0, 'invalidos': []}
+    entries, used_names = [], collections.Counter()
+
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        def collect(result):
+            sheets, invalid = result
+            summary['invalidos'] += invalid
+            for tag, content in sheets:
+                stem = re.sub(r'[^\w.-]+', '_', tag) or 'sin_tag'
+                used_names[stem] += 1
+                name = f'hojas/{stem}.{fmt}' if used_names[stem] == 1 else f'hojas/{stem}-{used_names[stem]}.{fmt}'
+                archive.writestr(name, content)
+                entries.append((tag, name))
+
+        chunks = iter_instrument_chunks(source, chunk_instruments)
+        if workers == 1:
+            for chunk in chunks:
+                collect(render_chunk(chunk, fmt))
+        else:
+            # 'spawn' evita heredar hilos y locks del proceso anfitrión (p. ej. el servidor de Streamlit)
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(render_chunk, chunk, fmt))
+                    if len(pending) >= max_pending:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+
+        archive.writestr('indice.html', _index_page(entries, summary['invalidos']))
+    summary['instrumentos'] = summary['archivos'] = len(entries)
+    return summary
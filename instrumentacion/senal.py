@@ -0,0 +1,261 @@
+"""Escalamiento en vivo de señales analógicas (4–20 mA, 0–10 V...) para puesta en marcha.
+
+Una fuente entrega bloques de muestras crudas; `LiveScaler` las escala a PV con el LRV/URV del
+lazo, guarda las últimas `capacity` en un búfer circular de tamaño fijo y actualiza mínimo,
+máximo, media y desviación de forma incremental (fusión de bloques de Chan/Welford), así que la
+memoria y el coste por lectura no dependen de cuánto tiempo lleve corriendo.
+
+Fuentes disponibles: `SimulatedSource` (lazo simulado local) y `ModbusTCPSource`, que lee
+registros de retención por Modbus-TCP. `ModbusSimulatorServer` es un servidor Modbus-TCP
+local mínimo que publica una fuente simulada para probar sin hardware.
+"""
+import math
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from instrumentacion.core import np
+
+# NAMUR NE 43: fuera de 3.8–20.5 mA la señal indica saturación o fallo del transmisor
+NAMUR_LIMITS = (3.8, 20.5)
+
+
+class RingBuffer:
+    """Búfer circular de tamaño fijo sobre un arreglo de NumPy; las escrituras por bloque son vectorizadas."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity)
+        self._next = 0
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)[-self.capacity:]
+        n = len(values)
+        first = min(n, self.capacity - self._next)
+        self._data[self._next:self._next + first] = values[:first]
+        self._data[:n - first] = values[first:]
+        self._next = (self._next + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def values(self):
+        """Copia de las muestras en orden cronológico (la más antigua primero)."""
+        if self.size < self.capacity:
+            return self._data[:self.size].copy()
+        return np.concatenate((self._data[self._next:], self._data[:self._next]))
+
+
+class RunningStats:
+    """Mínimo, máximo, media y desviación acumulados sin guardar las muestras."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if not n:
+            return
+        block_mean = float(values.mean())
+        block_m2 = float(((values - block_mean) ** 2).sum())
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        return {'muestras': self.count, 'minimo': self.minimum, 'maximo': self.maximum,
+                'media': self.mean, 'desviacion': self.std}
+
+
+class SimulatedSource:
+    """Lazo simulado: señal en mA con deriva lenta, ruido y picos ocasionales, a `rate` muestras/s.
+
+    `read` devuelve las muestras acumuladas desde la lectura anterior según el reloj, limitadas a
+    `max_block` para que una pausa larga no genere un bloque gigante.
+    """
+
+    def __init__(self, rate=1000.0, level=12.0, amplitude=4.0, period=30.0, noise=0.05,
+                 spike_probability=0.0005, max_block=50_000, seed=None):
+        self.rate = rate
+        self.level, self.amplitude, self.period = level, amplitude, period
+        self.noise, self.spike_probability = noise, spike_probability
+        self.max_block = max_block
+        self._rng = np.random.default_rng(seed)
+        self._sample = 0
+        self._last = time.monotonic()
+
+    def generate(self, n):
+        """Genera las próximas `n` muestras de la serie, sin tener en cuenta el reloj."""
+        t = (self._sample + np.arange(n)) / self.rate
+        self._sample += n
+        values = self.level + self.amplitude * np.sin(2 * np.pi * t / self.period)
+        values += self._rng.normal(0.0, self.noise, n)
+        spikes = self._rng.random(n) < self.spike_probability
+        values[spikes] = self._rng.choice([3.6, 21.0], int(spikes.sum()))
+        return values
+
+    def read(self):
+        now = time.monotonic()
+        due = int((now - self._last) * self.rate)
+        if due > self.max_block:
+            # El atraso se descarta: sólo se entregan las últimas `max_block` muestras
+            due, self._last = self.max_block, now
+        else:
+            self._last += due / self.rate
+        return self.generate(due)
+
+
+class ModbusTCPSource:
+    """Lee un registro de retención (función 3) por Modbus-TCP y lo convierte a la señal cruda.
+
+    `counts` es el rango de cuentas del canal analógico que corresponde a `signal_range`
+    (p. ej. 0–27648 para 4–20 mA en muchas tarjetas de PLC). Cada `read` hace `burst` lecturas
+    seguidas sobre la misma conexión y las devuelve como un bloque.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5020, register=0, unit=1, counts=(0, 27648),
+                 signal_range=(4.0, 20.0), burst=1, timeout=1.0):
+        self.host, self.port, self.register, self.unit = host, port, register, unit
+        self.burst = burst
+        self.counts, self.signal_range, self.timeout = counts, signal_range, timeout
+        self._socket = None
+        self._transaction = 0
+
+    def _connect(self):
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        return self._socket
+
+    def _receive(self, sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("El servidor Modbus cerró la conexión.")
+            data += chunk
+        return data
+
+    def read_register(self):
+        sock = self._connect()
+        self._transaction = (self._transaction + 1) % 65536
+        sock.sendall(struct.pack('>HHHBBHH', self._transaction, 0, 6, self.unit, 3, self.register, 1))
+        _, _, length, _, function = struct.unpack('>HHHBB', self._receive(sock, 8))
+        payload = self._receive(sock, length - 2)
+        if function != 3:
+            raise ConnectionError(f"Excepción Modbus {payload[0]} al leer el registro {self.register}.")
+        return struct.unpack('>H', payload[1:3])[0]
+
+    def read(self):
+        try:
+            raw = np.array([self.read_register() for _ in range(self.burst)], dtype=float)
+        except OSError:
+            self.close()
+            raise
+        low, high = self.counts
+        signal_low, signal_high = self.signal_range
+        return signal_low + (raw - low) / (high - low) * (signal_high - signal_low)
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class ModbusSimulatorServer(socketserver.ThreadingTCPServer):
+    """Servidor Modbus-TCP local que responde la función 3 con muestras de una fuente simulada."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 5020), source=None, counts=(0, 27648), signal_range=(4.0, 20.0)):
+        self.source = source or SimulatedSource(rate=1.0)
+        self.counts, self.signal_range = counts, signal_range
+        super().__init__(address, _ModbusHandler)
+
+    def current_counts(self):
+        value = float(self.source.generate(1)[0])
+        low, high = self.counts
+        signal_low, signal_high = self.signal_range
+        raw = low + (value - signal_low) / (signal_high - signal_low) * (high - low)
+        return int(min(max(round(raw), 0), 65535))
+
+    def start(self):
+        """Atiende peticiones en un hilo en segundo plano y devuelve el servidor."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _ModbusHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            header = b''
+            while len(header) < 12:
+                chunk = self.request.recv(12 - len(header))
+                if not chunk:
+                    return
+                header += chunk
+            transaction, _, _, unit, function, _, quantity = struct.unpack('>HHHBBHH', header)
+            if function != 3:
+                self.request.sendall(struct.pack('>HHHBBB', transaction, 0, 3, unit, function | 0x80, 1))
+                continue
+            registers = [self.server.current_counts() for _ in range(quantity)]
+            body = struct.pack(f'>BB{quantity}H', function, 2 * quantity, *registers)
+            self.request.sendall(struct.pack('>HHHB', transaction, 0, len(body) + 1, unit) + body)
+
+
+class LiveScaler:
+    """Escala a PV las muestras de una fuente y mantiene el búfer y las estadísticas de la sesión."""
+
+    def __init__(self, source, lrv, urv, signal_range=(4.0, 20.0), capacity=10_000, fault_limits=NAMUR_LIMITS):
+        self.source = source
+        self.lrv, self.urv = lrv, urv
+        self.signal_range = signal_range
+        self.fault_limits = fault_limits
+        self.buffer = RingBuffer(capacity)
+        self.stats = RunningStats()
+        self.faults = 0
+        self.last_signal = None
+
+    def scale(self, signal):
+        """PV correspondiente a una señal cruda (escalar o arreglo) con el rango configurado."""
+        low, high = self.signal_range
+        return self.lrv + (np.asarray(signal, dtype=float) - low) / (high - low) * (self.urv - self.lrv)
+
+    def poll(self):
+        """Lee lo disponible en la fuente, actualiza búfer y estadísticas y devuelve cuántas muestras llegaron."""
+        signal = self.source.read()
+        if not len(signal):
+            return 0
+        pv = self.scale(signal)
+        self.buffer.extend(pv)
+        self.stats.update(pv)
+        if self.fault_limits is not None:
+            self.faults += int(((signal < self.fault_limits[0]) | (signal > self.fault_limits[1])).sum())
+        self.last_signal = float(signal[-1])
+        return len(signal)
+
+    def snapshot(self, points=500):
+        """Estado para mostrar: última lectura, estadísticas y el búfer diezmado a `points` valores."""
+        values = self.buffer.values()
+        step = max(len(values) // points, 1)
+        return {
+            'senal': self.last_signal,
+            'pv': float(values[-1]) if len(values) else None,
+            'fallas': self.faults,
+            'estadisticas': self.stats.as_dict(),
+            'tendencia': values[::step],
+        }
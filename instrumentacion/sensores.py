@@ -0,0 +1,197 @@
+"""Linealización de sensores de temperatura: RTD de platino (Callendar–Van Dusen) y termopares ITS-90.
+
+La conversión directa (°C → Ω o mV) usa las ecuaciones de referencia. La inversa (Ω o mV → °C),
+que es la que se aplica a volcados del DCS con millones de muestras, se resuelve por defecto
+interpolando en una tabla precalculada cada 0.1 °C (error de interpolación < 0.001 °C); con
+`exact=True` se resuelve la ecuación de referencia por Newton sobre todo el arreglo, partiendo
+de la estimación de la tabla. Los valores fuera del rango del sensor devuelven NaN.
+
+Los termopares miden la diferencia respecto a la unión fría: la compensación suma la FEM de
+referencia a la temperatura de la unión fría antes de invertir.
+"""
+import functools
+
+from instrumentacion.core import np
+
+# Callendar–Van Dusen, IEC 60751 (α = 0.00385)
+CVD_A = 3.9083e-3
+CVD_B = -5.775e-7
+CVD_C = -4.183e-12
+RTD_RANGE = (-200.0, 850.0)
+
+# Funciones de referencia ITS-90 (NIST Monograph 175): tramos (t_min, t_max, coeficientes c0..cn) en mV
+THERMOCOUPLE_COEFFICIENTS = {
+    'K': [
+        (-270.0, 0.0, (0.0, 0.394501280250e-01, 0.236223735980e-04, -0.328589067840e-06, -0.499048287770e-08,
+                       -0.675090591730e-10, -0.574103274280e-12, -0.310888728940e-14, -0.104516093650e-16,
+                       -0.198892668780e-19, -0.163226974860e-22)),
+        (0.0, 1372.0, (-0.176004136860e-01, 0.389212049750e-01, 0.185587700320e-04, -0.994575928740e-07,
+                       0.318409457190e-09, -0.560728448890e-12, 0.560750590590e-15, -0.320207200030e-18,
+                       0.971511471520e-22, -0.121047212750e-25)),
+    ],
+    'J': [
+        (-210.0, 760.0, (0.0, 0.503811878150e-01, 0.304758369300e-04, -0.856810657200e-07, 0.132281952950e-09,
+                         -0.170529583370e-12, 0.209480906970e-15, -0.125383953360e-18, 0.156317256970e-22)),
+        (760.0, 1200.0, (0.296456256810e+03, -0.149761277860e+01, 0.317871039240e-02, -0.318476867010e-05,
+                         0.157208190040e-08, -0.306913690560e-12)),
+    ],
+    'T': [
+        (-270.0, 0.0, (0.0, 0.387481063640e-01, 0.441944343470e-04, 0.118443231050e-06, 0.200329735540e-07,
+                       0.901380195590e-09, 0.226511565930e-10, 0.360711542050e-12, 0.384939398830e-14,
+                       0.282135219250e-16, 0.142515947790e-18, 0.487686622860e-21, 0.107955392700e-23,
+                       0.139450270620e-26, 0.797951539270e-30)),
+        (0.0, 400.0, (0.0, 0.387481063640e-01, 0.332922278800e-04, 0.206182434040e-06, -0.218822568460e-08,
+                      0.109968809280e-10, -0.308157587720e-13, 0.454791352900e-16, -0.275129016730e-19)),
+    ],
+    'E': [
+        (-270.0, 0.0, (0.0, 0.586655087080e-01, 0.454109771240e-04, -0.779980486860e-06, -0.258001608430e-07,
+                       -0.594525830570e-09, -0.932140586670e-11, -0.102876055340e-12, -0.803701236210e-15,
+                       -0.439794973910e-17, -0.164147763550e-19, -0.396736195160e-22, -0.558273287210e-25,
+                       -0.346578420130e-28)),
+        (0.0, 1000.0, (0.0, 0.586655087100e-01, 0.450322755820e-04, 0.289084072120e-07, -0.330568966520e-09,
+                       0.650244032700e-12, -0.191974955040e-15, -0.125366004970e-17, 0.214892175690e-20,
+                       -0.143880417820e-23, 0.359608994810e-27)),
+    ],
+}
+# Término exponencial adicional del tipo K por encima de 0 °C: a0·exp(a1·(t − a2)²)
+TYPE_K_EXPONENTIAL = (0.118597600000e+00, -0.118343200000e-03, 0.126968600000e+03)
+
+SENSOR_TYPES = {
+    'Pt100': ('rtd', 100.0), 'Pt500': ('rtd', 500.0), 'Pt1000': ('rtd', 1000.0),
+    'Termopar K': ('tc', 'K'), 'Termopar J': ('tc', 'J'), 'Termopar T': ('tc', 'T'), 'Termopar E': ('tc', 'E'),
+}
+SENSOR_UNITS = {'rtd': 'Ω', 'tc': 'mV'}
+LUT_STEP = 0.1
+# La estimación de la tabla ya está a ~1e-5 °C: pocas iteraciones de Newton bastan para la precisión de máquina
+NEWTON_ITERATIONS = 3
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=float)
+
+
+def _grid(low, high):
+    return np.linspace(low, high, int(round((high - low) / LUT_STEP)) + 1)
+
+
+# --- RTD (CALLENDAR–VAN DUSEN) ---
+
+def rtd_resistance(temperature, r0=100.0):
+    """Resistencia [Ω] de una RTD de platino a la temperatura dada [°C] (ecuación exacta)."""
+    t = _as_array(temperature)
+    resistance = r0 * (1 + CVD_A * t + CVD_B * t ** 2 + np.where(t < 0, CVD_C * (t - 100) * t ** 3, 0.0))
+    return np.where((t >= RTD_RANGE[0]) & (t <= RTD_RANGE[1]), resistance, np.nan)
+
+
+def _rtd_exact(resistance, r0, start):
+    # Para R >= R0 la ecuación es cuadrática; por debajo de 0 °C se refina por Newton
+    ratio = resistance / r0
+    with np.errstate(invalid='ignore'):
+        t = (-CVD_A + np.sqrt(CVD_A ** 2 - 4 * CVD_B * (1 - ratio))) / (2 * CVD_B)
+    cold = ratio < 1
+    if cold.any():
+        tc = start[cold]
+        rc = ratio[cold]
+        for _ in range(NEWTON_ITERATIONS):
+            f = 1 + CVD_A * tc + CVD_B * tc ** 2 + CVD_C * (tc - 100) * tc ** 3 - rc
+            df = CVD_A + 2 * CVD_B * tc + CVD_C * (4 * tc ** 3 - 300 * tc ** 2)
+            tc = tc - f / df
+        t[cold] = tc
+    return t
+
+
+@functools.lru_cache(maxsize=8)
+def _rtd_table(r0):
+    temperatures = _grid(*RTD_RANGE)
+    return rtd_resistance(temperatures, r0), temperatures
+
+
+def rtd_temperature(resistance, r0=100.0, exact=False):
+    """Temperatura [°C] a partir de la resistencia [Ω]; tabla + interpolación o, con `exact`, ecuación exacta."""
+    r = _as_array(resistance)
+    table_r, table_t = _rtd_table(r0)
+    t = np.interp(r, table_r, table_t, left=np.nan, right=np.nan)
+    if exact:
+        # Newton asigna por máscara: se trabaja sobre arreglos 1-D y se devuelve la forma de la entrada
+        r1, t1 = np.atleast_1d(r), np.atleast_1d(np.asarray(t, dtype=float)).copy()
+        t = np.where(np.isnan(t1), np.nan, _rtd_exact(r1, r0, t1)).reshape(r.shape)[()]
+    return t
+
+
+# --- TERMOPARES (ITS-90) ---
+
+def _thermocouple_parts(t, tc_type, derivative=False):
+    """FEM [mV] (o su derivada) por tramos; NaN fuera del rango del tipo."""
+    segments = THERMOCOUPLE_COEFFICIENTS[tc_type]
+    result = np.full(t.shape, np.nan)
+    for i, (low, high, coefficients) in enumerate(segments):
+        mask = (t >= low) & (t <= high) if i == 0 else (t > low) & (t <= high)
+        if not mask.any():
+            continue
+        ts = t[mask]
+        if derivative:
+            values = np.polynomial.polynomial.polyval(ts, np.polynomial.polynomial.polyder(coefficients))
+        else:
+            values = np.polynomial.polynomial.polyval(ts, coefficients)
+        if tc_type == 'K' and low >= 0:
+            a0, a1, a2 = TYPE_K_EXPONENTIAL
+            exponential = a0 * np.exp(a1 * (ts - a2) ** 2)
+            values = values + (exponential * 2 * a1 * (ts - a2) if derivative else exponential)
+        result[mask] = values
+    return result
+
+
+def thermocouple_emf(temperature, tc_type):
+    """FEM [mV] de un termopar con la unión fría a 0 °C (función de referencia ITS-90)."""
+    return _thermocouple_parts(_as_array(temperature), tc_type)
+
+
+@functools.lru_cache(maxsize=8)
+def _thermocouple_table(tc_type):
+    segments = THERMOCOUPLE_COEFFICIENTS[tc_type]
+    temperatures = _grid(segments[0][0], segments[-1][1])
+    emf = thermocouple_emf(temperatures, tc_type)
+    # Cerca de −270 °C la sensibilidad tiende a cero: la tabla empieza donde la FEM ya es creciente
+    first = np.flatnonzero(np.diff(emf) <= 0)
+    start = first[-1] + 1 if len(first) else 0
+    return emf[start:], temperatures[start:]
+
+
+def thermocouple_temperature(emf, tc_type, cold_junction=0.0, exact=False):
+    """Temperatura [°C] de la unión caliente a partir de la FEM medida [mV] y la temperatura de la unión fría."""
+    total = _as_array(emf) + thermocouple_emf(cold_junction, tc_type)
+    table_e, table_t = _thermocouple_table(tc_type)
+    t = np.interp(total, table_e, table_t, left=np.nan, right=np.nan)
+    if exact:
+        t = np.atleast_1d(np.asarray(t, dtype=float)).copy()
+        valid = ~np.isnan(t)
+        tv, ev = t[valid], np.atleast_1d(total)[valid]
+        for _ in range(NEWTON_ITERATIONS):
+            tv = tv - (_thermocouple_parts(tv, tc_type) - ev) / _thermocouple_parts(tv, tc_type, derivative=True)
+            tv = np.clip(tv, table_t[0], table_t[-1])
+        t[valid] = tv
+        t = t.reshape(total.shape)[()]
+    return t
+
+
+def thermocouple_measured_emf(temperature, tc_type, cold_junction=0.0):
+    """FEM [mV] que mide el instrumento con la unión caliente y la fría a las temperaturas dadas."""
+    return thermocouple_emf(temperature, tc_type) - thermocouple_emf(cold_junction, tc_type)
+
+
+# --- INTERFAZ COMÚN POR TIPO DE SENSOR ---
+
+def sensor_to_temperature(values, sensor, cold_junction=0.0, exact=False):
+    """Convierte la señal cruda de un sensor de SENSOR_TYPES (Ω o mV) a °C."""
+    kind, parameter = SENSOR_TYPES[sensor]
+    if kind == 'rtd':
+        return rtd_temperature(values, parameter, exact=exact)
+    return thermocouple_temperature(values, parameter, cold_junction, exact=exact)
+
+
+def temperature_to_sensor(temperature, sensor, cold_junction=0.0):
+    """Señal cruda (Ω o mV) que entrega un sensor de SENSOR_TYPES a la temperatura dada [°C]."""
+    kind, parameter = SENSOR_TYPES[sensor]
+    if kind == 'rtd':
+        return rtd_resistance(temperature, parameter)
+    return thermocouple_measured_emf(temperature, parameter, cold_junction)
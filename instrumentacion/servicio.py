@@ -0,0 +1,351 @@
+"""Servicio HTTP/JSON local con los cálculos de la aplicación para MES, hojas de cálculo y scripts.
+
+Cada endpoint recibe un lote de entradas por petición (POST con JSON) y responde
+{"resultados": [...]} en el mismo orden:
+
+    POST /convertir  {"magnitud": "presion", "de": "bar", "a": "psi", "valores": [1, 2.5]}
+    POST /cv         {"servicio": "liquido", "casos": [{"Q": 100, "SG": 1, "P1": 50, "P2": 30}]}
+    POST /tags       {"tags": ["TIC-101A", "PDT-50"]}
+    POST /errores    {"casos": [{"lrv": 0, "urv": 900, "valor": 625, "error_a": 0.5, "error_d": 0.1}]}
+    GET  /salud      estado de la cola y contadores
+
+Las peticiones se validan en el hilo HTTP y se encolan en `BatchDispatcher`. Un hilo colector
+vacía la cola, agrupa las peticiones compatibles (misma operación y parámetros, p. ej. la misma
+pareja de unidades) y las resuelve con una sola llamada vectorizada en el pool de trabajo; luego
+reparte los resultados. La cola y los lotes en vuelo están acotados: cuando se llenan, el servicio
+responde 503 con Retry-After en lugar de acumular memoria. Sólo usa la biblioteca estándar.
+"""
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from instrumentacion.core import (
+    CV_SCHEDULE_COLUMNS, GAS_SCHEDULE_COLUMNS, STEAM_SCHEDULE_COLUMNS,
+    calculate_cv_compressible_batch, calculate_cv_liquid_batch, convert_array, error_components,
+    interpret_tags, np, pd,
+)
+from instrumentacion.unidades import UNITS
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_ITEMS_PER_REQUEST = 100_000
+ERROR_FIELDS = ('error_a', 'error_b', 'error_c', 'error_d')
+
+
+class ServiceBusy(Exception):
+    """La cola del servicio está llena; el cliente debe reintentar más tarde."""
+
+
+def _json_value(value):
+    """Escalar listo para JSON: NaN e infinitos pasan a null y los tipos de NumPy a tipos nativos."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return None if value is pd.NA else value
+
+
+def _records(frame, columns):
+    return [{column: _json_value(value) for column, value in zip(columns, row)}
+            for row in zip(*(frame[column].tolist() for column in columns))]
+
+
+def _split(items, sizes):
+    bounds = np.cumsum(sizes)[:-1]
+    return [list(part) for part in np.split(np.asarray(items, dtype=object), bounds)] if len(sizes) else []
+
+
+def _require_choice(body, field, options, message, default=None):
+    # Sólo texto: una lista u objeto JSON no es hashable y no debe llegar a la clave de agrupación
+    value = body.get(field, default)
+    if not isinstance(value, str) or value not in options:
+        raise ValueError(f"{message}. Opciones: {', '.join(options)}")
+    return value
+
+
+def _require_list(body, field):
+    values = body.get(field)
+    if not isinstance(values, list):
+        raise ValueError(f"El campo '{field}' debe ser una lista.")
+    if len(values) > MAX_ITEMS_PER_REQUEST:
+        raise ValueError(f"Máximo {MAX_ITEMS_PER_REQUEST} elementos por petición.")
+    return values
+
+
+# --- OPERACIONES: VALIDACIÓN (prepare) Y CÁLCULO POR LOTE COALESCIDO (run) ---
+# prepare(body) -> (clave de agrupación, carga, elementos); run(clave, cargas) -> una lista de resultados por carga
+
+def _prepare_convert(body):
+    dimension = _require_choice(body, 'magnitud', UNITS, "Magnitud no soportada")
+    from_unit = _require_choice(body, 'de', UNITS[dimension], "Unidad no soportada")
+    to_unit = _require_choice(body, 'a', UNITS[dimension], "Unidad no soportada")
+    try:
+        values = np.asarray(_require_list(body, 'valores'), dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("Los valores deben ser numéricos.") from None
+    decimals = body.get('decimales')
+    if decimals is not None and (isinstance(decimals, bool) or not isinstance(decimals, int) or decimals < 0):
+        raise ValueError("'decimales' debe ser un entero no negativo.")
+    return (dimension, from_unit, to_unit, decimals), values, len(values)
+
+
+def _run_convert(key, payloads):
+    dimension, from_unit, to_unit, decimals = key
+    converted = convert_array(np.concatenate(payloads), dimension, from_unit, to_unit, decimals)
+    return [[_json_value(v) for v in part] for part in np.split(converted, np.cumsum([len(p) for p in payloads])[:-1])]
+
+
+CV_SERVICES = {'liquido': CV_SCHEDULE_COLUMNS, 'gas': GAS_SCHEDULE_COLUMNS, 'vapor': STEAM_SCHEDULE_COLUMNS}
+
+
+def _prepare_cv(body):
+    service = _require_choice(body, 'servicio', CV_SERVICES, "Servicio no soportado", default='liquido')
+    cases = _require_list(body, 'casos')
+    if not all(isinstance(case, dict) for case in cases):
+        raise ValueError("Cada caso debe ser un objeto con las columnas del servicio.")
+    return service, cases, len(cases)
+
+
+def _run_cv(service, payloads):
+    schedule = pd.DataFrame([case for cases in payloads for case in cases])
+    for column in CV_SERVICES[service]:
+        if column not in schedule.columns:
+            schedule[column] = np.nan
+    if service == 'liquido':
+        sized, extra = calculate_cv_liquid_batch(schedule), []
+    else:
+        sized, extra = calculate_cv_compressible_batch(schedule, service), ['x', 'Y', 'regimen']
+    return _split(_records(sized, ['dP', *extra, 'cv', 'valido', 'motivo']), [len(p) for p in payloads])
+
+
+def _prepare_tags(body):
+    tags = _require_list(body, 'tags')
+    return None, [str(tag) for tag in tags], len(tags)
+
+
+def _run_tags(_, payloads):
+    result = interpret_tags([tag for tags in payloads for tag in tags])
+    return _split(_records(result, list(result.columns)), [len(p) for p in payloads])
+
+
+def _prepare_errors(body):
+    cases = _require_list(body, 'casos')
+    try:
+        frame = pd.DataFrame(cases, columns=['lrv', 'urv', 'valor', *ERROR_FIELDS], dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("Cada caso necesita lrv, urv y opcionalmente valor y error_a..error_d numéricos.") from None
+    if frame[['lrv', 'urv']].isna().any().any() or (frame['urv'] <= frame['lrv']).any():
+        raise ValueError("Cada caso necesita lrv < urv.")
+    # Sin 'valor' se evalúa en el URV, donde el error tipo C es máximo
+    frame['valor'] = frame['valor'].fillna(frame['urv'])
+    return None, frame.fillna(0.0), len(frame)
+
+
+def _run_errors(_, payloads):
+    frame = pd.concat(payloads, ignore_index=True)
+    errors = error_components(frame['lrv'], frame['urv'], frame['valor'],
+                              *(frame[field].to_numpy() for field in ERROR_FIELDS))
+    result = pd.DataFrame(errors)
+    result['porcentaje_span'] = result['peor_caso'] / (frame['urv'] - frame['lrv']) * 100
+    return _split(_records(result, list(result.columns)), [len(p) for p in payloads])
+
+
+OPERATIONS = {
+    'convertir': (_prepare_convert, _run_convert),
+    'cv': (_prepare_cv, _run_cv),
+    'tags': (_prepare_tags, _run_tags),
+    'errores': (_prepare_errors, _run_errors),
+}
+
+
+# --- DESPACHO: COLA ACOTADA, COALESCENCIA Y POOL DE TRABAJO ---
+
+class BatchDispatcher:
+    """Encola peticiones validadas y las resuelve en lotes coalescidos sobre un pool de hilos.
+
+    `max_queue` acota las peticiones en espera y `2 * workers` los lotes en vuelo. Tras recibir la
+    primera petición, el colector espera hasta `max_wait` segundos (o hasta `max_batch` elementos)
+    para juntar más; con carga, mientras el pool está ocupado la cola se llena sola y los lotes crecen.
+    """
+
+    def __init__(self, workers=4, max_queue=1024, max_batch=200_000, max_wait=0.0005):
+        self.max_batch, self.max_wait = max_batch, max_wait
+        self._queue = queue.Queue(max_queue)
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='instrumentacion-lote')
+        self._slots = threading.BoundedSemaphore(2 * workers)
+        self._lock = threading.Lock()
+        self.counters = {'peticiones': 0, 'rechazadas': 0, 'lotes': 0, 'elementos': 0}
+        self._collector = threading.Thread(target=self._collect, daemon=True, name='instrumentacion-colector')
+        self._collector.start()
+
+    def submit(self, operation, body):
+        """Valida `body` para la operación y devuelve un Future con su lista de resultados."""
+        prepare, _ = OPERATIONS[operation]
+        key, payload, size = prepare(body)
+        future = Future()
+        try:
+            self._queue.put_nowait((operation, key, payload, size, future))
+        except queue.Full:
+            with self._lock:
+                self.counters['rechazadas'] += 1
+            raise ServiceBusy() from None
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'en_cola': self._queue.qsize()}
+
+    def close(self):
+        self._queue.put((None, None, None, 0, None))
+        self._collector.join()
+        self._pool.shutdown(wait=True)
+
+    def _collect(self):
+        while True:
+            first = self._queue.get()
+            if first[0] is None:
+                return
+            jobs, items = [first], first[3]
+            deadline = time.monotonic() + self.max_wait
+            while items < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(deadline - time.monotonic(), 0)) if self.max_wait else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job[0] is None:
+                    self._queue.put(job)
+                    break
+                jobs.append(job)
+                items += job[3]
+
+            # Un trabajo defectuoso sólo falla su propia petición: el colector no debe morir
+            groups = {}
+            for job in jobs:
+                try:
+                    groups.setdefault((job[0], job[1]), []).append(job)
+                except Exception as exc:
+                    job[4].set_exception(exc)
+            for (operation, key), group in groups.items():
+                self._slots.acquire()
+                try:
+                    self._pool.submit(self._run_group, operation, key, group)
+                except Exception as exc:
+                    self._slots.release()
+                    for job in group:
+                        job[4].set_exception(exc)
+
+    def _run_group(self, operation, key, group):
+        try:
+            _, run = OPERATIONS[operation]
+            try:
+                results = run(key, [job[2] for job in group])
+            except Exception as exc:
+                for job in group:
+                    job[4].set_exception(exc)
+            else:
+                for job, result in zip(group, results):
+                    job[4].set_result(result)
+            with self._lock:
+                self.counters['peticiones'] += len(group)
+                self.counters['lotes'] += 1
+                self.counters['elementos'] += sum(job[3] for job in group)
+        finally:
+            self._slots.release()
+
+
+# --- SERVIDOR HTTP ---
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'InstrumentacionServicio/1.0'
+    # Cabeceras y cuerpo salen en escrituras separadas: sin TCP_NODELAY, Nagle + ACK diferido añaden ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status, payload, headers=()):
+        self._send(status, json.dumps(payload, ensure_ascii=False, allow_nan=False).encode('utf-8'), headers)
+
+    def _send(self, status, data, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/salud':
+            self._reply(200, {'estado': 'ok', 'operaciones': list(OPERATIONS), **self.server.dispatcher.stats()})
+        else:
+            self._reply(404, {'error': f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        operation = self.path.strip('/')
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Sin una longitud válida no se puede leer el cuerpo ni reutilizar la conexión
+            self.close_connection = True
+            self._reply(400, {'error': "Cabecera Content-Length inválida."})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._reply(413, {'error': f"Cuerpo mayor que {MAX_BODY_BYTES} bytes."})
+            return
+        raw = self.rfile.read(length)
+        if operation not in OPERATIONS:
+            self._reply(404, {'error': f"Operación desconocida: {operation}. Opciones: {', '.join(OPERATIONS)}"})
+            return
+        try:
+            body = json.loads(raw or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError("El cuerpo debe ser un objeto JSON.")
+            future = self.server.dispatcher.submit(operation, body)
+            results = future.result(timeout=self.server.timeout_seconds)
+        except ServiceBusy:
+            self._reply(503, {'error': "Servicio saturado, reintente."}, headers=[('Retry-After', '1')])
+        except TimeoutError:
+            self._reply(504, {'error': "Tiempo de cálculo agotado."})
+        except ValueError as exc:
+            self._reply(400, {'error': str(exc)})
+        except Exception as exc:  # Error de cálculo inesperado: se informa sin tumbar el servidor
+            self._reply(500, {'error': f"{type(exc).__name__}: {exc}"})
+        else:
+            # Un resultado no representable en JSON es un fallo del servidor (500), no debe cortar la conexión
+            try:
+                data = json.dumps({'resultados': results}, ensure_ascii=False, allow_nan=False).encode('utf-8')
+            except (TypeError, ValueError) as exc:
+                self._reply(500, {'error': f"Resultado no serializable: {exc}"})
+            else:
+                self._send(200, data)
+
+
+class CalculationServer(ThreadingHTTPServer):
+    """Servidor HTTP con un hilo por conexión (keep-alive) que delega los cálculos en un `BatchDispatcher`."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 8765), workers=4, max_queue=1024, max_wait=0.0005,
+                 timeout_seconds=30.0, verbose=False):
+        self.dispatcher = BatchDispatcher(workers=workers, max_queue=max_queue, max_wait=max_wait)
+        self.timeout_seconds, self.verbose = timeout_seconds, verbose
+        super().__init__(address, _ServiceHandler)
+
+    def start(self):
+        """Atiende peticiones en un hilo en segundo plano y devuelve el servidor."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def server_close(self):
+        super().server_close()
+        self.dispatcher.close()
@@ -0,0 +1,117 @@
+"""Registro de unidades de las variables de proceso con matrices de conversión precalculadas.
+
+Cada dimensión define sus unidades como una transformación afín a la unidad base
+(base = valor * escala + desplazamiento). Al cargar el módulo se construye, por dimensión,
+la matriz N×N de escalas y desplazamientos entre todas las unidades; `get_converter` entrega
+una función ya compilada para un par concreto que sirve igual para escalares, arreglos de
+NumPy y Series/DataFrames de pandas, sin búsquedas ni ramas en cada llamada.
+"""
+import functools
+
+PRESSURE_TO_PASCAL = {
+    'Pa': 1, 'kPa': 1000, 'MPa': 1e6, 'bar': 1e5, 'mbar': 100,
+    'psi': 6894.76, 'kg/cm²': 98066.5, 'atm': 101325,
+    'mmH2O': 9.80665, 'inH2O': 249.089
+}
+
+# Transformación afín a °C de cada unidad: celsius = valor * escala + desplazamiento
+TEMPERATURE_TO_CELSIUS = {
+    '°C': (1.0, 0.0),
+    '°F': (5/9, -32 * 5/9),
+    'K': (1.0, -273.15),
+    '°R': (5/9, -273.15),
+}
+
+# Unidad -> (escala, desplazamiento) hacia la unidad base de cada dimensión
+UNITS = {
+    'presion': {unit: (float(factor), 0.0) for unit, factor in PRESSURE_TO_PASCAL.items()},
+    'temperatura': dict(TEMPERATURE_TO_CELSIUS),
+    'caudal': {  # base m³/s
+        'm³/s': (1.0, 0.0), 'm³/h': (1 / 3600, 0.0), 'L/s': (1e-3, 0.0), 'L/min': (1e-3 / 60, 0.0),
+        'GPM': (3.785411784e-3 / 60, 0.0), 'ft³/min': (0.028316846592 / 60, 0.0),
+        'ft³/h': (0.028316846592 / 3600, 0.0), 'bbl/d': (0.158987294928 / 86400, 0.0),
+    },
+    'caudal_masico': {  # base kg/s
+        'kg/s': (1.0, 0.0), 'kg/h': (1 / 3600, 0.0), 't/h': (1000 / 3600, 0.0),
+        'lb/s': (0.45359237, 0.0), 'lb/h': (0.45359237 / 3600, 0.0),
+    },
+    'nivel': {  # base m
+        'm': (1.0, 0.0), 'cm': (1e-2, 0.0), 'mm': (1e-3, 0.0), 'in': (0.0254, 0.0), 'ft': (0.3048, 0.0),
+    },
+    'masa': {  # base kg
+        'kg': (1.0, 0.0), 'g': (1e-3, 0.0), 't': (1000.0, 0.0), 'lb': (0.45359237, 0.0),
+    },
+    'densidad': {  # base kg/m³
+        'kg/m³': (1.0, 0.0), 'g/cm³': (1000.0, 0.0), 'kg/L': (1000.0, 0.0),
+        'lb/ft³': (16.018463373960138, 0.0), 'lb/gal': (119.82642731689663, 0.0),
+    },
+    'velocidad': {  # base m/s
+        'm/s': (1.0, 0.0), 'mm/s': (1e-3, 0.0), 'km/h': (1 / 3.6, 0.0), 'ft/s': (0.3048, 0.0), 'ft/min': (0.00508, 0.0),
+    },
+}
+
+# Dimensiones asociadas a cada primera letra ISA-5.1 que tiene conversión de unidades
+VARIABLE_DIMENSIONS = {
+    'P': ('presion',), 'T': ('temperatura',), 'F': ('caudal', 'caudal_masico'), 'L': ('nivel',),
+    'W': ('masa',), 'D': ('densidad',), 'S': ('velocidad',), 'V': ('velocidad',),
+}
+
+DIMENSION_LABELS = {
+    'presion': 'Presión', 'temperatura': 'Temperatura', 'caudal': 'Caudal volumétrico',
+    'caudal_masico': 'Caudal másico', 'nivel': 'Nivel / Longitud', 'masa': 'Masa / Peso',
+    'densidad': 'Densidad', 'velocidad': 'Velocidad',
+}
+
+UNIT_DIMENSION = {unit: dimension for dimension, units in UNITS.items() for unit in units}
+
+
+def _build_matrix(units):
+    """Matrices de escala y desplazamiento entre todas las unidades de una dimensión."""
+    names = tuple(units)
+    scale = tuple(tuple(units[f][0] / units[t][0] for t in names) for f in names)
+    offset = tuple(tuple((units[f][1] - units[t][1]) / units[t][0] for t in names) for f in names)
+    return {'units': names, 'index': {u: i for i, u in enumerate(names)}, 'scale': scale, 'offset': offset}
+
+
+CONVERSION_MATRICES = {dimension: _build_matrix(units) for dimension, units in UNITS.items()}
+
+
+def _as_operand(values):
+    """Listas y tuplas pasan a ndarray; escalares, arreglos y objetos de pandas se usan tal cual."""
+    if isinstance(values, (list, tuple)):
+        import numpy as np
+        return np.asarray(values, dtype=float)
+    return values
+
+
+def _compile(scale, offset):
+    if offset == 0.0:
+        def convert(values):
+            return _as_operand(values) * scale
+    else:
+        def convert(values):
+            return _as_operand(values) * scale + offset
+    convert.scale, convert.offset = scale, offset
+    return convert
+
+
+@functools.lru_cache(maxsize=None)
+def get_converter(dimension, from_unit, to_unit):
+    """Función de conversión precompilada para el par de unidades, o None si alguna no pertenece a la dimensión."""
+    matrix = CONVERSION_MATRICES.get(dimension)
+    if matrix is None or from_unit not in matrix['index'] or to_unit not in matrix['index']:
+        return None
+    i, j = matrix['index'][from_unit], matrix['index'][to_unit]
+    return _compile(matrix['scale'][i][j], matrix['offset'][i][j])
+
+
+def dimension_of(unit):
+    """Dimensión a la que pertenece una unidad (None si no está registrada)."""
+    return UNIT_DIMENSION.get(unit)
+
+
+def convert(values, from_unit, to_unit):
+    """Convierte entre dos unidades de la misma dimensión; None si no son compatibles."""
+    dimension = UNIT_DIMENSION.get(from_unit)
+    converter = get_converter(dimension, from_unit, to_unit) if dimension else None
+    return None if converter is None else converter(values)
@@ -0,0 +1,142 @@
+"""Catálogo de válvulas de control indexado por Cv nominal para seleccionar cuerpo y trim.
+
+Una válvula es adecuada si en cada caso de operación (mínimo, normal, máximo) la apertura
+queda entre el 20% y el 80% de la carrera. Como la característica inherente f(h) = Cv/Cv_nominal
+es creciente, esa condición equivale a un intervalo de Cv nominal:
+    max(Cv_i) / f(80%) <= Cv_nominal <= min(Cv_i) / f(20%)
+El catálogo se ordena por (característica, rangeabilidad, Cv nominal) y el intervalo se resuelve
+con búsqueda binaria en cada grupo, sin recorrer el catálogo completo.
+"""
+from instrumentacion.core import np, pd
+
+VALVE_CATALOG_COLUMNS = ['modelo', 'cv_nominal', 'caracteristica']
+VALVE_CHARACTERISTICS = ('isoporcentual', 'lineal', 'apertura_rapida')
+DEFAULT_RANGEABILITY = 50.0
+TRAVEL_LIMITS = (0.2, 0.8)
+
+# Catálogo de referencia (globo, trims reducidos): Cv a plena carrera del trim completo por diámetro
+_REFERENCE_BODIES = {
+    '1/2"': 5.0, '3/4"': 9.0, '1"': 14.0, '1-1/2"': 32.0, '2"': 55.0, '3"': 120.0,
+    '4"': 200.0, '6"': 430.0, '8"': 750.0, '10"': 1150.0, '12"': 1600.0,
+}
+_REFERENCE_TRIMS = {'completo': 1.0, 'reducido 60%': 0.6, 'reducido 40%': 0.4, 'reducido 25%': 0.25,
+                    'reducido 16%': 0.16, 'micro 10%': 0.1}
+
+
+def reference_valve_catalog():
+    """Catálogo de ejemplo: cada diámetro de cuerpo con cada trim y característica."""
+    rows = [
+        {'modelo': f'Globo {size} · trim {trim} · {characteristic}', 'cuerpo': size, 'trim': trim,
+         'cv_nominal': round(cv * factor, 2), 'caracteristica': characteristic}
+        for size, cv in _REFERENCE_BODIES.items()
+        for trim, factor in _REFERENCE_TRIMS.items()
+        for characteristic in VALVE_CHARACTERISTICS
+    ]
+    return pd.DataFrame(rows)
+
+
+def inherent_flow_fraction(travel, characteristic, rangeability=DEFAULT_RANGEABILITY):
+    """Cv/Cv_nominal a una apertura dada (fracción 0–1) según la característica inherente."""
+    travel = np.asarray(travel, dtype=float)
+    if characteristic == 'isoporcentual':
+        return rangeability ** (travel - 1)
+    if characteristic == 'apertura_rapida':
+        return np.sqrt(travel)
+    return travel
+
+
+def travel_for_flow_fraction(fraction, characteristic, rangeability=DEFAULT_RANGEABILITY):
+    """Apertura (fracción 0–1) a la que la válvula entrega la fracción de Cv indicada."""
+    fraction = np.asarray(fraction, dtype=float)
+    if characteristic == 'isoporcentual':
+        with np.errstate(divide='ignore'):
+            return 1 + np.log(fraction) / np.log(rangeability)
+    if characteristic == 'apertura_rapida':
+        return fraction ** 2
+    return fraction
+
+
+def build_valve_index(catalog):
+    """Ordena un catálogo (modelo, cv_nominal, caracteristica[, rangeabilidad]) y delimita sus grupos.
+
+    Las filas con Cv no positivo o característica desconocida se descartan; la rangeabilidad
+    faltante toma DEFAULT_RANGEABILITY (sólo afecta a las isoporcentuales).
+    """
+    frame = catalog.copy()
+    frame['cv_nominal'] = pd.to_numeric(frame['cv_nominal'], errors='coerce')
+    frame['caracteristica'] = frame['caracteristica'].astype(str).str.strip().str.lower()
+    if 'rangeabilidad' not in frame.columns:
+        frame['rangeabilidad'] = DEFAULT_RANGEABILITY
+    frame['rangeabilidad'] = pd.to_numeric(frame['rangeabilidad'], errors='coerce').fillna(DEFAULT_RANGEABILITY)
+    valid = (frame['cv_nominal'] > 0) & frame['caracteristica'].isin(VALVE_CHARACTERISTICS) & (frame['rangeabilidad'] > 1)
+    frame = frame[valid].sort_values(['caracteristica', 'rangeabilidad', 'cv_nominal'], kind='stable')
+    frame = frame.reset_index(drop=True)
+
+    keys = list(zip(frame['caracteristica'], frame['rangeabilidad']))
+    groups = {}
+    for position, key in enumerate(keys):
+        start, _ = groups.get(key, (position, position))
+        groups[key] = (start, position + 1)
+    return {'catalogo': frame, 'cv': frame['cv_nominal'].to_numpy(dtype=float), 'grupos': groups,
+            'descartadas': int((~valid).sum())}
+
+
+VALVE_INDEX = None
+
+def get_valve_index():
+    """Índice del catálogo de referencia, construido en el primer uso."""
+    global VALVE_INDEX
+    if VALVE_INDEX is None:
+        VALVE_INDEX = build_valve_index(reference_valve_catalog())
+    return VALVE_INDEX
+
+
+def select_valves(cases, index=None, travel_limits=TRAVEL_LIMITS, limit=None):
+    """Válvulas del catálogo cuya apertura queda dentro de `travel_limits` en todos los casos.
+
+    `cases` es un Cv suelto, una lista de Cv o un dict {caso: Cv}. El resultado trae una columna
+    `apertura_<caso>` [%] por caso y se ordena por `margen`: la menor distancia de cualquier caso
+    a los límites de carrera (mayor margen = punto de operación más centrado).
+    """
+    index = index or get_valve_index()
+    if not isinstance(cases, dict):
+        cases = {'': cases} if np.isscalar(cases) else {str(i + 1): cv for i, cv in enumerate(cases)}
+    names = list(cases)
+    cvs = np.asarray([cases[name] for name in names], dtype=float)
+    low_travel, high_travel = travel_limits
+
+    positions, travels = [], []
+    if len(cvs) and np.all(np.isfinite(cvs) & (cvs > 0)):
+        for (characteristic, rangeability), (start, stop) in index['grupos'].items():
+            low_fraction, high_fraction = inherent_flow_fraction([low_travel, high_travel], characteristic, rangeability)
+            low, high = cvs.max() / high_fraction, cvs.min() / low_fraction
+            if low > high:
+                continue
+            group_cv = index['cv'][start:stop]
+            rows = np.arange(start + np.searchsorted(group_cv, low, 'left'), start + np.searchsorted(group_cv, high, 'right'))
+            positions.append(rows)
+            travels.append(travel_for_flow_fraction(cvs[None, :] / index['cv'][rows, None], characteristic, rangeability))
+
+    positions = np.concatenate(positions) if positions else np.array([], dtype=int)
+    travels = np.concatenate(travels) if travels else np.empty((0, len(cvs)))
+    result = index['catalogo'].iloc[positions].reset_index(drop=True)
+    for i, name in enumerate(names):
+        result['apertura' + (f'_{name}' if name else '')] = np.round(travels[:, i] * 100, 1)
+    result['margen'] = np.round(np.minimum(travels - low_travel, high_travel - travels).min(axis=1) * 100, 1)
+    result = result.sort_values(['margen', 'cv_nominal'], ascending=[False, True], kind='stable').reset_index(drop=True)
+    return result.head(limit) if limit else result
+
+
+def select_valves_for_schedule(sized, index=None, group='tag', travel_limits=TRAVEL_LIMITS):
+    """Mejor válvula del catálogo para cada tag de un programa ya dimensionado (columna `cv`)."""
+    valid = sized[sized['valido']] if 'valido' in sized.columns else sized
+    keys = valid[group] if group in valid.columns else valid.index
+    rows = []
+    for key, cvs in valid['cv'].groupby(keys, sort=False):
+        candidates = select_valves(list(cvs), index, travel_limits, limit=1)
+        best = candidates.iloc[0] if len(candidates) else None
+        rows.append({group: key, 'casos': len(cvs), 'cv_max_requerido': cvs.max(),
+                     'modelo': best['modelo'] if best is not None else None,
+                     'cv_nominal': best['cv_nominal'] if best is not None else np.nan,
+                     'margen': best['margen'] if best is not None else np.nan})
+    return pd.DataFrame(rows, columns=[group, 'casos', 'cv_max_requerido', 'modelo', 'cv_nominal', 'margen'])
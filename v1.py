@@ -1,8 +1,39 @@
 import streamlit as st
 import random
+import time
+import functools
+import io
+import os
+import uuid
 import pandas as pd
-import math
-import re
+
+from instrumentacion.core import (
+    FIRST_LETTER, SUCCESSOR_LETTERS, INSTRUMENT_DATABASE, ERROR_TYPES, get_instrument_index,
+    CV_SCHEDULE_COLUMNS, GAS_SCHEDULE_COLUMNS, STEAM_SCHEDULE_COLUMNS,
+    convert_pressure, convert_temperature, convert_array,
+    calculate_cv_liquid, calculate_cv_liquid_batch, calculate_cv_compressible, calculate_cv_compressible_batch,
+    calculate_orifice_flow, totalize_orifice_flow,
+    parse_tag, describe_tag_letters, interpret_tag_file,
+    generate_scaling_quiz, generate_tag_quiz, generate_error_quiz,
+    error_envelope, monte_carlo_error, write_calibration_sheets,
+)
+from instrumentacion.historial import PracticeHistory
+from instrumentacion.incertidumbre import LOOP_CRITERIA, loop_error_stackup
+from instrumentacion.lazos import build_tag_index
+from instrumentacion.orificio import ORIFICE_TAPPINGS, calculate_orifice_flow_iso, solve_orifice_flow
+from instrumentacion.perfil import RerunProfiler
+from instrumentacion.reportes import render_instrument_report, write_report_archive
+from instrumentacion.senal import NAMUR_LIMITS, LiveScaler, ModbusTCPSource, SimulatedSource
+from instrumentacion.sensores import SENSOR_TYPES, SENSOR_UNITS, sensor_to_temperature, temperature_to_sensor
+from instrumentacion.valvulas import build_valve_index, get_valve_index, select_valves, select_valves_for_schedule
+from instrumentacion.unidades import UNITS, DIMENSION_LABELS, get_converter
+
+# --- PERFILADO OPCIONAL DEL RERUN (?perfil=1, INSTRUMENTACION_PERFIL=1 o casilla en la barra lateral) ---
+profiler = RerunProfiler(
+    enabled=st.query_params.get("perfil") == "1"
+    or os.environ.get("INSTRUMENTACION_PERFIL") == "1"
+    or st.session_state.get("profiling_enabled", False)
+)
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -74,298 +105,251 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- BASES DE DATOS EXPANDIDAS (DICCIONARIOS ISA-5.1) ---
-
-FIRST_LETTER = {
-    'A': 'Análisis', 'B': 'Llama (Burner)', 'C': 'Conductividad', 'D': 'Densidad o Peso Específico', 'E': 'Tensión (Voltaje)',
-    'F': 'Caudal (Flow)', 'G': 'Calibre/Dimensión (Gauge)', 'H': 'Manual (Hand)', 'I': 'Corriente', 'J': 'Potencia',
-    'K': 'Tiempo o Programa', 'L': 'Nivel (Level)', 'M': 'Humedad (Moisture)', 'N': 'Definido por Usuario', 'O': 'Definido por Usuario',
-    'P': 'Presión o Vacío', 'Q': 'Cantidad', 'R': 'Radiactividad', 'S': 'Velocidad o Frecuencia', 'T': 'Temperatura',
-    'U': 'Multivariable', 'V': 'Vibración o Análisis Mecánico', 'W': 'Peso o Fuerza', 'X': 'Sin clasificar', 'Y': 'Evento, Estado o Presencia', 'Z': 'Posición o Dimensión'
-}
-
-SUCCESSOR_LETTERS = {
-    'A': 'Alarma', 'B': 'Definido por Usuario', 'C': 'Control', 'D': 'Diferencial', 'E': 'Elemento Primario (Sensor)',
-    'F': 'Relación (Ratio)', 'G': 'Visor o Vidrio (Glass)', 'H': 'Alto', 'I': 'Indicación', 'J': 'Exploración (Scan)',
-    'K': 'Estación de Control', 'L': 'Luz Piloto o Bajo', 'M': 'Medio o Intermedio', 'N': 'Definido por Usuario',
-    'O': 'Orificio de Restricción', 'P': 'Punto de Prueba', 'Q': 'Integrador o Totalizador', 'R': 'Registro (Recorder)',
-    'S': 'Interruptor (Switch) o Seguridad', 'T': 'Transmisión', 'U': 'Multifunción', 'V': 'Válvula, Damper o Actuador',
-    'W': 'Pozo (Well)', 'X': 'Accesorio o Sin clasificar', 'Y': 'Relé, Convertidor o Computador', 'Z': 'Elemento Final de Control (no clasificado)'
-}
-
-INSTRUMENT_DATABASE = {
-    # Instrumentos de Presión
-    'PI': {'variable': 'Presión', 'funcion': 'Indicador', 'rango_tipico': '0-10 bar', 'exactitud_tipica': '±0.5%'},
-    'PIT': {'variable': 'Presión', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-25 bar', 'exactitud_tipica': '±0.25%'},
-    'PIC': {'variable': 'Presión', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-16 bar', 'exactitud_tipica': '±0.5%'},
-    'PIR': {'variable': 'Presión', 'funcion': 'Indicador-Registrador', 'rango_tipico': '0-40 bar', 'exactitud_tipica': '±0.3%'},
-    'PSH': {'variable': 'Presión', 'funcion': 'Switch Alto', 'rango_tipico': '0-100 bar', 'exactitud_tipica': '±1%'},
-    'PSL': {'variable': 'Presión', 'funcion': 'Switch Bajo', 'rango_tipico': '0-50 bar', 'exactitud_tipica': '±1%'},
-    'PDI': {'variable': 'Presión Diferencial', 'funcion': 'Indicador', 'rango_tipico': '0-2500 mmH2O', 'exactitud_tipica': '±0.5%'},
-    'PDT': {'variable': 'Presión Diferencial', 'funcion': 'Transmisor', 'rango_tipico': '0-6000 mmH2O', 'exactitud_tipica': '±0.25%'},
-    
-    # Instrumentos de Temperatura
-    'TI': {'variable': 'Temperatura', 'funcion': 'Indicador', 'rango_tipico': '0-500°C', 'exactitud_tipica': '±1°C'},
-    'TIT': {'variable': 'Temperatura', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '-50-800°C', 'exactitud_tipica': '±0.5°C'},
-    'TIC': {'variable': 'Temperatura', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-1200°C', 'exactitud_tipica': '±2°C'},
-    'TIR': {'variable': 'Temperatura', 'funcion': 'Indicador-Registrador', 'rango_tipico': '0-600°C', 'exactitud_tipica': '±1°C'},
-    'TSH': {'variable': 'Temperatura', 'funcion': 'Switch Alto', 'rango_tipico': '0-300°C', 'exactitud_tipica': '±3°C'},
-    'TSL': {'variable': 'Temperatura', 'funcion': 'Switch Bajo', 'rango_tipico': '0-200°C', 'exactitud_tipica': '±3°C'},
-    'TE': {'variable': 'Temperatura', 'funcion': 'Elemento Sensor', 'rango_tipico': '-200-1600°C', 'exactitud_tipica': '±0.1°C'},
-    'TT': {'variable': 'Temperatura', 'funcion': 'Transmisor', 'rango_tipico': '-40-850°C', 'exactitud_tipica': '±0.3°C'},
-    
-    # Instrumentos de Nivel
-    'LI': {'variable': 'Nivel', 'funcion': 'Indicador', 'rango_tipico': '0-100%', 'exactitud_tipica': '±1%'},
-    'LIT': {'variable': 'Nivel', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-10 m', 'exactitud_tipica': '±0.5%'},
-    'LIC': {'variable': 'Nivel', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-5 m', 'exactitud_tipica': '±1%'},
-    'LSH': {'variable': 'Nivel', 'funcion': 'Switch Alto', 'rango_tipico': '0-20 m', 'exactitud_tipica': '±2%'},
-    'LSL': {'variable': 'Nivel', 'funcion': 'Switch Bajo', 'rango_tipico': '0-15 m', 'exactitud_tipica': '±2%'},
-    'LT': {'variable': 'Nivel', 'funcion': 'Transmisor', 'rango_tipico': '0-30 m', 'exactitud_tipica': '±0.25%'},
-    'LG': {'variable': 'Nivel', 'funcion': 'Visor/Indicador Visual', 'rango_tipico': '0-3 m', 'exactitud_tipica': '±5%'},
-    
-    # Instrumentos de Caudal
-    'FI': {'variable': 'Caudal', 'funcion': 'Indicador', 'rango_tipico': '0-1000 m³/h', 'exactitud_tipica': '±1%'},
-    'FIT': {'variable': 'Caudal', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-500 m³/h', 'exactitud_tipica': '±0.5%'},
-    'FIC': {'variable': 'Caudal', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-2000 m³/h', 'exactitud_tipica': '±1%'},
-    'FT': {'variable': 'Caudal', 'funcion': 'Transmisor', 'rango_tipico': '0-10000 m³/h', 'exactitud_tipica': '±0.25%'},
-    'FE': {'variable': 'Caudal', 'funcion': 'Elemento Primario', 'rango_tipico': '0-5000 m³/h', 'exactitud_tipica': '±2%'},
-    'FQ': {'variable': 'Caudal', 'funcion': 'Totalizador', 'rango_tipico': '0-999999 m³', 'exactitud_tipica': '±0.1%'},
-    
-    # Instrumentos de Análisis
-    'AI': {'variable': 'Análisis', 'funcion': 'Indicador', 'rango_tipico': '0-14 pH', 'exactitud_tipica': '±0.1 pH'},
-    'AIT': {'variable': 'Análisis', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-20 ppm', 'exactitud_tipica': '±2%'},
-    'AIC': {'variable': 'Análisis', 'funcion': 'Indicador-Controlador', 'rango_tipico': '0-100%', 'exactitud_tipica': '±1%'},
-    'AT': {'variable': 'Análisis', 'funcion': 'Transmisor', 'rango_tipico': '0-1000 ppm', 'exactitud_tipica': '±3%'},
-    
-    # Instrumentos de Conductividad
-    'CI': {'variable': 'Conductividad', 'funcion': 'Indicador', 'rango_tipico': '0-2000 µS/cm', 'exactitud_tipica': '±2%'},
-    'CIT': {'variable': 'Conductividad', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-20000 µS/cm', 'exactitud_tipica': '±1%'},
-    'CT': {'variable': 'Conductividad', 'funcion': 'Transmisor', 'rango_tipico': '0-200000 µS/cm', 'exactitud_tipica': '±1.5%'},
-    
-    # Válvulas de Control
-    'PCV': {'variable': 'Presión', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.1-1000', 'exactitud_tipica': '±5%'},
-    'TCV': {'variable': 'Temperatura', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.5-500', 'exactitud_tipica': '±5%'},
-    'FCV': {'variable': 'Caudal', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 1-2000', 'exactitud_tipica': '±3%'},
-    'LCV': {'variable': 'Nivel', 'funcion': 'Válvula de Control', 'rango_tipico': 'Cv 0.2-800', 'exactitud_tipica': '±5%'},
-    
-    # Instrumentos Multivariable
-    'UIT': {'variable': 'Multivariable', 'funcion': 'Indicador-Transmisor', 'rango_tipico': 'Variable', 'exactitud_tipica': '±0.1%'},
-    'UT': {'variable': 'Multivariable', 'funcion': 'Transmisor', 'rango_tipico': 'Variable', 'exactitud_tipica': '±0.15%'},
-    
-    # Instrumentos de Vibración
-    'VI': {'variable': 'Vibración', 'funcion': 'Indicador', 'rango_tipico': '0-50 mm/s', 'exactitud_tipica': '±5%'},
-    'VIT': {'variable': 'Vibración', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-100 mm/s', 'exactitud_tipica': '±3%'},
-    'VT': {'variable': 'Vibración', 'funcion': 'Transmisor', 'rango_tipico': '0-200 mm/s', 'exactitud_tipica': '±2%'},
-    
-    # Instrumentos de Peso
-    'WI': {'variable': 'Peso', 'funcion': 'Indicador', 'rango_tipico': '0-10000 kg', 'exactitud_tipica': '±0.1%'},
-    'WIT': {'variable': 'Peso', 'funcion': 'Indicador-Transmisor', 'rango_tipico': '0-50000 kg', 'exactitud_tipica': '±0.05%'},
-    'WT': {'variable': 'Peso', 'funcion': 'Transmisor', 'rango_tipico': '0-100000 kg', 'exactitud_tipica': '±0.03%'},
-}
-
-ERROR_TYPES = {
-    'A': 'Porcentaje del máximo valor del campo de indicación',
-    'B': 'Porcentaje del span (rango)',
-    'C': 'Porcentaje del valor a medir',
-    'D': 'Valor fijo según la variable'
-}
-
-# --- FUNCIONES DE CÁLCULO Y LÓgica ---
-
-def convert_pressure(value, from_unit, to_unit):
-    to_pascal = {
-        'Pa': 1, 'kPa': 1000, 'MPa': 1e6, 'bar': 1e5, 'mbar': 100,
-        'psi': 6894.76, 'kg/cm²': 98066.5, 'atm': 101325,
-        'mmH2O': 9.80665, 'inH2O': 249.089
-    }
-    if from_unit not in to_pascal or to_unit not in to_pascal: return None
-    return (value * to_pascal[from_unit]) / to_pascal[to_unit]
+# --- DATOS Y TABLAS EN CACHÉ (COMPARTIDOS ENTRE RERUNS Y SESIONES) ---
+
+TIPS = (
+    "La exactitud no es lo mismo que la repetibilidad. Un instrumento puede ser muy repetible pero poco exacto.",
+    "El 'Campo de Medida' (25-75% del rango) es donde un transmisor ofrece su mejor rendimiento.",
+    "Un lazo de control se compone de: medición (sensor), controlador (PLC/DCS) y elemento final (válvula).",
+    "La calibración en 5 puntos (0%, 25%, 50%, 75%, 100%) es esencial para verificar la linealidad del instrumento.",
+    "La histéresis es la diferencia entre lecturas ascendentes y descendentes en el mismo punto de medida.",
+    "La 'rangeabilidad' (turndown) indica cuánto se puede reducir el rango de un transmisor sin perder la exactitud especificada.",
+    "En la selección de válvulas de control, un Cv calculado debe quedar idealmente entre el 20% y 80% del recorrido de la válvula.",
+    "La presión diferencial para medir caudal con placa de orificio varía con el cuadrado del flujo ($ΔP ∝ Q^2$).",
+    "Para medición con exactitud, el valor a medir debe estar cerca del 50% del campo de indicación del instrumento.",
+    "Los errores tipo A se expresan como % del máximo del rango, tipo B como % del span, tipo C como % del valor medido.",
+)
+
+@st.cache_resource
+def load_reference_options():
+    """Opciones de los selectores de referencia ISA-5.1 (se construyen una vez por servidor)."""
+    return list(FIRST_LETTER.items()), list(SUCCESSOR_LETTERS.items())
+
+@st.cache_resource
+def load_instrument_tables():
+    """Tabla numérica de rangos e índice por variable del catálogo, compartidos por todas las sesiones."""
+    return get_instrument_index()
+
+@st.cache_resource
+def load_practice_history():
+    """Historial de práctica en SQLite compartido por todas las sesiones (escrituras por lotes)."""
+    return PracticeHistory()
 
-def convert_temperature(value, from_unit, to_unit):
+@st.cache_data(max_entries=256)
+def build_calibration_table(lrv_pv, urv_pv, lrv_out, urv_out, pv_units, out_units, percentages=(0, 25, 50, 75, 100)):
+    """Tabla de puntos de verificación para un rango PV/salida dado."""
+    span_pv, span_out = urv_pv - lrv_pv, urv_out - lrv_out
+    return pd.DataFrame({
+        "Porcentaje (%)": list(percentages),
+        f"Variable de Proceso ({pv_units})": [lrv_pv + (p/100) * span_pv for p in percentages],
+        f"Señal de Salida ({out_units})": [lrv_out + (p/100) * span_out for p in percentages],
+    })
+
+@st.cache_data(max_entries=8)
+def cached_cv_schedule(file_bytes, service="liquido"):
+    """Dimensiona un programa de válvulas subido; se recalcula sólo si cambian el archivo o el servicio."""
+    schedule = pd.read_csv(io.BytesIO(file_bytes))
+    required = {"liquido": CV_SCHEDULE_COLUMNS, "gas": GAS_SCHEDULE_COLUMNS, "vapor": STEAM_SCHEDULE_COLUMNS}[service]
+    missing = [c for c in required if c not in schedule.columns]
+    if missing:
+        return None, missing, b""
+    if service == "liquido":
+        sized = calculate_cv_liquid_batch(schedule)
+    else:
+        sized = calculate_cv_compressible_batch(schedule, service)
+    return sized, [], sized.to_csv(index=False).encode("utf-8")
+
+@st.cache_data(max_entries=8)
+def cached_orifice_totals(file_bytes, k_factor, dp_column, time_column, sample_period, low_flow_cutoff):
+    """Totaliza una serie de ΔP subida; se recalcula sólo si cambian el archivo o los parámetros."""
+    return totalize_orifice_flow(io.BytesIO(file_bytes), k_factor, dp_column=dp_column, time_column=time_column,
+                                 sample_period=sample_period, low_flow_cutoff=low_flow_cutoff)
+
+@st.cache_data(max_entries=8)
+def cached_orifice_iso(series_bytes, meters_bytes, meter):
+    """Caudal ISO 5167-2 de una serie subida; `meter` es la geometría y el fluido por defecto de la interfaz."""
+    data = pd.read_csv(io.BytesIO(series_bytes))
+    d, D, tapping, viscosity, options = meter
+    if meters_bytes is not None:
+        # Con tabla de medidores el fluido sale de la tabla; de la interfaz sólo se toman tomas y viscosidad por defecto
+        meters, options = pd.read_csv(io.BytesIO(meters_bytes)), ()
+        if "tag" not in data.columns:
+            return None, "La serie necesita la columna `tag` para asociarla con la tabla de medidores."
+    else:
+        meters = None
+        data = data.assign(**{"d": data.get("d", d), "D": data.get("D", D)})
     try:
-        if from_unit == '°C': celsius = value
-        elif from_unit == '°F': celsius = (value - 32) * 5/9
-        elif from_unit == 'K': celsius = value - 273.15
-        else: return None
-
-        if to_unit == '°C': return round(celsius, 2)
-        elif to_unit == '°F': return round(celsius * 9/5 + 32, 2)
-        elif to_unit == 'K': return round(celsius + 273.15, 2)
-        else: return None
-    except:
-        return None
-
-def calculate_cv_liquid(flow_rate, sg, p1, p2):
-    if p1 <= p2:
-        return None, "La presión de entrada debe ser mayor que la de salida."
-    delta_p = p1 - p2
-    cv = flow_rate * math.sqrt(sg / delta_p)
-    return round(cv, 2), None
-
-def calculate_orifice_flow(dp, k):
-    if dp < 0 or k <=0:
-        return None, "La presión diferencial y el factor K deben ser positivos."
-    flow = k * math.sqrt(dp)
-    return round(flow, 2), None
-
-def select_instrument_for_measurement(variable_type, measurement_value, accuracy_required=True):
-    """Selecciona el instrumento adecuado basado en la variable y exactitud requerida."""
-    suitable_instruments = []
-    
-    for tag, specs in INSTRUMENT_DATABASE.items():
-        if variable_type.lower() in specs['variable'].lower():
-            # Para medición con exactitud, el valor debe estar en el 50% del campo de indicación
-            if accuracy_required:
-                # Extraer rango numérico del rango típico
-                range_match = re.search(r'(-?\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)', specs['rango_tipico'])
-                if range_match:
-                    min_range, max_range = float(range_match.group(1)), float(range_match.group(2))
-                    optimal_range = (max_range - min_range) * 0.5 + min_range
-                    
-                    # Verificar si el valor a medir está cerca del 50% del rango
-                    if abs(measurement_value - optimal_range) / max(optimal_range, 1e-6) <= 0.3:  # ±30% del punto óptimo
-                        suitable_instruments.append((tag, specs))
-            else:
-                suitable_instruments.append((tag, specs))
-    
-    return suitable_instruments
+        return calculate_orifice_flow_iso(data, meters, tapping=tapping, viscosity=viscosity, **dict(options)), None
+    except ValueError as exc:
+        return None, str(exc)
 
-# --- FUNCIONES PARA EL CENTRO DE PRÁCTICA (EXPANDIDAS) ---
+@st.cache_data(max_entries=8)
+def cached_loop_stackup(file_bytes, tolerance, criterion):
+    """Error combinado por lazo de un listado subido; se recalcula sólo si cambian archivo, tolerancia o criterio."""
+    try:
+        loops, components = loop_error_stackup(pd.read_csv(io.BytesIO(file_bytes)), tolerance, criterion)
+    except ValueError as exc:
+        return None, 0, str(exc)
+    return loops, int(components['sin_lazo'].sum()), None
 
-def generate_scaling_quiz():
-    """Genera un ejercicio de escalamiento aleatorio."""
-    pv_types = [{'name': 'Presión', 'units': 'bar'}, {'name': 'Temperatura', 'units': '°C'}, {'name': 'Nivel', 'units': '%'}, {'name': 'Caudal', 'units': 'm³/h'}]
-    signal_types = [{'name': 'Corriente', 'units': 'mA', 'lrv': 4, 'urv': 20}, {'name': 'Voltaje', 'units': 'V', 'lrv': 1, 'urv': 5}]
-    pv, signal = random.choice(pv_types), random.choice(signal_types)
-    lrv_pv, urv_pv = round(random.uniform(0, 50)), round(random.uniform(100, 500))
-    
-    if random.choice([True, False]): # PV -> OUT
-        input_val = round(random.uniform(lrv_pv, urv_pv), 1)
-        correct_out = (((input_val - lrv_pv) / (urv_pv - lrv_pv)) * (signal['urv'] - signal['lrv'])) + signal['lrv']
-        question = f"Un transmisor de **{pv['name']}** con rango **{lrv_pv} a {urv_pv} {pv['units']}** y salida **{signal['lrv']}-{signal['urv']} {signal['units']}**, ¿qué salida corresponde a **{input_val} {pv['units']}**?"
-        correct_answer = f"{correct_out:.2f}"
-        unit = signal['units']
-        base_value = correct_out
-    else: # OUT -> PV
-        input_val = round(random.uniform(signal['lrv'], signal['urv']), 2)
-        correct_out = (((input_val - signal['lrv']) / (signal['urv'] - signal['lrv'])) * (urv_pv - lrv_pv)) + lrv_pv
-        question = f"Un transmisor de **{pv['name']}** con rango **{lrv_pv} a {urv_pv} {pv['units']}** y salida **{signal['lrv']}-{signal['urv']} {signal['units']}**, ¿qué PV corresponde a **{input_val} {signal['units']}**?"
-        correct_answer = f"{correct_out:.1f}"
-        unit = pv['units']
-        base_value = correct_out
-        
-    options = {correct_answer}
-    while len(options) < 4:
-        distractor = base_value * random.uniform(0.5, 1.5)
-        if abs(distractor - base_value) > 0.1 * base_value:
-            options.add(f"{distractor:.2f}" if isinstance(base_value, float) and base_value != int(base_value) else f"{distractor:.1f}")
-    
-    return question, [f"{o} {unit}" for o in options], f"{correct_answer} {unit}"
+@st.cache_data(max_entries=8)
+def cached_tag_interpretation(file_bytes, file_name, column):
+    """Interpreta un índice de tags subido; se recalcula sólo si cambian el archivo o la columna."""
+    buffer = io.BytesIO(file_bytes)
+    buffer.name = file_name
+    results = interpret_tag_file(buffer, column=column)
+    return results, results.to_csv(index=False).encode("utf-8")
 
-def generate_tag_quiz():
-    """Genera un ejercicio de identificación de tags ISA-5.1."""
-    first = random.choice(list(FIRST_LETTER.keys()))
-    successors = random.sample(list(SUCCESSOR_LETTERS.keys()), random.randint(1, 2))
-    tag = f"{first}{''.join(successors)}-{random.randint(100,999)}"
-    
-    question = f"¿Qué significa el tag **{tag}** según ISA-5.1?"
-    
-    # Respuesta Correcta
-    desc = [FIRST_LETTER[first]]
-    for letter in successors:
-        desc.append(SUCCESSOR_LETTERS[letter])
-    correct_answer = " - ".join(desc)
-    
-    # Distractores
-    options = {correct_answer}
-    while len(options) < 4:
-        w_first = random.choice(list(FIRST_LETTER.values()))
-        w_succ = random.sample(list(SUCCESSOR_LETTERS.values()), len(successors))
-        distractor = f"{w_first} - {' - '.join(w_succ)}"
-        if distractor != correct_answer:
-            options.add(distractor)
-            
-    return question, list(options), correct_answer
+@st.cache_resource(max_entries=4)
+def cached_tag_index(file_bytes, file_name, column):
+    """Índice de lazos del listado subido, compartido entre sesiones mientras no cambie el archivo."""
+    buffer = io.BytesIO(file_bytes)
+    buffer.name = file_name
+    return build_tag_index(buffer, column=column)
 
-def generate_error_quiz():
-    """Genera un ejercicio de selección de instrumentos y cálculo de errores."""
-    variables = ['Presión', 'Temperatura', 'Nivel', 'Caudal']
-    variable = random.choice(variables)
-    
-    # Generar valor a medir
-    if variable == 'Presión':
-        measurement_value = round(random.uniform(5, 15), 1)
-        unit = 'bar'
-    elif variable == 'Temperatura':
-        measurement_value = round(random.uniform(100, 400), 0)
-        unit = '°C'
-    elif variable == 'Nivel':
-        measurement_value = round(random.uniform(2, 8), 1)
-        unit = 'm'
-    else:  # Caudal
-        measurement_value = round(random.uniform(50, 500), 0)
-        unit = 'm³/h'
-    
-    # Seleccionar instrumento adecuado
-    suitable_instruments = select_instrument_for_measurement(variable, measurement_value, accuracy_required=True)
-    
-    if not suitable_instruments:
-        # Fallback a cualquier instrumento de la variable
-        suitable_instruments = select_instrument_for_measurement(variable, measurement_value, accuracy_required=False)
-    
-    if suitable_instruments:
-        selected_instrument = random.choice(suitable_instruments)
-        instrument_tag = selected_instrument[0]
-        
-        question = f"Para medir **{measurement_value} {unit}** de {variable.lower()} con exactitud (valor al 50% del campo de indicación), ¿qué instrumento sería el más adecuado?"
-        
-        # Generar opciones
-        correct_answer = f"{instrument_tag} | {selected_instrument[1]['variable']} - {selected_instrument[1]['funcion']}"
-        
-        options = {correct_answer}
-        # Agregar distractores de otros instrumentos
-        all_instruments = list(INSTRUMENT_DATABASE.keys())
-        while len(options) < 4:
-            distractor_tag = random.choice(all_instruments)
-            if distractor_tag != instrument_tag:
-                distractor_specs = INSTRUMENT_DATABASE[distractor_tag]
-                distractor = f"{distractor_tag} | {distractor_specs['variable']} - {distractor_specs['funcion']}"
-                options.add(distractor)
-        
-        return question, list(options), correct_answer, instrument_tag, measurement_value
-    
-    return None, None, None, None, None
+@st.cache_data(max_entries=4)
+def cached_calibration_pack(file_bytes):
+    """Genera por bloques el CSV de hojas de calibración de un listado de instrumentos subido."""
+    output = io.StringIO()
+    summary = write_calibration_sheets(io.BytesIO(file_bytes), output, fmt='csv')
+    return summary, output.getvalue().encode("utf-8")
+
+@st.cache_data(max_entries=2)
+def cached_report_archive(file_bytes):
+    """Paquete ZIP de hojas imprimibles (calibración + errores) renderizado en paralelo."""
+    output = io.BytesIO()
+    summary = write_report_archive(io.BytesIO(file_bytes), output)
+    return summary, output.getvalue()
+
+@st.cache_data(max_entries=16)
+def cached_error_sheet(lrv, urv, units, error_a, error_b, error_c, error_d):
+    """Hoja imprimible del análisis de errores; se renderiza sólo cuando cambian rango o especificaciones."""
+    return render_instrument_report({
+        'tag': 'Instrumento', 'lrv': lrv, 'urv': urv, 'unidad': units,
+        'error_a': error_a, 'error_b': error_b, 'error_c': error_c, 'error_d': error_d,
+    })
+
+@st.cache_data(max_entries=8)
+def cached_csv_frame(file_bytes):
+    """Lee un CSV subido una sola vez por contenido."""
+    return pd.read_csv(io.BytesIO(file_bytes))
+
+@st.cache_resource(max_entries=4)
+def cached_valve_index(file_bytes):
+    """Índice por Cv de un catálogo de válvulas subido, compartido entre sesiones."""
+    return build_valve_index(pd.read_csv(io.BytesIO(file_bytes)))
+
+def render_live_panel(pv_units, out_units):
+    """Lee la fuente en vivo de la sesión y muestra la última lectura, estadísticas y tendencia."""
+    scaler = st.session_state.get('live_scaler')
+    if scaler is None:
+        return
+    try:
+        scaler.poll()
+    except OSError as exc:
+        st.error(f"No se pudo leer la fuente: {exc}")
+        return
+    snapshot = scaler.snapshot()
+    stats = snapshot['estadisticas']
+    if snapshot['pv'] is None:
+        st.info("Esperando muestras...")
+        return
+    l1, l2, l3, l4 = st.columns(4)
+    l1.metric("Señal", f"{snapshot['senal']:.3f} {out_units}")
+    l2.metric("PV", f"{snapshot['pv']:.2f} {pv_units}")
+    l3.metric("Media ± σ", f"{stats['media']:.2f} ± {stats['desviacion']:.2f}")
+    l4.metric("Mín / Máx", f"{stats['minimo']:.2f} / {stats['maximo']:.2f}")
+    st.line_chart(snapshot['tendencia'], height=220)
+    st.caption(f"{stats['muestras']:,} muestras desde el inicio · {scaler.buffer.size:,} en el búfer"
+               + (f" · ⚠️ {snapshot['fallas']} fuera de NAMUR NE 43" if snapshot['fallas'] else ""))
+
+def next_exercise():
+    """Descarta el ejercicio actual; el siguiente rerun de la pestaña genera uno nuevo."""
+    st.session_state.current_question_data = None
+    st.session_state.answer_submitted = False
+    st.session_state.quiz_counter += 1
+
+def show_valve_candidates(cv, valve_index):
+    """Lista bajo el resultado de Cv las válvulas del catálogo que operan entre 20% y 80% de carrera."""
+    candidates = select_valves(cv, valve_index, limit=10)
+    if len(candidates):
+        st.write("**Válvulas del catálogo con el punto de operación entre 20% y 80% de carrera** (ordenadas por margen):")
+        st.dataframe(candidates, hide_index=True, use_container_width=True)
+    else:
+        st.warning("Ninguna válvula del catálogo deja el punto de operación entre el 20% y el 80% de carrera.")
+
+# Funciones del núcleo y de caché cuyo coste se desglosa en el panel de perfilado
+PROFILED_FUNCTIONS = (
+    'convert_pressure', 'convert_temperature', 'convert_array', 'get_converter',
+    'calculate_cv_liquid', 'calculate_cv_compressible', 'calculate_orifice_flow', 'parse_tag', 'describe_tag_letters',
+    'generate_scaling_quiz', 'generate_tag_quiz', 'generate_error_quiz', 'error_envelope', 'monte_carlo_error',
+    'load_reference_options', 'load_instrument_tables', 'build_calibration_table', 'cached_cv_schedule',
+    'cached_orifice_totals', 'cached_tag_interpretation', 'cached_tag_index', 'cached_calibration_pack', 'cached_csv_frame',
+    'cached_valve_index', 'select_valves', 'cached_report_archive', 'cached_error_sheet', 'render_instrument_report',
+    'sensor_to_temperature', 'temperature_to_sensor', 'solve_orifice_flow', 'cached_orifice_iso',
+    'cached_loop_stackup',
+)
+if profiler.enabled:
+    for _name in PROFILED_FUNCTIONS:
+        globals()[_name] = profiler.wrap(globals()[_name], _name)
+
+def show_profile(profile, title):
+    """Tiempo total, secciones y funciones de un resumen de `RerunProfiler`."""
+    st.subheader(f"⏱️ {title}: {profile['total_s'] * 1000:.1f} ms")
+    st.dataframe(pd.DataFrame({"Sección": list(profile['secciones']),
+                               "ms": [v * 1000 for v in profile['secciones'].values()]}),
+                 hide_index=True, use_container_width=True)
+    if profile['funciones']:
+        st.dataframe(pd.DataFrame({"Función": list(profile['funciones']),
+                                   "Llamadas": [f['llamadas'] for f in profile['funciones'].values()],
+                                   "ms": [f['total_s'] * 1000 for f in profile['funciones'].values()]}),
+                     hide_index=True, use_container_width=True)
+
+def profiled_tab(label):
+    """Convierte el cuerpo de una pestaña en un fragmento cronometrado como la sección `label`.
+
+    Dentro del rerun completo la pestaña suma su tiempo al perfil del script. En un rerun parcial
+    (el perfilador del último rerun completo ya terminó) abre su propia sesión de perfilado y muestra
+    su panel al pie de la pestaña; si hay archivo de registro, también añade su línea.
+    """
+    def decorator(render):
+        @st.fragment
+        @functools.wraps(render)
+        def fragment():
+            partial = profiler.enabled and profiler.finished
+            if partial:
+                profiler.restart()
+            with profiler.section(label):
+                render()
+            if partial:
+                profile = profiler.summary()
+                with st.expander("🐞 Perfil del rerun de esta pestaña", expanded=True):
+                    show_profile(profile, f"Rerun parcial · {label}")
+                if st.session_state.get("profile_log"):
+                    profiler.append_log(st.session_state.profile_log, sesion=st.session_state.profile_session_id,
+                                        fragmento=label)
+        return fragment
+    return decorator
 
 # --- INTERFAZ DE USUARIO (UI) ---
 
 st.title("🛠️ Asistente de Instrumentación Industrial v7.1 - Corregido")
 st.markdown("*Herramienta avanzada para cálculos, interpretación de normas, análisis de errores y práctica profesional*")
 
-with st.sidebar:
+with st.sidebar, profiler.section("Barra lateral"):
     st.header("⭐ Tips del Ingeniero")
-    tips = [
-        "La exactitud no es lo mismo que la repetibilidad. Un instrumento puede ser muy repetible pero poco exacto.",
-        "El 'Campo de Medida' (25-75% del rango) es donde un transmisor ofrece su mejor rendimiento.",
-        "Un lazo de control se compone de: medición (sensor), controlador (PLC/DCS) y elemento final (válvula).",
-        "La calibración en 5 puntos (0%, 25%, 50%, 75%, 100%) es esencial para verificar la linealidad del instrumento.",
-        "La histéresis es la diferencia entre lecturas ascendentes y descendentes en el mismo punto de medida.",
-        "La 'rangeabilidad' (turndown) indica cuánto se puede reducir el rango de un transmisor sin perder la exactitud especificada.",
-        "En la selección de válvulas de control, un Cv calculado debe quedar idealmente entre el 20% y 80% del recorrido de la válvula.",
-        "La presión diferencial para medir caudal con placa de orificio varía con el cuadrado del flujo ($ΔP ∝ Q^2$).",
-        "Para medición con exactitud, el valor a medir debe estar cerca del 50% del campo de indicación del instrumento.",
-        "Los errores tipo A se expresan como % del máximo del rango, tipo B como % del span, tipo C como % del valor medido.",
-    ]
     if 'tip_index' not in st.session_state:
-        st.session_state.tip_index = random.randint(0, len(tips)-1)
-    st.info(f"💡 {tips[st.session_state.tip_index]}")
+        st.session_state.tip_index = random.randint(0, len(TIPS)-1)
+    st.info(f"💡 {TIPS[st.session_state.tip_index]}")
     if st.button("Siguiente Tip 💡"):
-        st.session_state.tip_index = (st.session_state.tip_index + 1) % len(tips)
+        st.session_state.tip_index = (st.session_state.tip_index + 1) % len(TIPS)
         st.rerun()
 
     st.divider()
     st.header("📋 Referencia Rápida ISA-5.1")
-    st.selectbox("Primera Letra (Variable)", options=list(FIRST_LETTER.items()), format_func=lambda x: f"{x[0]} - {x[1]}", key="sb_first")
-    st.selectbox("Letras Sucesivas (Función)", options=list(SUCCESSOR_LETTERS.items()), format_func=lambda x: f"{x[0]} - {x[1]}", key="sb_succ")
+    first_options, succ_options = load_reference_options()
+    st.selectbox("Primera Letra (Variable)", options=first_options, format_func=lambda x: f"{x[0]} - {x[1]}", key="sb_first")
+    st.selectbox("Letras Sucesivas (Función)", options=succ_options, format_func=lambda x: f"{x[0]} - {x[1]}", key="sb_succ")
     
     st.subheader("🔧 Instrumentos Comunes")
     common_instruments = ['PIT', 'TIT', 'FIT', 'LIT', 'PDT', 'TT', 'FT', 'LT']
@@ -376,12 +360,25 @@ with st.sidebar:
         st.write(f"Rango típico: {specs['rango_tipico']}")
         st.write(f"Exactitud típica: {specs['exactitud_tipica']}")
 
+    st.divider()
+    st.checkbox("🐞 Perfil de rendimiento (depuración)", key="profiling_enabled",
+                help="Mide cada sección y cada función en cada interacción.")
+    profile_panel = st.empty()
+
+with profiler.section("Carga de tablas del catálogo"):
+    load_instrument_tables()
+
+# Cada pestaña es un fragmento (`profiled_tab`): una interacción dentro de una pestaña sólo vuelve a
+# ejecutar esa pestaña, no el script completo, y ese rerun parcial se perfila por separado. Cambiar de
+# pestaña no ejecuta nada (es del lado del cliente) y los widgets de las demás pestañas siguen
+# renderizados, así que conservan sus valores y archivos subidos.
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["**📐 Herramientas de Cálculo**", "**📖 Interpretador ISA-5.1**", "**🧠 Centro de Práctica**", "**🔧 Conversores de Unidades**", "**⚠️ Análisis de Errores**"])
 
-with tab1:
+@profiled_tab("Tab 1 · Herramientas de Cálculo")
+def render_calculation_tab():
     st.header("Cálculos Fundamentales de Instrumentación")
     
-    with st.expander("**📈 Calculadora de Escalamiento y Tabla de Calibración**", expanded=True):
+    with st.expander("**📈 Calculadora de Escalamiento y Tabla de Calibración**", expanded=True), profiler.section("Tab 1 › Escalamiento y calibración"):
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Variable de Proceso (PV)")
@@ -400,16 +397,14 @@ with tab1:
         st.divider()
         if urv_pv > lrv_pv and urv_out > lrv_out:
             span_pv = urv_pv - lrv_pv
-            span_out = urv_out - lrv_out
             
             st.subheader("📊 Tabla de Puntos de Verificación (0-25-50-75-100%)")
-            table_data = {
-                "Porcentaje (%)": percentages,
-                f"Variable de Proceso ({pv_units})": [lrv_pv + (p/100) * span_pv for p in percentages],
-                f"Señal de Salida ({out_units})": [lrv_out + (p/100) * span_out for p in percentages]
-            }
-            df = pd.DataFrame(table_data)
-            st.dataframe(df.style.format({df.columns[1]: "{:.2f}", df.columns[2]: "{:.2f}"}), use_container_width=True)
+            df = build_calibration_table(lrv_pv, urv_pv, lrv_out, urv_out, pv_units, out_units, tuple(percentages))
+            # El formato se aplica en el cliente con column_config en lugar de construir un Styler en cada rerun
+            st.dataframe(df, use_container_width=True, column_config={
+                df.columns[1]: st.column_config.NumberColumn(format="%.2f"),
+                df.columns[2]: st.column_config.NumberColumn(format="%.2f"),
+            })
             
             optimal_value = lrv_pv + 0.5 * span_pv
             st.info(f"🎯 **Campo de Medida Óptimo (50%):** {optimal_value:.2f} {pv_units} - Para máxima exactitud, mida cerca de este valor.")
@@ -417,25 +412,158 @@ with tab1:
         else:
             st.error("El valor URV debe ser mayor que el LRV para ambos rangos.")
 
-    with st.expander("**밸 Calculadora de Coeficiente de Válvula (Cv) para Líquidos**"):
-        st.latex(r"C_v = Q \sqrt{\frac{SG}{\Delta P}}")
-        c1, c2, c3 = st.columns(3)
-        flow_rate_q = c1.number_input("Caudal (Q) [GPM]", value=100.0, format="%.2f")
-        sg = c2.number_input("Gravedad Específica (SG)", value=1.0, format="%.2f", help="Para agua, SG=1")
-        
-        c1b, c2b = st.columns(2)
-        p1 = c1b.number_input("Presión de Entrada (P1) [psi]", value=50.0, format="%.2f")
-        p2 = c2b.number_input("Presión de Salida (P2) [psi]", value=30.0, format="%.2f")
-        
-        if st.button("Calcular Cv"):
-            cv, error_msg = calculate_cv_liquid(flow_rate_q, sg, p1, p2)
-            if error_msg:
-                st.error(error_msg)
+    with st.expander("**📡 Escalamiento en Vivo de la Señal (Puesta en Marcha)**"), profiler.section("Tab 1 › Señal en vivo"):
+        st.write("Lee la señal cruda de una fuente y la escala a PV con el LRV/URV de la calculadora de arriba. "
+                 "El búfer es de tamaño fijo y las estadísticas son incrementales: el consumo no crece con el tiempo.")
+        v1c, v2c, v3c = st.columns(3)
+        live_source = v1c.selectbox("Fuente", ["Simulador local", "Modbus-TCP"], key="live_source")
+        live_refresh = v2c.select_slider("Refresco de pantalla [s]", options=[0.25, 0.5, 1.0, 2.0], value=0.5, key="live_refresh")
+        live_capacity = v3c.select_slider("Muestras en el búfer", options=[1_000, 10_000, 100_000], value=10_000, key="live_capacity")
+        if live_source == "Modbus-TCP":
+            v1m, v2m, v3m = st.columns(3)
+            modbus_host = v1m.text_input("Host", "127.0.0.1", key="live_modbus_host")
+            modbus_port = int(v2m.number_input("Puerto", value=5020, min_value=1, max_value=65535, key="live_modbus_port"))
+            modbus_register = int(v3m.number_input("Registro", value=0, min_value=0, max_value=65535, key="live_modbus_register"))
+            st.caption("Sin hardware: `python -c \"from instrumentacion.senal import ModbusSimulatorServer as S; S().serve_forever()\"`")
+        else:
+            modbus_host = modbus_port = modbus_register = None
+        live_running = st.toggle("▶️ Leer en vivo", key="live_running")
+
+        live_config = (live_source, modbus_host, modbus_port, modbus_register, lrv_pv, urv_pv, lrv_out, urv_out, live_capacity)
+        if not live_running or st.session_state.get('live_config') != live_config:
+            previous = st.session_state.pop('live_scaler', None)
+            if previous is not None and hasattr(previous.source, 'close'):
+                previous.source.close()
+            st.session_state.pop('live_config', None)
+        if live_running and urv_pv > lrv_pv and urv_out > lrv_out:
+            if 'live_scaler' not in st.session_state:
+                if live_source == "Modbus-TCP":
+                    source = ModbusTCPSource(modbus_host, modbus_port, modbus_register, signal_range=(lrv_out, urv_out), burst=50)
+                else:
+                    source = SimulatedSource(level=(lrv_out + urv_out) / 2, amplitude=(urv_out - lrv_out) / 4)
+                st.session_state.live_scaler = LiveScaler(
+                    source, lrv_pv, urv_pv, signal_range=(lrv_out, urv_out), capacity=live_capacity,
+                    fault_limits=NAMUR_LIMITS if (lrv_out, urv_out) == (4.0, 20.0) else None)
+                st.session_state.live_config = live_config
+            st.fragment(run_every=live_refresh)(render_live_panel)(pv_units, out_units)
+
+    with st.expander("**🏭 Hojas de Calibración para Toda la Planta**"), profiler.section("Tab 1 › Hojas de calibración de planta"):
+        st.write("Sube el listado de transmisores (CSV) con las columnas **tag**, **lrv**, **urv** y opcionalmente "
+                 "**lrv_salida**, **urv_salida**, **puntos** e **histeresis** (puntos descendentes).")
+        plant_file = st.file_uploader("Listado de instrumentos", type=["csv"], key="plant_calibration_file")
+        if plant_file is not None:
+            cal_summary, cal_csv = cached_calibration_pack(plant_file.getvalue())
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Instrumentos", cal_summary['instrumentos'])
+            k2.metric("Puntos generados", cal_summary['filas'])
+            k3.metric("Instrumentos inválidos", len(cal_summary['invalidos']))
+            if cal_summary['invalidos']:
+                st.warning("Rango o número de puntos inválido en: " + ", ".join(map(str, cal_summary['invalidos'][:50])))
+            st.download_button("⬇️ Descargar hojas de calibración (CSV)", cal_csv,
+                               file_name="hojas_calibracion.csv", mime="text/csv")
+            st.caption("Para exportar a Parquet: `python -m instrumentacion calibracion listado.csv -o hojas.parquet`")
+
+            st.write("**Hojas imprimibles por instrumento** (HTML en un ZIP; columnas opcionales **unidad**, **descripcion**, "
+                     "**error_a**…**error_d** para incluir el análisis de errores).")
+            if st.button("🖨️ Generar paquete de hojas (ZIP)", key="build_report_pack"):
+                with st.spinner("Renderizando hojas en paralelo..."):
+                    report_summary, report_zip = cached_report_archive(plant_file.getvalue())
+                st.download_button(f"⬇️ Descargar {report_summary['archivos']} hojas (ZIP)", report_zip,
+                                   file_name="hojas_instrumentos.zip", mime="application/zip")
+            st.caption("Para PDF o plantas completas: `python -m instrumentacion reportes listado.csv -o paquete.zip --formato pdf`")
+
+    with st.expander("**밸 Calculadora de Coeficiente de Válvula (Cv): Líquidos, Gas y Vapor**"), profiler.section("Tab 1 › Cv"):
+        cv_service = st.radio("Servicio", ["Líquido", "Gas", "Vapor"], horizontal=True, key="cv_service")
+        service = {"Líquido": "liquido", "Gas": "gas", "Vapor": "vapor"}[cv_service]
+        if service == "liquido":
+            st.latex(r"C_v = Q \sqrt{\frac{SG}{\Delta P}}")
+        elif service == "gas":
+            st.latex(r"C_v = \frac{Q}{1360\,F_p\,P_1\,Y}\sqrt{\frac{G_g\,T_1\,Z}{x}},\quad Y = 1 - \frac{x}{3\,F_k\,x_T},\quad x = \frac{\Delta P}{P_1}")
+        else:
+            st.latex(r"C_v = \frac{W}{63.3\,F_p\,Y\sqrt{x\,P_1\,\rho_1}},\quad Y = 1 - \frac{x}{3\,F_k\,x_T},\quad x = \frac{\Delta P}{P_1}")
+        if service != "liquido":
+            st.caption("Flujo crítico (choked) cuando x ≥ Fk·xT, con Fk = k/1.40: x se limita a Fk·xT e Y = 0.667. Presiones absolutas.")
+        cv_mode = st.radio("Modo de cálculo", ["Válvula individual", "Programa de válvulas (archivo)"], horizontal=True, key="cv_mode")
+        valve_catalog_file = st.file_uploader("Catálogo de válvulas (CSV con modelo, cv_nominal, caracteristica y opcional rangeabilidad; vacío = catálogo de referencia)",
+                                              type=["csv"], key="valve_catalog_file")
+        valve_index = cached_valve_index(valve_catalog_file.getvalue()) if valve_catalog_file is not None else get_valve_index()
+
+        if cv_mode == "Válvula individual" and service == "liquido":
+            c1, c2, c3 = st.columns(3)
+            flow_rate_q = c1.number_input("Caudal (Q) [GPM]", value=100.0, format="%.2f")
+            sg = c2.number_input("Gravedad Específica (SG)", value=1.0, format="%.2f", help="Para agua, SG=1")
+            
+            c1b, c2b = st.columns(2)
+            p1 = c1b.number_input("Presión de Entrada (P1) [psi]", value=50.0, format="%.2f")
+            p2 = c2b.number_input("Presión de Salida (P2) [psi]", value=30.0, format="%.2f")
+            
+            if st.button("Calcular Cv"):
+                cv, error_msg = calculate_cv_liquid(flow_rate_q, sg, p1, p2)
+                if error_msg:
+                    st.error(error_msg)
+                else:
+                    st.metric("Coeficiente de Válvula Requerido (Cv)", f"{cv}")
+                    st.info(f"Seleccione una válvula con un Cv nominal mayor a **{cv}**. Se recomienda que este valor esté entre el 20% y 80% del rango de operación de la válvula seleccionada.")
+                    show_valve_candidates(cv, valve_index)
+        elif cv_mode == "Válvula individual":
+            c1, c2, c3 = st.columns(3)
+            if service == "gas":
+                flow_rate_q = c1.number_input("Caudal (Q) [scfh]", value=100000.0, format="%.1f", key="gas_q")
+                fluid_prop = c2.number_input("Gravedad Específica del Gas (Gg)", value=0.60, format="%.3f", key="gas_gg", help="Aire = 1.0; gas natural ≈ 0.6")
+                t1 = c3.number_input("Temperatura de Entrada (T1) [°F]", value=60.0, format="%.1f", key="gas_t1")
             else:
-                st.metric("Coeficiente de Válvula Requerido (Cv)", f"{cv}")
-                st.info(f"Seleccione una válvula con un Cv nominal mayor a **{cv}**. Se recomienda que este valor esté entre el 20% y 80% del rango de operación de la válvula seleccionada.")
+                flow_rate_q = c1.number_input("Caudal Másico (W) [lb/h]", value=10000.0, format="%.1f", key="steam_w")
+                fluid_prop = c2.number_input("Densidad de Entrada (ρ1) [lb/ft³]", value=0.3318, format="%.4f", key="steam_rho", help="De tablas de vapor a P1 y T1 (saturado a 150 psia ≈ 0.3318)")
+                t1 = None
+            c1b, c2b = st.columns(2)
+            p1 = c1b.number_input("Presión de Entrada (P1) [psia]", value=150.0, format="%.2f", key="comp_p1")
+            p2 = c2b.number_input("Presión de Salida (P2) [psia]", value=100.0, format="%.2f", key="comp_p2")
+            c1c, c2c, c3c = st.columns(3)
+            k_ratio = c1c.number_input("Relación de calores específicos (k)", value=1.40 if service == "gas" else 1.33, format="%.3f", key=f"{service}_k")
+            x_t = c2c.number_input("Factor de caída crítica (xT)", value=0.72, min_value=0.01, max_value=1.0, format="%.2f", key="comp_xt", help="Dato del fabricante para el cuerpo/trim")
+            z_factor = c3c.number_input("Compresibilidad (Z)", value=1.0, format="%.3f", key="gas_z") if service == "gas" else None
+
+            if st.button("Calcular Cv", key="compressible_cv_button"):
+                options = {'k': k_ratio, 'xT': x_t}
+                if z_factor is not None:
+                    options['Z'] = z_factor
+                sized_case, error_msg = calculate_cv_compressible(service, flow_rate_q, fluid_prop, p1, p2, t1, **options)
+                if error_msg:
+                    st.error(error_msg)
+                else:
+                    r1, r2, r3 = st.columns(3)
+                    r1.metric("Coeficiente de Válvula Requerido (Cv)", f"{sized_case['cv']}")
+                    r2.metric("Factor de Expansión (Y)", f"{sized_case['Y']:.3f}")
+                    r3.metric("Régimen", sized_case['regimen'], help=f"x = {sized_case['x']:.3f}; límite crítico Fk·xT = {k_ratio / 1.40 * x_t:.3f}")
+                    if sized_case['regimen'] != 'subcrítico':
+                        st.warning("El caudal está limitado por flujo crítico: bajar P2 no aumenta el caudal. Revise ruido y velocidad de salida.")
+                    st.info(f"Seleccione una válvula con un Cv nominal mayor a **{sized_case['cv']}**. Se recomienda que este valor esté entre el 20% y 80% del rango de operación de la válvula seleccionada.")
+                    show_valve_candidates(sized_case['cv'], valve_index)
+        else:
+            schedule_help = {
+                "liquido": "las columnas **Q** [GPM], **SG**, **P1** y **P2** [psi]",
+                "gas": "las columnas **Q** [scfh], **Gg**, **P1**, **P2** [psia] y **T1** [°F] (opcionales: **Z**, **k**, **xT**, **Fp**)",
+                "vapor": "las columnas **W** [lb/h], **rho1** [lb/ft³], **P1** y **P2** [psia] (opcionales: **k**, **xT**, **Fp**)",
+            }[service]
+            st.write(f"Sube un CSV con {schedule_help}; el resto de columnas (tag, caso...) se conservan.")
+            cv_file = st.file_uploader("Programa de válvulas", type=["csv"], key="cv_schedule_file")
+            if cv_file is not None:
+                sized, missing, sized_csv = cached_cv_schedule(cv_file.getvalue(), service)
+                if missing:
+                    st.error(f"Faltan columnas en el archivo: {', '.join(missing)}")
+                else:
+                    m1, m2, m3 = st.columns(3)
+                    m1.metric("Casos calculados", int(sized['valido'].sum()))
+                    m2.metric("Casos inválidos", int((~sized['valido']).sum()))
+                    if 'regimen' in sized:
+                        m3.metric("Casos con flujo crítico", int((sized['regimen'] == 'crítico (choked)').sum()))
+                    st.dataframe(sized, use_container_width=True)
+                    st.download_button("⬇️ Descargar resultados (CSV)", sized_csv,
+                                       file_name="dimensionamiento_cv.csv", mime="text/csv")
+                    st.write("**Válvula recomendada por tag** (todos sus casos entre 20% y 80% de carrera; agrupa por la columna `tag` si existe):")
+                    st.dataframe(select_valves_for_schedule(sized, valve_index), hide_index=True, use_container_width=True)
 
-    with st.expander("**🎛️ Calculadora de Caudal por Placa de Orificio**"):
+    with st.expander("**🎛️ Calculadora de Caudal por Placa de Orificio**"), profiler.section("Tab 1 › Placa de orificio"):
         st.latex(r"Q = K \sqrt{\Delta P}")
         k_factor = st.number_input("Factor K del Medidor", value=50.0, format="%.3f", help="Este factor depende de la geometría de la tubería, la placa y las propiedades del fluido.")
         delta_p = st.number_input("Presión Diferencial (ΔP) [inH2O]", value=100.0, format="%.2f")
@@ -447,17 +575,92 @@ with tab1:
             else:
                 st.metric("Caudal Calculado (Q)", f"{flow} unidades de caudal")
 
-with tab2:
+        st.markdown("---")
+        st.subheader("🧮 Totalizador (FQ) sobre Series de ΔP")
+        st.write("Sube un CSV del historiador con la columna de ΔP (y opcionalmente marca de tiempo) para integrar el caudal.")
+        dp_file = st.file_uploader("Serie de ΔP", type=["csv"], key="dp_series_file")
+        t1, t2, t3 = st.columns(3)
+        dp_column = t1.text_input("Columna de ΔP", "dp", key="dp_column")
+        dp_time_column = t2.text_input("Columna de tiempo (vacío = periodo fijo)", "", key="dp_time_column")
+        dp_period = t3.number_input("Periodo de muestreo [s]", value=1.0, min_value=0.001, format="%.3f", key="dp_period")
+        dp_cutoff = st.number_input("Corte de bajo caudal (unidades de caudal)", value=0.0, min_value=0.0, format="%.3f", key="dp_cutoff")
+        if dp_file is not None:
+            totals = cached_orifice_totals(dp_file.getvalue(), k_factor, dp_column, dp_time_column or None, dp_period, dp_cutoff)
+            r1, r2, r3 = st.columns(3)
+            r1.metric("Total Integrado", f"{totals['total']:.2f}", help="Unidades de caudal × hora (p. ej. m³ si Q está en m³/h)")
+            r2.metric("Caudal Medio", f"{totals['caudal_medio']:.2f}")
+            r3.metric("Muestras bajo corte", f"{totals['muestras_corte']} de {totals['muestras']}")
+            if totals['muestras_invalidas']:
+                st.warning(f"{totals['muestras_invalidas']} muestra(s) con ΔP o tiempo vacío/no numérico omitidas (se interpola el hueco).")
+
+        st.markdown("---")
+        st.subheader("📏 Cálculo ISO 5167-2 (Reader-Harris/Gallagher)")
+        st.caption("Sustituye el factor K fijo: C y ε se recalculan en cada muestra según Reynolds, P1 y T.")
+        o1, o2, o3, o4 = st.columns(4)
+        iso_d = o1.number_input("Diámetro del orificio d [mm]", value=50.0, min_value=0.1, format="%.3f", key="iso_d")
+        iso_D = o2.number_input("Diámetro interno D [mm]", value=100.0, min_value=0.1, format="%.3f", key="iso_D")
+        iso_tapping = o3.selectbox("Tomas", tuple(ORIFICE_TAPPINGS), key="iso_tapping")
+        iso_fluid = o4.radio("Fluido", ("Líquido", "Gas"), horizontal=True, key="iso_fluid")
+        f1, f2, f3, f4 = st.columns(4)
+        iso_viscosity = f1.number_input("Viscosidad [cP]", value=1.0 if iso_fluid == "Líquido" else 0.011, min_value=1e-6,
+                                        format="%.4f", key=f"iso_viscosity_{iso_fluid}")
+        if iso_fluid == "Líquido":
+            iso_options = {"density": f2.number_input("Densidad [kg/m³]", value=998.0, min_value=0.001, key="iso_density")}
+        else:
+            iso_options = {
+                "molar_mass": f2.number_input("Masa molar [kg/kmol]", value=16.04, min_value=0.1, key="iso_molar_mass"),
+                "z": f3.number_input("Factor Z", value=1.0, min_value=0.01, format="%.4f", key="iso_z"),
+                "kappa": f4.number_input("Exponente isentrópico κ", value=1.3, min_value=1.0, format="%.3f", key="iso_kappa"),
+            }
+        p1c, p2c, p3c = st.columns(3)
+        iso_dp = p1c.number_input("ΔP [kPa]", value=25.0, min_value=0.0, format="%.3f", key="iso_dp")
+        iso_p1 = p2c.number_input("P1 [kPa abs]", value=500.0, min_value=0.001, format="%.2f", key="iso_p1")
+        iso_t = p3c.number_input("T [°C]", value=20.0, format="%.2f", key="iso_t")
+        iso = solve_orifice_flow(iso_dp, iso_p1, iso_t, iso_d, iso_D, iso_viscosity, tapping=iso_tapping, **iso_options)
+        if iso_d >= iso_D or iso_dp >= iso_p1 or not iso["convergido"]:
+            st.error("Datos inválidos: d debe ser menor que D y ΔP menor que P1.")
+        else:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Caudal másico", f"{float(iso['caudal_masico']):.2f} kg/h")
+            m2.metric("Caudal volumétrico (flujo)", f"{float(iso['caudal_volumetrico']):.3f} m³/h")
+            m3.metric("C / ε", f"{float(iso['C']):.5f} / {float(iso['epsilon']):.5f}")
+            m4.metric("Reynolds (D)", f"{float(iso['reynolds']):,.0f}")
+            if not iso["en_norma"]:
+                st.warning("Fuera de los límites de ISO 5167-2 (β, diámetros, Reynolds o P2/P1 ≥ 0.75): resultado orientativo.")
+
+        st.write("Serie del historiador con columnas `dp`, `p1` y `t` (y `tag` si hay varios medidores) para recalcular el caudal corregido.")
+        iso_series = st.file_uploader("Serie ΔP / P1 / T", type=["csv"], key="iso_series_file")
+        iso_meters = st.file_uploader("Tabla de medidores (tag, d, D, tomas, viscosidad, densidad, masa_molar, z, kappa) — opcional",
+                                      type=["csv"], key="iso_meters_file")
+        if iso_series is not None:
+            iso_result, iso_error = cached_orifice_iso(
+                iso_series.getvalue(), iso_meters.getvalue() if iso_meters is not None else None,
+                (iso_d, iso_D, iso_tapping, iso_viscosity, tuple(sorted(iso_options.items()))),
+            )
+            if iso_error:
+                st.error(iso_error)
+            else:
+                st.success(f"{len(iso_result)} muestras · {int(iso_result['iteraciones'].max())} iteraciones máx. · "
+                           f"{int((~iso_result['en_norma']).sum())} fuera de norma")
+                st.dataframe(iso_result.head(200), use_container_width=True)
+                st.download_button("⬇️ Descargar caudales ISO 5167", iso_result.to_csv(index=False).encode("utf-8"),
+                                   file_name="caudal_iso5167.csv", mime="text/csv")
+
+with tab1:
+    render_calculation_tab()
+
+@profiled_tab("Tab 2 · Interpretador ISA-5.1")
+def render_isa_tab():
     st.header("📖 Interpretador de Tags de Instrumentación (ISA-5.1)")
     st.info("Introduce un tag de instrumento (ej: `TIC-101`, `PDT-50A`, `LSHH-203`) para ver su significado desglosado según la norma ISA-5.1.")
     
     tag_input = st.text_input("**Introduce el Tag del Instrumento:**", "TIC-101A").upper()
     
     if tag_input:
-        match = re.match(r'^([A-Z]{1,4})(\d+)([A-Z]*)$', tag_input.replace('-', ''))
+        parsed = parse_tag(tag_input)
         
-        if match:
-            letters, loop_num, suffix = match.groups()
+        if parsed:
+            letters, loop_num, suffix = parsed
             
             st.subheader(f"Análisis del Tag: **{tag_input}**")
             
@@ -492,17 +695,50 @@ with tab2:
                 col1.write(f"**Rango Típico:** {specs['rango_tipico']}")
                 col2.write(f"**Exactitud Típica:** {specs['exactitud_tipica']}")
             
-            full_description = f"{FIRST_LETTER.get(first_letter, 'Variable Desconocida')}"
-            functions = [SUCCESSOR_LETTERS.get(l, 'Función Desconocida') for l in letters[1:]]
-            if functions:
-                full_description += " con funciones de " + " y ".join(functions)
+            full_description = describe_tag_letters(letters)
 
             st.success(f"**Resumen:** El tag **{tag_input}** representa un instrumento en el lazo de control **{loop_num}** que es un **{full_description.lower()}**.")
 
         else:
             st.warning("Formato de tag no reconocido. Por favor, use un formato como 'TIC101' o 'FT-205B'.")
 
-with tab3:
+    with st.expander("**📂 Interpretación por Lotes (Índice de Instrumentos)**"), profiler.section("Tab 2 › Interpretación por lotes"):
+        st.write("Sube el índice de instrumentos (CSV o Excel) para interpretar todos los tags de una vez.")
+        tag_file = st.file_uploader("Listado de tags", type=["csv", "xlsx", "xls"], key="batch_tag_file")
+        tag_column = st.text_input("Columna con los tags (vacío = primera columna)", "", key="batch_tag_column")
+        if tag_file is not None:
+            tag_results, tag_csv = cached_tag_interpretation(tag_file.getvalue(), tag_file.name, tag_column or None)
+            valid_tags = tag_results['letras'].notna()
+            b1, b2, b3 = st.columns(3)
+            b1.metric("Tags procesados", len(tag_results))
+            b2.metric("Formato no reconocido", int((~valid_tags).sum()))
+            b3.metric("En base de datos", int(tag_results['en_base_datos'].sum()))
+            st.dataframe(tag_results.head(500), use_container_width=True)
+            st.download_button("⬇️ Descargar interpretación (CSV)", tag_csv,
+                               file_name="interpretacion_tags.csv", mime="text/csv")
+
+            st.markdown("---")
+            st.subheader("🔎 Consulta de Lazos")
+            st.caption("Deja vacío un filtro para no aplicarlo. Ej.: letras `LSH/LSL` con lazos 200–299, o sólo el lazo 105 (desde y hasta 105).")
+            tag_index = cached_tag_index(tag_file.getvalue(), tag_file.name, tag_column or None)
+            q1, q2, q3, q4 = st.columns(4)
+            query_letters = q1.text_input("Letras (ej. LSH/LSL)", "", key="loop_query_letters")
+            query_loop_from = q2.number_input("Lazo desde", min_value=0, value=None, step=1, key="loop_query_from")
+            query_loop_to = q3.number_input("Lazo hasta", min_value=0, value=None, step=1, key="loop_query_to")
+            query_suffix = q4.text_input("Sufijo", "", key="loop_query_suffix")
+            # Un solo extremo da un rango abierto ("desde 200" o "hasta 299")
+            query_loops = None if query_loop_from is None and query_loop_to is None else (query_loop_from, query_loop_to)
+            query_start = time.perf_counter()
+            positions = tag_index.positions(letters=query_letters or None, suffix=query_suffix or None, loops=query_loops)
+            query_us = (time.perf_counter() - query_start) * 1e6
+            st.write(f"**{len(positions)}** de {len(tag_index)} instrumentos · consulta en {query_us:,.0f} µs")
+            st.dataframe(tag_index.frame(positions[:500]), use_container_width=True)
+
+with tab2:
+    render_isa_tab()
+
+@profiled_tab("Tab 3 · Centro de Práctica")
+def render_practice_tab():
     st.header("🧠 Centro de Práctica y Autoevaluación")
     st.info("Pon a prueba tus conocimientos con ejercicios generados aleatoriamente. ¡Nunca verás dos veces el mismo problema!")
     
@@ -512,6 +748,18 @@ with tab3:
         "Identificación de Tags (ISA-5.1)",
         "Selección de Instrumentos y Análisis de Errores"
     ], horizontal=True, key="quiz_type_selector")
+    quiz_topic = {"Ejercicios de Escalamiento": "escalamiento", "Identificación de Tags (ISA-5.1)": "tags"}.get(quiz_type, "seleccion")
+
+    # El historial vive en SQLite; la sesión sólo guarda el usuario y dos contadores
+    practice_history = load_practice_history()
+    if 'quiz_user' not in st.session_state:
+        st.session_state.quiz_user = f"anonimo-{uuid.uuid4().hex[:8]}"
+    quiz_user = st.text_input("👤 Usuario (para conservar tu historial entre sesiones)", key="quiz_user").strip()
+    if st.session_state.get('quiz_stats_user') != quiz_user:
+        correct_total = practice_history.user_totals(quiz_user)
+        st.session_state.quiz_stats = {'correct': correct_total[0], 'total': correct_total[1]}
+        st.session_state.quiz_seen = practice_history.load_seen(quiz_user)
+        st.session_state.quiz_stats_user = quiz_user
 
     # --- Gestión de estado para los quizzes ---
     if 'current_quiz_type' not in st.session_state or st.session_state.current_quiz_type != quiz_type:
@@ -520,9 +768,6 @@ with tab3:
         st.session_state.answer_submitted = False
         st.session_state.quiz_counter = st.session_state.get('quiz_counter', 0) + 1
     
-    if 'quiz_stats' not in st.session_state:
-        st.session_state.quiz_stats = {'correct': 0, 'total': 0}
-    
     # Mostrar estadísticas
     if st.session_state.quiz_stats['total'] > 0:
         accuracy = (st.session_state.quiz_stats['correct'] / st.session_state.quiz_stats['total']) * 100
@@ -531,18 +776,21 @@ with tab3:
     st.divider()
 
     # Generar pregunta si es necesario
+    # Los generadores descartan los problemas que el filtro de Bloom del usuario ya registró
     if st.session_state.current_question_data is None:
+        quiz_seen = st.session_state.quiz_seen
         if "Escalamiento" in quiz_type:
-            st.session_state.current_question_data = generate_scaling_quiz()
+            st.session_state.current_question_data = generate_scaling_quiz(seen=quiz_seen)
         elif "Tags" in quiz_type:
-            st.session_state.current_question_data = generate_tag_quiz()
+            st.session_state.current_question_data = generate_tag_quiz(seen=quiz_seen)
         elif "Selección de Instrumentos" in quiz_type:
-            result = generate_error_quiz()
+            result = generate_error_quiz(seen=quiz_seen)
             if result[0] is not None:
                 st.session_state.current_question_data = result
             else:
                 st.error("No se pudo generar el ejercicio. Intente de nuevo.")
                 st.session_state.current_question_data = (None, None, None, None, None)
+        practice_history.save_seen(quiz_user, quiz_seen)
 
     # Desplegar la pregunta
     if st.session_state.current_question_data and st.session_state.current_question_data[0]:
@@ -563,6 +811,7 @@ with tab3:
             if not st.session_state.answer_submitted:
                 st.session_state.quiz_stats['total'] += 1
                 st.session_state.answer_submitted = True
+                practice_history.record(quiz_user, quiz_topic, user_answer == correct_answer)
                 if user_answer == correct_answer:
                     st.session_state.quiz_stats['correct'] += 1
                     st.markdown('<div class="success-box">🎉 ¡Correcto! Excelente trabajo.</div>', unsafe_allow_html=True)
@@ -575,13 +824,14 @@ with tab3:
             else:
                 st.info("Ya has verificado esta respuesta. Pasa al siguiente ejercicio.")
                 
-        if col_btn2.button("➡️ Siguiente Ejercicio", key=f"next_{unique_key}"):
-            st.session_state.current_question_data = None
-            st.session_state.answer_submitted = False
-            st.session_state.quiz_counter += 1
-            st.rerun()
+        # El callback corre antes del rerun del fragmento, que ya genera el ejercicio nuevo
+        col_btn2.button("➡️ Siguiente Ejercicio", key=f"next_{unique_key}", on_click=next_exercise)
 
-with tab4:
+with tab3:
+    render_practice_tab()
+
+@profiled_tab("Tab 4 · Conversores")
+def render_converters_tab():
     st.header("🔧 Conversores de Unidades")
     c1, c2 = st.columns(2)
     
@@ -603,11 +853,87 @@ with tab4:
         if result is not None:
             st.metric(f"Resultado en {press_to}", f"{result:.4f}")
 
-with tab5:
+    with st.expander("**🔁 Conversor General de Variables de Proceso**"), profiler.section("Tab 4 › Conversor general"):
+        g1, g2, g3, g4 = st.columns(4)
+        gen_dim = g1.selectbox("Magnitud", tuple(UNITS), format_func=DIMENSION_LABELS.get, key="gen_dim")
+        gen_units = tuple(UNITS[gen_dim])
+        gen_val = g2.number_input("Valor", value=1.0, format="%.4f", key="gen_val")
+        gen_from = g3.selectbox("De:", gen_units, key=f"gen_from_{gen_dim}")
+        gen_to = g4.selectbox("A:", gen_units, index=1, key=f"gen_to_{gen_dim}")
+        gen_converter = get_converter(gen_dim, gen_from, gen_to)
+        st.metric(f"Resultado en {gen_to}", f"{gen_converter(gen_val):.6g}")
+
+    with st.expander("**📁 Conversión Masiva (Exportaciones de Historiador)**"), profiler.section("Tab 4 › Conversión masiva"):
+        st.write("Sube un CSV exportado del historiador y convierte columnas completas de una sola vez.")
+        bulk_file = st.file_uploader("Archivo CSV", type=["csv"], key="bulk_conv_file")
+        if bulk_file is not None:
+            bulk_df = cached_csv_frame(bulk_file.getvalue())
+            numeric_cols = list(bulk_df.select_dtypes(include="number").columns)
+            bc1, bc2, bc3, bc4 = st.columns(4)
+            bulk_kind = bc1.selectbox("Magnitud", tuple(UNITS), format_func=DIMENSION_LABELS.get, key="bulk_kind")
+            unit_options = tuple(UNITS[bulk_kind])
+            bulk_from = bc2.selectbox("De:", unit_options, key=f"bulk_from_{bulk_kind}")
+            bulk_to = bc3.selectbox("A:", unit_options, index=1, key=f"bulk_to_{bulk_kind}")
+            bulk_round = bc4.checkbox("Redondear a 2 decimales", value=False, key="bulk_round")
+            bulk_cols = st.multiselect("Columnas a convertir", numeric_cols, default=numeric_cols, key="bulk_cols")
+            if bulk_cols:
+                bulk_df[bulk_cols] = convert_array(bulk_df[bulk_cols], bulk_kind, bulk_from, bulk_to, decimals=2 if bulk_round else None)
+                st.dataframe(bulk_df.head(100), use_container_width=True)
+                st.download_button("⬇️ Descargar CSV convertido", bulk_df.to_csv(index=False).encode("utf-8"),
+                                   file_name=f"convertido_{bulk_to.replace('/', '_')}.csv", mime="text/csv")
+
+    with st.expander("**🌡️ Linealización de Sensores (RTD y Termopares)**"), profiler.section("Tab 4 › Linealización de sensores"):
+        s1, s2, s3 = st.columns(3)
+        sensor = s1.selectbox("Sensor", tuple(SENSOR_TYPES), key="sensor_type")
+        sensor_kind = SENSOR_TYPES[sensor][0]
+        sensor_units = SENSOR_UNITS[sensor_kind]
+        sensor_direction = s2.radio("Dirección", (f"{sensor_units} → °C", f"°C → {sensor_units}"), key="sensor_direction")
+        sensor_exact = s3.checkbox("Ecuación exacta (sin tabla)", value=False, key="sensor_exact",
+                                   help="Por defecto se interpola en una tabla cada 0.1 °C (error < 0.001 °C).")
+        cold_junction = 0.0
+        if sensor_kind == 'tc':
+            cold_junction = s3.number_input("Unión fría [°C]", value=25.0, format="%.2f", key="sensor_cold_junction")
+        to_temperature = sensor_direction.endswith("°C")
+        default_value = (138.51 if sensor == 'Pt100' else 100.0) if sensor_kind == 'rtd' else 10.0
+        sensor_value = s1.number_input(f"Valor [{sensor_units if to_temperature else '°C'}]",
+                                       value=default_value if to_temperature else 100.0, format="%.4f",
+                                       key=f"sensor_value_{sensor}_{to_temperature}")
+        if to_temperature:
+            sensor_result = float(sensor_to_temperature(sensor_value, sensor, cold_junction, exact=sensor_exact))
+            result_units = "°C"
+        else:
+            sensor_result = float(temperature_to_sensor(sensor_value, sensor, cold_junction))
+            result_units = sensor_units
+        if pd.isna(sensor_result):
+            st.error("Valor fuera del rango del sensor.")
+        else:
+            st.metric(f"Resultado en {result_units}", f"{sensor_result:.4f}")
+
+        sensor_file = st.file_uploader(f"CSV con lecturas crudas [{sensor_units}] (p. ej. volcado del DCS)", type=["csv"], key="sensor_bulk_file")
+        if sensor_file is not None:
+            sensor_df = cached_csv_frame(sensor_file.getvalue()).copy()
+            sensor_numeric = list(sensor_df.select_dtypes(include="number").columns)
+            sensor_cols = st.multiselect("Columnas a linealizar", sensor_numeric, default=sensor_numeric, key="sensor_bulk_cols")
+            if sensor_cols:
+                for column in sensor_cols:
+                    sensor_df[column] = sensor_to_temperature(sensor_df[column].to_numpy(dtype=float), sensor,
+                                                              cold_junction, exact=sensor_exact)
+                out_of_range = int(sensor_df[sensor_cols].isna().sum().sum())
+                if out_of_range:
+                    st.warning(f"{out_of_range} lecturas fuera del rango del sensor quedaron vacías.")
+                st.dataframe(sensor_df.head(100), use_container_width=True)
+                st.download_button("⬇️ Descargar CSV en °C", sensor_df.to_csv(index=False).encode("utf-8"),
+                                   file_name="linealizado_C.csv", mime="text/csv")
+
+with tab4:
+    render_converters_tab()
+
+@profiled_tab("Tab 5 · Análisis de Errores")
+def render_errors_tab():
     st.header("⚠️ Análisis Guiado de Errores de Instrumentación")
     st.info("Define un instrumento y las especificaciones del fabricante para analizar los errores de medición, inspirado en la metodología de tu pizarra.")
     
-    with st.expander("**🎯 Configuración de Análisis de Errores**", expanded=True):
+    with st.expander("**🎯 Configuración de Análisis de Errores**", expanded=True), profiler.section("Tab 5 › Tarjetas de error"):
         col1, col2 = st.columns(2)
         
         with col1:
@@ -683,6 +1009,60 @@ with tab5:
                 
                 st.markdown('</div>', unsafe_allow_html=True)
 
+        if span > 0:
+            error_sheet = cached_error_sheet(min_range, max_range, units, error_a, error_b, error_c, error_d)
+            st.download_button("🖨️ Descargar hoja imprimible (HTML)", error_sheet,
+                               file_name="hoja_analisis_errores.html", mime="text/html", key="error_sheet_download")
+
+    with st.expander("**📈 Envolvente de Error en Todo el Rango y Monte Carlo**"), profiler.section("Tab 5 › Envolvente y Monte Carlo"):
+        st.write("Barre el campo de indicación completo con las especificaciones configuradas arriba y estima el intervalo de confianza real de la lectura.")
+        if span > 0:
+            e1, e2, e3 = st.columns(3)
+            sweep_points = e1.slider("Puntos del barrido", min_value=100, max_value=10000, value=2000, step=100, key="sweep_points")
+            mc_draws = e2.select_slider("Muestras Monte Carlo", options=[10_000, 50_000, 100_000, 200_000, 500_000], value=100_000, key="mc_draws")
+            mc_confidence = e3.select_slider("Nivel de confianza", options=[0.90, 0.95, 0.99], value=0.95,
+                                             format_func=lambda c: f"{c:.0%}", key="mc_confidence")
+
+            envelope = error_envelope(min_range, max_range, error_a, error_b, error_c, error_d, points=sweep_points)
+            st.line_chart(envelope.set_index('valor')[['A', 'B', 'C', 'D', 'peor_caso', 'rss']])
+            st.caption(f"Error absoluto (±{units}) frente al valor medido. 'peor_caso' suma los cuatro tipos; 'rss' es la raíz de la suma de cuadrados.")
+
+            mc = monte_carlo_error(measurement_val, min_range, max_range, error_a, error_b, error_c, error_d,
+                                   draws=mc_draws, confidence=mc_confidence)
+            m1, m2, m3 = st.columns(3)
+            m1.metric(f"Intervalo {mc_confidence:.0%} (Monte Carlo)", f"[{mc['inferior']:.3f}, {mc['superior']:.3f}] {units}")
+            m2.metric("Peor caso (suma)", f"± {mc['peor_caso']:.3f} {units}")
+            m3.metric("RSS", f"± {mc['rss']:.3f} {units}")
+        else:
+            st.warning("Defina un rango válido (máximo mayor que mínimo) para calcular la envolvente.")
+
+    with st.expander("**🔗 Incertidumbre de Lazo para Toda la Planta**"), profiler.section("Tab 5 › Incertidumbre de lazo"):
+        st.write("Sube el listado de lazos con una fila por componente (sensor, transmisor, tarjeta, escalamiento...) "
+                 "para combinar sus errores y detectar los lazos fuera de tolerancia.")
+        st.caption("Columnas: `lazo`, `componente`, `lrv`, `urv` y opcionalmente `valor`, `error_a`..`error_d`, "
+                   "`codigo` o `tag` (toma la exactitud típica del catálogo si faltan los errores) y `tolerancia` [% span].")
+        loop_file = st.file_uploader("Listado de componentes de lazo", type=["csv"], key="loop_stackup_file")
+        u1, u2 = st.columns(2)
+        loop_tolerance = u1.number_input("Tolerancia por defecto [% del span]", value=1.0, min_value=0.001,
+                                         format="%.3f", key="loop_tolerance")
+        loop_criterion = u2.radio("Criterio", LOOP_CRITERIA, format_func={"rss": "RSS (estadístico)",
+                                  "peor_caso": "Peor caso (suma lineal)"}.get, horizontal=True, key="loop_criterion")
+        if loop_file is not None:
+            loop_result, loop_orphans, loop_error = cached_loop_stackup(loop_file.getvalue(), loop_tolerance, loop_criterion)
+            if loop_error:
+                st.error(loop_error)
+            else:
+                if loop_orphans:
+                    st.warning(f"{loop_orphans:,} fila(s) sin lazo omitidas del análisis.")
+                exceeding = loop_result[loop_result["excede"]]
+                l1, l2, l3 = st.columns(3)
+                l1.metric("Lazos analizados", f"{len(loop_result):,}")
+                l2.metric("Fuera de tolerancia", f"{len(exceeding):,}")
+                l3.metric("Componentes sin especificación", f"{int(loop_result['sin_especificacion'].sum()):,}")
+                sort_column = "rss_pct" if loop_criterion == "rss" else "peor_caso_pct"
+                st.dataframe(exceeding.sort_values(sort_column, ascending=False).head(500), use_container_width=True)
+                st.download_button("⬇️ Descargar resultado por lazo", loop_result.to_csv(index=False).encode("utf-8"),
+                                   file_name="incertidumbre_lazos.csv", mime="text/csv")
 
     with st.expander("📚 Guía de Tipos de Error"):
         st.markdown("""
@@ -708,6 +1088,9 @@ with tab5:
         - Proviene de factores como la resolución del sensor.
         """)
 
+with tab5:
+    render_errors_tab()
+
 st.divider()
 st.markdown("""
 <div style='text-align: center; color: #666; padding: 20px;'>
@@ -715,3 +1098,18 @@ st.markdown("""
     <p>Desarrollado para ingenieros y técnicos de instrumentación y control | Basado en estándares ISA</p>
 </div>
 """, unsafe_allow_html=True)
+
+# --- PANEL DE PERFILADO (se rellena al final, cuando ya se ha ejecutado todo el rerun) ---
+# Los reruns parciales de cada pestaña muestran su propio panel (ver `profiled_tab`).
+if profiler.enabled:
+    if 'profile_session_id' not in st.session_state:
+        st.session_state.profile_session_id = uuid.uuid4().hex[:8]
+    profile = profiler.finish()
+    with profile_panel.container():
+        show_profile(profile, "Rerun completo")
+        profile_log = st.text_input("Archivo de registro (JSON Lines, vacío = no registrar)",
+                                    os.environ.get("INSTRUMENTACION_PERFIL_LOG", ""), key="profile_log_path")
+    # Copia fuera del widget: los reruns parciales de las pestañas registran en el mismo archivo
+    st.session_state.profile_log = profile_log
+    if profile_log:
+        profiler.append_log(profile_log, sesion=st.session_state.profile_session_id)